@@ -1,16 +1,143 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import asyncio
+import multiprocessing
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from core.engine import AnalyzerEngine
+from core.cache import DiskCache, MemoryCache
+from core.metrics import EngineMetrics
+from core.jobs import JobQueue, QueueFullError, DONE, FAILED
+from core.archive import extract_sol_files, archive_kind, ArchiveError, ArchiveLimitError
 from core.reporter import SlitherReportGenerator, HTMLReportGenerator
-from core.ast_parser import ASTParser
 import shutil
 import os
-import uuid
 import time
 import json
+import hashlib
 
-app = FastAPI(title="Smart Contract Analyzer API")
+# 后台分析线程数、最大排队任务数、已完成任务的保留时间（秒），可通过环境变量配置
+JOB_WORKERS = int(os.environ.get("SCA_API_WORKERS", min(4, os.cpu_count() or 1)))
+JOB_QUEUE_DEPTH = int(os.environ.get("SCA_API_QUEUE_DEPTH", 32))
+JOB_TTL = float(os.environ.get("SCA_API_JOB_TTL", 3600))
+# 队列已满时建议客户端重试的等待秒数
+RETRY_AFTER_SECONDS = 5
+# 压缩包上传限制：压缩包本身大小、.sol 文件数、解压后总大小；以及所有压缩包任务共享的分析进程数
+ARCHIVE_MAX_UPLOAD_BYTES = int(os.environ.get("SCA_ARCHIVE_MAX_UPLOAD_BYTES", 20 * 1024 * 1024))
+ARCHIVE_MAX_FILES = int(os.environ.get("SCA_ARCHIVE_MAX_FILES", 2000))
+ARCHIVE_MAX_BYTES = int(os.environ.get("SCA_ARCHIVE_MAX_BYTES", 100 * 1024 * 1024))
+# 已完成报告的进程内缓存：条目数上限（0 表示禁用）与有效期（秒）
+REPORT_CACHE_SIZE = int(os.environ.get("SCA_API_REPORT_CACHE_SIZE", 256))
+REPORT_CACHE_TTL = float(os.environ.get("SCA_API_REPORT_CACHE_TTL", 600))
+ARCHIVE_JOBS = int(os.environ.get("SCA_ARCHIVE_JOBS", min(4, os.cpu_count() or 1)))
+
+# 服务进程内共享的分析引擎：插件只在启动时加载一次
+_engine: Optional[AnalyzerEngine] = None
+_job_queue: Optional[JobQueue] = None
+# 所有压缩包任务共享的工作进程池（ARCHIVE_JOBS 个进程），插件在每个进程中只加载一次
+_archive_pool: Optional[ProcessPoolExecutor] = None
+_archive_pool_lock = threading.Lock()
+# 键为 (上传内容哈希, 文件名, 引擎指纹) 的摘要；插件变化后指纹不同，旧条目不会再命中
+_report_cache = MemoryCache(max_entries=REPORT_CACHE_SIZE, ttl=REPORT_CACHE_TTL)
+
+
+# 进程内指标，由 /metrics 以 Prometheus 文本格式导出（多进程分析压缩包时工作进程内的阶段不计入）
+_metrics = EngineMetrics()
+
+
+def get_engine() -> AnalyzerEngine:
+    global _engine
+    if _engine is None:
+        # 报告总是包含合约信息，只选文本规则时也编译
+        engine = AnalyzerEngine(cache=DiskCache(), metrics=_metrics, need_contracts=True)
+        engine.load_plugins()
+        _engine = engine
+    return _engine
+
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(workers=JOB_WORKERS, max_queued=JOB_QUEUE_DEPTH, ttl=JOB_TTL)
+        _job_queue.events = get_engine().events
+    return _job_queue
+
+
+def get_archive_pool() -> ProcessPoolExecutor:
+    global _archive_pool
+    with _archive_pool_lock:
+        if _archive_pool is None:
+            # 服务进程是多线程的，工作进程使用 spawn 启动，避免 fork 继承锁状态
+            _archive_pool = get_engine().create_pool(ARCHIVE_JOBS, mp_context=multiprocessing.get_context("spawn"))
+        return _archive_pool
+
+
+def _reset_archive_pool(pool: ProcessPoolExecutor):
+    """丢弃已损坏的进程池，下一个压缩包任务重新创建"""
+    global _archive_pool
+    with _archive_pool_lock:
+        if _archive_pool is pool:
+            _archive_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _hit_ratio(hits: int, misses: int) -> Optional[float]:
+    total = hits + misses
+    return hits / total if total else None
+
+
+def _register_service_metrics():
+    """队列、缓存等服务状态在导出时读取，不需要在请求路径上额外计数"""
+    registry = _metrics.registry
+    registry.gauge('sca_job_queue_depth', '排队中（尚未开始）的任务数',
+                   callback=lambda: get_job_queue().stats()['queued'])
+    registry.gauge('sca_jobs_running', '正在执行的任务数',
+                   callback=lambda: get_job_queue().stats()['running'])
+    registry.gauge('sca_job_workers', '后台分析线程数',
+                   callback=lambda: get_job_queue().workers)
+    registry.counter('sca_jobs_total', '已结束或被拒绝的任务数（按结果）', ('status',), callback=lambda: {
+        ('done',): get_job_queue().completed_total,
+        ('failed',): get_job_queue().failed_total,
+        ('rejected',): get_job_queue().rejected_total,
+    })
+
+    def cache_stats():
+        caches = {'report': (_report_cache.hits, _report_cache.misses)}
+        cache = get_engine().cache
+        if cache is not None:
+            caches['ast'] = cache.counts('ast')
+            caches['findings'] = cache.counts('findings')
+        return caches
+
+    registry.counter('sca_cache_hits_total', '缓存命中次数', ('cache',),
+                     callback=lambda: {(name,): hm[0] for name, hm in cache_stats().items()})
+    registry.counter('sca_cache_misses_total', '缓存未命中次数', ('cache',),
+                     callback=lambda: {(name,): hm[1] for name, hm in cache_stats().items()})
+    registry.gauge('sca_cache_hit_ratio', '缓存命中率（尚无请求时不导出）', ('cache',),
+                   callback=lambda: {(name,): _hit_ratio(*hm) for name, hm in cache_stats().items()})
+
+
+_register_service_metrics()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时预先加载插件，避免首个请求承担加载开销
+    get_engine()
+    get_job_queue()
+    get_archive_pool()
+    yield
+    get_job_queue().shutdown(wait=False)
+    if _archive_pool is not None:
+        _archive_pool.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="Smart Contract Analyzer API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,195 +147,394 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-@app.post("/api/analyze")
-async def analyze_contract(file: UploadFile = File(...)):
+def _analyze_source(content: bytes, filename: str, cache_key: Optional[str] = None) -> Dict[str, Any]:
+    """在后台线程中直接分析上传的源码（不落盘），返回 Slither 风格报告（检测与合约信息提取共用一次编译）"""
+    return _analyze_source_checked(content, filename, cache_key)[0]
+
+
+def _analyze_source_checked(content: bytes, filename: str, cache_key: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+    """
+    同 _analyze_source，另返回分析是否完整
+    只缓存完整的报告：solc 无法安装或编译失败时报告缺少 AST / IR 规则的结果，不应在 solc 恢复后继续返回
+    """
+    start_time = time.time()
+    record = get_engine().analyze_source(content, filename)
+    report = _build_report(record, filename, time.time() - start_time)
+    complete = bool(record.get('complete'))
+    if cache_key and complete:
+        _report_cache.put(cache_key, report)
+    return report, complete
+
+
+def _build_report(record: Dict[str, Any], filename: str, analysis_duration: float) -> Dict[str, Any]:
+    """由单个文件的分析记录生成 Slither 风格报告"""
+    bus = get_engine().events
+    start_time = time.perf_counter()
+    report = _build_report_data(record, filename, analysis_duration)
+    if bus.wants('stage_end'):
+        bus.emit('stage_end', stage='report', file=filename, duration=time.perf_counter() - start_time)
+    return report
+
+
+def _build_report_data(record: Dict[str, Any], filename: str, analysis_duration: float) -> Dict[str, Any]:
+    results = record['results']
+    contracts_info = record['contracts']
+    solidity_version = record['solidity_version']
+
+    # 生成 Slither 风格报告
+    analysis_metadata = SlitherReportGenerator.create_analysis_metadata(
+        target=filename,
+        solidity_version=solidity_version,
+        analysis_duration=analysis_duration
+    )
+
+    # 为结果添加文件路径
+    for result in results:
+        result['file'] = filename
+
+    # 生成报告数据（不写入文件）
+    return SlitherReportGenerator.build_slither_report(
+        results=results,
+        contracts_info=contracts_info,
+        analysis_metadata=analysis_metadata
+    )
+
+
+def _stream_source(content: bytes, filename: str, emit, cancelled: threading.Event):
+    """
+    在后台线程中逐步分析源码，通过 emit 把事件交给事件循环
+    最后一个事件 finished 携带完整报告；客户端断开（cancelled 被设置）后提前停止
+    """
+    start_time = time.time()
+    events = get_engine().iter_analyze_source(content, filename)
+    try:
+        for event in events:
+            if cancelled.is_set():
+                return
+            if event['event'] == 'finished':
+                report = _build_report(event['record'], filename, time.time() - start_time)
+                event = {'event': 'finished', 'summary': report['summary'], 'report': report}
+            elif event['event'] == 'detector':
+                for issue in event['issues']:
+                    issue['file'] = filename
+            emit(event)
+    except Exception as e:
+        emit({'event': 'error', 'error': str(e)})
+    finally:
+        events.close()
+        emit(None)
+
+
+def _submit(fn, *args, name: str = '', cleanup=None, store: bool = True):
+    """提交分析任务；队列已满时执行 cleanup 清理临时文件并返回 429"""
+    try:
+        return get_job_queue().submit(fn, *args, name=name, store=store)
+    except QueueFullError as e:
+        if cleanup is not None:
+            cleanup()
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+
+
+async def _read_source(file: UploadFile) -> Tuple[bytes, str]:
+    """校验并分块读取上传的合约，读取的同时计算 SHA-256；源码只保存在内存中"""
     if not file.filename.endswith(".sol"):
         raise HTTPException(status_code=400, detail="Only .sol files are supported")
-    
-    file_id = str(uuid.uuid4())
-    file_path = os.path.join(UPLOAD_DIR, f"{file_id}_{file.filename}")
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
+    digest = hashlib.sha256()
+    chunks = []
+    while True:
+        chunk = await file.read(64 * 1024)
+        if not chunk:
+            break
+        digest.update(chunk)
+        chunks.append(chunk)
+    content = b"".join(chunks)
+    try:
+        content.decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Source file must be UTF-8 encoded")
+    return content, digest.hexdigest()
+
+
+def _report_key(digest: str, filename: str) -> str:
+    return DiskCache.make_key(digest, filename, get_engine().fingerprint)
+
+
+def _etag_matches(request: Request, etag: str, exists: bool = False) -> bool:
+    """
+    If-None-Match 是否命中（支持多个值与弱校验前缀 W/）
+    * 只在已有该内容的完整报告（exists 为 True）时命中，否则未分析过的内容也会返回 304
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return any((t == "*" and exists) or (t[2:] if t.startswith("W/") else t) == etag for t in tags)
+
+
+async def _submit_upload(file: UploadFile, store: bool = True):
+    content, digest = await _read_source(file)
+    key = _report_key(digest, file.filename)
+    # 相同内容已有完整报告时直接登记为已完成的任务，不再排队分析
+    report_data = _report_cache.get(key)
+    if report_data is not None:
+        return get_job_queue().add_done(report_data, name=file.filename)
+    return _submit(_analyze_source, content, file.filename, key, name=file.filename, store=store)
+
+
+async def _read_limited(file: UploadFile, max_bytes: int) -> bytes:
+    """分块读取上传内容，超过 max_bytes 时返回 413"""
+    chunks = []
+    total = 0
+    while True:
+        chunk = await file.read(1024 * 1024)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Archive exceeds {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def _extract_archive(file: UploadFile):
+    """校验并解压上传的压缩包到私有临时目录，返回 (临时目录, .sol 文件列表)"""
+    if not archive_kind(file.filename or ""):
+        raise HTTPException(status_code=400, detail="Only .zip, .tar.gz, .tgz and .tar archives are supported")
+    data = await _read_limited(file, ARCHIVE_MAX_UPLOAD_BYTES)
+    # mkdtemp 创建的目录仅当前用户可访问
+    tmp_dir = tempfile.mkdtemp(prefix="sca-archive-")
+    try:
+        files = await asyncio.to_thread(
+            extract_sol_files, data, file.filename, tmp_dir,
+            max_files=ARCHIVE_MAX_FILES, max_bytes=ARCHIVE_MAX_BYTES,
+        )
+    except ArchiveLimitError as e:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise HTTPException(status_code=413, detail=str(e))
+    except ArchiveError as e:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail=str(e))
+    return tmp_dir, files
+
+
+def _analyze_archive(tmp_dir: str, files, archive_name: str) -> Dict[str, Any]:
+    """在后台线程中并行分析解压出的合约，合并为一份 Slither 风格报告"""
     try:
         start_time = time.time()
-        
-        # 初始化引擎并分析
-        engine = AnalyzerEngine()
-        engine.load_plugins()
-        results = engine.analyze_file(file_path)
-        
-        # 提取合约信息
-        contracts_info = []
-        solidity_version = None
+        # 所有压缩包任务共享同一个进程池，并发任务数不会成倍增加工作进程
+        pool = get_archive_pool()
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            ast_parser = ASTParser()
-            ast = ast_parser.parse(content)
-            if ast:
-                contracts_info = SlitherReportGenerator.extract_contracts_info(
-                    ast, file.filename, content
-                )
-                solidity_version = engine._extract_solidity_version(content)
-        except Exception as e:
-            print(f"[警告] 无法提取合约信息: {e}")
-        
+            records = get_engine().analyze_paths(files, jobs=ARCHIVE_JOBS, pool=pool)
+        except BrokenProcessPool:
+            _reset_archive_pool(pool)
+            raise
         analysis_duration = time.time() - start_time
-        
-        # 生成 Slither 风格报告
+
+        all_results = []
+        all_contracts = []
+        solidity_version = None
+        for record in records:
+            # 报告中使用压缩包内的相对路径
+            rel_path = os.path.relpath(record['file'], tmp_dir).replace(os.sep, '/')
+            for contract in record['contracts']:
+                contract['source_file'] = rel_path
+            all_contracts.extend(record['contracts'])
+            if not solidity_version:
+                solidity_version = record['solidity_version']
+            for result in record['results']:
+                result['file'] = rel_path
+                all_results.append(result)
+
         analysis_metadata = SlitherReportGenerator.create_analysis_metadata(
-            target=file.filename,
+            target=archive_name,
             solidity_version=solidity_version,
             analysis_duration=analysis_duration
         )
-        
-        # 为结果添加文件路径
-        for result in results:
-            result['file'] = file.filename
-        
-        # 生成报告数据（不写入文件）
-        report_data = SlitherReportGenerator.generate_slither_report(
-            results=results,
-            contracts_info=contracts_info,
-            analysis_metadata=analysis_metadata,
-            output_path=os.path.join(UPLOAD_DIR, f"{file_id}_report.json")
+        analysis_metadata["files_analyzed"] = len(records)
+        return SlitherReportGenerator.build_slither_report(
+            results=all_results,
+            contracts_info=all_contracts,
+            analysis_metadata=analysis_metadata
         )
-        
-        # Cleanup
-        os.remove(file_path)
-        report_file = os.path.join(UPLOAD_DIR, f"{file_id}_report.json")
-        if os.path.exists(report_file):
-            os.remove(report_file)
-        
-        return {
-            "status": "success",
-            "report": report_data
-        }
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+async def _submit_archive(file: UploadFile, store: bool = True):
+    tmp_dir, files = await _extract_archive(file)
+    return _submit(
+        _analyze_archive, tmp_dir, files, file.filename,
+        name=file.filename,
+        cleanup=lambda: shutil.rmtree(tmp_dir, ignore_errors=True),
+        store=store,
+    )
+
+
+async def _wait(job) -> Dict[str, Any]:
+    """等待后台任务完成，不阻塞事件循环"""
+    try:
+        return await asyncio.wrap_future(job.future)
     except Exception as e:
-        if os.path.exists(file_path):
-            os.remove(file_path)
         raise HTTPException(status_code=500, detail=str(e))
 
+
+async def _analyze_upload(request: Request, file: UploadFile, variant: str = "json"):
+    """
+    同步接口：相同内容（且引擎指纹未变）直接返回缓存的报告，否则提交到后台线程池并等待结果
+    返回 (报告, ETag, 是否命中缓存)；If-None-Match 命中时报告为 None，调用方应返回 304；
+    分析不完整（如编译失败）时报告未缓存，ETag 为 None
+    """
+    content, digest = await _read_source(file)
+    key = _report_key(digest, file.filename)
+    etag = f'"{key[:32]}-{variant}"'
+    report_data = _report_cache.get(key)
+    if _etag_matches(request, etag, exists=report_data is not None):
+        return None, etag, True
+    if report_data is not None:
+        return report_data, etag, True
+    job = _submit(_analyze_source_checked, content, file.filename, key, name=file.filename, store=False)
+    report_data, complete = await _wait(job)
+    return report_data, etag if complete else None, False
+
+
+def _cache_headers(etag: Optional[str], hit: bool) -> Dict[str, str]:
+    """完整的报告带 ETag；不完整的报告禁止客户端与代理缓存"""
+    headers = {"X-Cache": "HIT" if hit else "MISS"}
+    if etag is None:
+        headers["Cache-Control"] = "no-store"
+    else:
+        headers["ETag"] = etag
+    return headers
+
+@app.post("/api/analyze")
+async def analyze_contract(request: Request, file: UploadFile = File(...)):
+    report_data, etag, hit = await _analyze_upload(request, file)
+    if report_data is None:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(
+        content={
+            "status": "success",
+            "report": report_data
+        },
+        headers=_cache_headers(etag, hit),
+    )
+
 @app.post("/api/analyze/html")
-async def analyze_contract_html(file: UploadFile = File(...)):
+async def analyze_contract_html(request: Request, file: UploadFile = File(...)):
     """生成 HTML 格式的报告"""
-    if not file.filename.endswith(".sol"):
-        raise HTTPException(status_code=400, detail="Only .sol files are supported")
-    
-    file_id = str(uuid.uuid4())
-    file_path = os.path.join(UPLOAD_DIR, f"{file_id}_{file.filename}")
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    try:
-        start_time = time.time()
-        
-        # 初始化引擎并分析
-        engine = AnalyzerEngine()
-        engine.load_plugins()
-        results = engine.analyze_file(file_path)
-        
-        # 提取合约信息
-        contracts_info = []
-        solidity_version = None
+    report_data, etag, hit = await _analyze_upload(request, file, variant="html")
+    if report_data is None:
+        return Response(status_code=304, headers={"ETag": etag})
+    html_content = HTMLReportGenerator._generate_html_content(report_data)
+    return HTMLResponse(
+        content=html_content,
+        media_type="text/html",
+        headers=_cache_headers(etag, hit),
+    )
+
+@app.post("/api/analyze/stream")
+async def analyze_contract_stream(file: UploadFile = File(...), format: str = "ndjson"):
+    """
+    流式分析：逐个推送进度与检测结果事件，format=ndjson（每行一个 JSON）或 sse（Server-Sent Events）
+    纯文本规则的结果在编译开始前即可到达，最后一个事件 finished 携带汇总与完整报告
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or sse")
+    content, _ = await _read_source(file)
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def emit(event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    _submit(_stream_source, content, file.filename, emit, cancelled, name=file.filename, store=False)
+
+    async def body():
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            ast_parser = ASTParser()
-            ast = ast_parser.parse(content)
-            if ast:
-                contracts_info = SlitherReportGenerator.extract_contracts_info(
-                    ast, file.filename, content
-                )
-                solidity_version = engine._extract_solidity_version(content)
-        except Exception as e:
-            print(f"[警告] 无法提取合约信息: {e}")
-        
-        analysis_duration = time.time() - start_time
-        
-        # 生成 Slither 风格报告
-        analysis_metadata = SlitherReportGenerator.create_analysis_metadata(
-            target=file.filename,
-            solidity_version=solidity_version,
-            analysis_duration=analysis_duration
-        )
-        
-        # 为结果添加文件路径
-        for result in results:
-            result['file'] = file.filename
-        
-        # 构建报告数据
-        vulnerabilities = []
-        informational_findings = []
-        vuln_id_counter = 1
-        info_id_counter = 1
-        
-        for result in results:
-            severity = result.get('severity', 'Low')
-            item = {
-                "detector": result.get('detector', 'unknown'),
-                "severity": severity,
-                "swc_id": result.get('swc_id', result.get('detector', '')),
-                "title": result.get('title', result.get('desc', 'Security Issue')),
-                "description": result.get('desc', result.get('msg', '')),
-                "contract": result.get('contract', ''),
-                "function": result.get('function', None),
-                "location": {
-                    "file": result.get('file', ''),
-                    "start_line": result.get('line', 0),
-                    "end_line": result.get('end_line', result.get('line', 0))
-                },
-                "code_snippet": result.get('code', ''),
-                "fix_suggestion": result.get('fix_suggestion', 'Please review the code and apply security best practices.'),
-                "confidence": result.get('confidence', 'High')
-            }
-            
-            if severity in ['High', 'Medium', 'Low']:
-                item['id'] = f"VULN-{vuln_id_counter:03d}"
-                vuln_id_counter += 1
-                vulnerabilities.append(item)
-            else:
-                item['id'] = f"INFO-{info_id_counter:03d}"
-                info_id_counter += 1
-                informational_findings.append(item)
-        
-        summary = {
-            "total_vulnerabilities": len(vulnerabilities),
-            "high_severity": sum(1 for v in vulnerabilities if v['severity'] == 'High'),
-            "medium_severity": sum(1 for v in vulnerabilities if v['severity'] == 'Medium'),
-            "low_severity": sum(1 for v in vulnerabilities if v['severity'] == 'Low'),
-            "informational": len(informational_findings),
-            "total_contracts_analyzed": len(contracts_info)
-        }
-        
-        report_data = {
-            "sca_version": "1.0.0",
-            "analysis_metadata": analysis_metadata,
-            "contracts_analyzed": contracts_info,
-            "vulnerabilities": vulnerabilities,
-            "informational_findings": informational_findings,
-            "summary": summary
-        }
-        
-        # 生成 HTML
-        html_content = HTMLReportGenerator._generate_html_content(report_data)
-        
-        # Cleanup
-        os.remove(file_path)
-        
-        return HTMLResponse(content=html_content, media_type="text/html")
-    except Exception as e:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise HTTPException(status_code=500, detail=str(e))
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                data = json.dumps(event, ensure_ascii=False, default=str)
+                if format == "sse":
+                    yield f"event: {event['event']}\ndata: {data}\n\n"
+                else:
+                    yield data + "\n"
+        finally:
+            # 客户端断开时通知后台线程停止
+            cancelled.set()
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+@app.post("/api/analyze/archive")
+async def analyze_archive(file: UploadFile = File(...)):
+    """上传整个项目的压缩包（zip / tar.gz），并行分析其中所有 .sol 文件，返回合并后的报告"""
+    report_data = await _wait(await _submit_archive(file, store=False))
+    return {
+        "status": "success",
+        "report": report_data
+    }
+
+def _job_response(job) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/jobs/{job.id}",
+        "report_url": f"/api/jobs/{job.id}/report",
+    }
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...)):
+    """提交异步分析任务，立即返回任务 ID"""
+    return _job_response(await _submit_upload(file))
+
+@app.post("/api/jobs/archive", status_code=202)
+async def create_archive_job(file: UploadFile = File(...)):
+    """以异步任务方式分析压缩包，结果通过 /api/jobs/{job_id}/report 获取"""
+    return _job_response(await _submit_archive(file))
+
+def _get_job(job_id: str):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查询任务状态"""
+    job = _get_job(job_id)
+    data = job.to_dict()
+    data["queue_position"] = get_job_queue().position(job)
+    return data
+
+@app.get("/api/jobs/{job_id}/report")
+async def get_job_report(job_id: str, format: str = "json"):
+    """获取已完成任务的报告；未完成时返回 202 与当前状态，format=html 时返回 HTML 报告"""
+    job = _get_job(job_id)
+    if job.status == FAILED:
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != DONE:
+        data = job.to_dict()
+        data["queue_position"] = get_job_queue().position(job)
+        return JSONResponse(status_code=202, content=data)
+    if format == "html":
+        return HTMLResponse(content=HTMLReportGenerator._generate_html_content(job.result), media_type="text/html")
+    return {
+        "status": "success",
+        "report": job.result
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 文本格式的指标：各阶段与检测器耗时直方图、队列深度、缓存命中率、solc 调用次数、错误计数"""
+    return PlainTextResponse(_metrics.registry.render(), media_type=_metrics.registry.CONTENT_TYPE)
 
 @app.post("/api/import-report")
 async def import_report(file: UploadFile = File(...)):
@@ -0,0 +1,2 @@
+"""基准测试：确定性的合成合约生成器与分阶段耗时 / 内存测量"""
+from .generator import SIZES, ContractGenerator, generate_corpus
@@ -0,0 +1,158 @@
+import random
+from typing import Dict, List
+
+# 预设规模：每个合约的函数数、语句嵌套深度、每个文件的合约数、外部调用 / 循环密度
+SIZES: Dict[str, Dict[str, float]] = {
+    'small': {'functions': 5, 'depth': 1, 'contracts': 1, 'call_density': 0.3, 'loop_density': 0.2},
+    'medium': {'functions': 20, 'depth': 2, 'contracts': 2, 'call_density': 0.3, 'loop_density': 0.2},
+    'large': {'functions': 60, 'depth': 3, 'contracts': 4, 'call_density': 0.3, 'loop_density': 0.2},
+}
+
+# 外部调用语句模板：覆盖各检测规则的触发词（call / send / transfer / delegatecall / transferFrom / tx.origin 等）
+_CALL_TEMPLATES = (
+    '{target}.call{{value: {amount}}}("");',
+    '(bool ok{n}, ) = {target}.call{{value: {amount}}}(""); require(ok{n});',
+    'payable({target}).transfer({amount});',
+    'payable({target}).send({amount});',
+    '{target}.delegatecall(abi.encodeWithSignature("f()"));',
+    'token.transferFrom({target}, address(this), {amount});',
+    'require(tx.origin == owner);',
+    'payable(msg.sender).transfer({amount});',
+)
+
+# 普通语句模板：状态变量读写、算术运算、映射访问
+_PLAIN_TEMPLATES = (
+    'total{k} += {amount};',
+    'balances[{target}] = balances[{target}] + {amount};',
+    'uint256 tmp{n} = total{k} * {amount} / (rate + 1);',
+    'counter = counter + 1;',
+    'lastCaller = msg.sender;',
+)
+
+
+class ContractGenerator:
+    """
+    确定性的 Solidity 合成语料生成器
+
+    相同的参数与 seed 总是生成相同的源码，用于基准测试在不同提交之间对比。
+    生成的代码语法合法（solidity ^0.8），并按密度插入外部调用与循环以触发各检测规则。
+    """
+
+    def __init__(self, functions: int = 10, depth: int = 2, contracts: int = 1,
+                 call_density: float = 0.3, loop_density: float = 0.2, seed: int = 0,
+                 solidity_version: str = '0.8.20'):
+        self.functions = int(functions)
+        self.depth = int(depth)
+        self.contracts = int(contracts)
+        self.call_density = float(call_density)
+        self.loop_density = float(loop_density)
+        self.seed = seed
+        self.solidity_version = solidity_version
+
+    @classmethod
+    def preset(cls, size: str, seed: int = 0, solidity_version: str = '0.8.20') -> 'ContractGenerator':
+        """按预设规模名（small / medium / large）创建生成器"""
+        if size not in SIZES:
+            raise ValueError(f"未知的规模: {size}（可选: {', '.join(SIZES)}）")
+        return cls(seed=seed, solidity_version=solidity_version, **SIZES[size])
+
+    @property
+    def params(self) -> Dict[str, object]:
+        return {
+            'functions': self.functions,
+            'depth': self.depth,
+            'contracts': self.contracts,
+            'call_density': self.call_density,
+            'loop_density': self.loop_density,
+            'seed': self.seed,
+            'solidity_version': self.solidity_version,
+        }
+
+    def generate(self) -> str:
+        """生成一个源文件"""
+        rng = random.Random(self.seed)
+        lines = [
+            '// SPDX-License-Identifier: MIT',
+            f'pragma solidity {self.solidity_version};',
+            '',
+            'interface IERC20 {',
+            '    function transferFrom(address from, address to, uint256 amount) external returns (bool);',
+            '}',
+            '',
+        ]
+        for c in range(self.contracts):
+            lines.extend(self._contract(rng, c))
+            lines.append('')
+        return '\n'.join(lines)
+
+    def _contract(self, rng: random.Random, index: int) -> List[str]:
+        lines = [
+            f'contract Bench{index} {{',
+            '    address public owner;',
+            '    address public lastCaller;',
+            '    IERC20 public token;',
+            '    uint256 public rate;',
+            '    uint256 counter;',
+            '    mapping(address => uint256) public balances;',
+        ]
+        lines.extend(f'    uint256 public total{k};' for k in range(3))
+        lines.extend([
+            '',
+            '    constructor(IERC20 _token) {',
+            '        owner = msg.sender;',
+            '        token = _token;',
+            '    }',
+            '',
+            '    modifier onlyOwner() {',
+            '        require(msg.sender == owner);',
+            '        _;',
+            '    }',
+        ])
+        for f in range(self.functions):
+            lines.append('')
+            lines.extend(self._function(rng, f))
+        lines.append('}')
+        return lines
+
+    def _function(self, rng: random.Random, index: int) -> List[str]:
+        visibility = rng.choice(('external', 'public'))
+        modifier = ' onlyOwner' if rng.random() < 0.3 else ''
+        lines = [f'    function f{index}(address target, uint256 amount) {visibility} payable{modifier} {{']
+        counter = [0]
+        lines.extend(self._block(rng, self.depth, 2, counter))
+        lines.append('    }')
+        return lines
+
+    def _block(self, rng: random.Random, depth: int, indent: int, counter: List[int]) -> List[str]:
+        pad = '    ' * indent
+        lines = []
+        for _ in range(rng.randint(2, 4)):
+            counter[0] += 1
+            n = counter[0]
+            roll = rng.random()
+            if depth > 0 and roll < self.loop_density:
+                # 循环体内按 loop_density 的一半概率使用 msg.value
+                amount = 'msg.value' if rng.random() < 0.5 else 'amount'
+                lines.append(f'{pad}for (uint256 i{n} = 0; i{n} < {rng.randint(2, 8)}; i{n}++) {{')
+                lines.append(f'{pad}    total{n % 3} += {amount};')
+                lines.extend(self._block(rng, depth - 1, indent + 1, counter))
+                lines.append(f'{pad}}}')
+            elif depth > 0 and roll < self.loop_density * 2:
+                lines.append(f'{pad}if (amount > {rng.randint(1, 1000)}) {{')
+                lines.extend(self._block(rng, depth - 1, indent + 1, counter))
+                lines.append(f'{pad}}}')
+            elif rng.random() < self.call_density:
+                template = rng.choice(_CALL_TEMPLATES)
+                lines.append(pad + template.format(target='target', amount='amount', n=n))
+            else:
+                template = rng.choice(_PLAIN_TEMPLATES)
+                lines.append(pad + template.format(target='target', amount='amount', n=n, k=n % 3))
+        return lines
+
+
+def generate_corpus(size: str, files: int = 1, seed: int = 0, solidity_version: str = '0.8.20') -> Dict[str, str]:
+    """生成 {文件名: 源码}，每个文件使用不同的 seed"""
+    return {
+        f'bench_{size}_{i}.sol': ContractGenerator.preset(size, seed=seed + i, solidity_version=solidity_version).generate()
+        for i in range(files)
+    }
@@ -0,0 +1,273 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.ast_index import ASTIndex
+from core.ast_nodes import compact_ast
+from core.ast_parser import ASTParser
+from core.context import AnalysisContext
+from core.data_flow import DataFlowAnalyzer
+from core.engine import AnalyzerEngine
+from core.events import EventBus
+from core.lexer import MaskedSource
+from core.reporter import ReportGenerator, SlitherReportGenerator, HTMLReportGenerator
+from core.sca_ir import SCAIRBuilder
+from benchmarks.generator import SIZES, ContractGenerator
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# 低于该差值的耗时 / 内存变化视为噪声，不判定为回归
+MIN_DELTA_SECONDS = 0.0005
+MIN_DELTA_BYTES = 64 * 1024
+
+
+def installed_solc_version() -> Optional[str]:
+    """已安装的 solc 版本（取最新）；未安装时返回 None，基准测试跳过需要编译的阶段"""
+    try:
+        import solcx
+        versions = solcx.get_installed_solc_versions()
+    except Exception:
+        return None
+    return str(max(versions)) if versions else None
+
+
+def measure(fn: Callable[[], Any], repeat: int, memory: bool = True) -> Dict[str, Any]:
+    """
+    运行 fn repeat 次，返回耗时中位数 / 最小值（秒）；memory=True 时另跑一次 tracemalloc 记录峰值内存
+    计时与内存分开测量，避免 tracemalloc 的开销计入耗时
+    """
+    times = []
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    result = {'seconds': statistics.median(times), 'min_seconds': min(times), 'repeat': len(times)}
+    if memory:
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn()
+            result['peak_bytes'] = max(tracemalloc.get_traced_memory()[1] - base, 0)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+class BenchmarkRunner:
+    """
+    分阶段基准测试：对每个规模的合成合约分别测量
+      parse                 ASTParser.parse（需要已安装 solc，否则跳过）
+      index / lex           AST 节点索引、屏蔽注释与字符串的词法扫描
+      compact               把 AST 转换为紧凑的 ASTNode 树（--compact-ast），峰值内存即转换后的树
+      ir                    SCAIRBuilder.build（无 AST 时测量 build_from_text，阶段名为 ir_text）
+      dataflow              DataFlowAnalyzer
+      detector:<id>         每个检测器在共享输入已构建的上下文上运行
+      analyze               引擎对单个文件的完整分析（不含编译）
+      report:<format>       每种报告生成器
+    """
+
+    def __init__(self, sizes: List[str], repeat: int = 5, seed: int = 0, memory: bool = True,
+                 detectors: Optional[List[str]] = None, solc_version: Optional[str] = None):
+        self.sizes = sizes
+        self.repeat = repeat
+        self.seed = seed
+        self.memory = memory
+        self.solc_version = solc_version if solc_version is not None else installed_solc_version()
+        # 基准测试只关心耗时，引擎日志不输出
+        self.engine = AnalyzerEngine(events=EventBus())
+        self.engine.load_plugins(verbose=False, include=detectors)
+        self.parser = ASTParser()
+        self.ir_builder = SCAIRBuilder()
+
+    def run(self) -> Dict[str, Any]:
+        if self.solc_version is None:
+            print("[警告] 未找到已安装的 solc，跳过 parse 及依赖 AST 的阶段（检测器仍按纯文本模式运行）")
+        results: Dict[str, Any] = {}
+        for size in self.sizes:
+            generator = ContractGenerator.preset(size, seed=self.seed, solidity_version=self.solc_version or '0.8.20')
+            print(f"[*] 基准测试 {size}: {generator.params}")
+            results[size] = {
+                'params': generator.params,
+                'stages': self.run_size(generator.generate()),
+            }
+        return {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'solc': self.solc_version,
+                'repeat': self.repeat,
+                'detectors': [d.id for d in self.engine.detectors],
+            },
+            'results': results,
+        }
+
+    def run_size(self, content: str) -> Dict[str, Dict[str, Any]]:
+        stages: Dict[str, Dict[str, Any]] = {}
+        filename = 'Bench.sol'
+
+        def bench(name: str, fn: Callable[[], Any]):
+            stages[name] = measure(fn, self.repeat, self.memory)
+            print(f"    {name:<44}{stages[name]['seconds'] * 1000:>10.3f} ms")
+
+        ast = None
+        if self.solc_version is not None:
+            ast = self.parser.parse(content)
+            if ast is None:
+                print("[警告] 生成的合约编译失败，跳过依赖 AST 的阶段")
+            else:
+                bench('parse', lambda: self.parser.parse(content))
+                bench('index', lambda: ASTIndex(ast))
+                bench('compact', lambda: compact_ast(ast))
+        bench('lex', lambda: self.engine.patterns.scan(MaskedSource(content)))
+
+        # 共享输入预先构建，检测器阶段只测量检测器自身
+        ctx = AnalysisContext(content=content, filename=filename, ast=ast,
+                              ir_loader=self.engine._build_ir, pattern_set=self.engine.patterns)
+        if ast is not None:
+            bench('ir', lambda: self.ir_builder.build(ast, content))
+            bench('dataflow', lambda: DataFlowAnalyzer(ast).analyze())
+            ctx.index
+        else:
+            bench('ir_text', lambda: self.ir_builder.build_from_text(content))
+        ctx.ir
+        ctx.dataflow
+        ctx.pattern_hits(SCAIRBuilder.TEXT_PATTERN_OWNER)
+
+        for detector in self.engine.detectors:
+            bench(f'detector:{detector.id}', lambda d=detector: d.run(ctx))
+
+        record: Dict[str, Any] = {}
+
+        def analyze():
+            record.update(self.engine._analyze_content(filename, content, ast=ast))
+
+        bench('analyze', analyze)
+        self.run_reporters(record, bench)
+        return stages
+
+    def run_reporters(self, record: Dict[str, Any], bench: Callable[[str, Callable[[], Any]], None]):
+        results = [dict(issue, file=record['file']) for issue in record['results']]
+        metadata = SlitherReportGenerator.create_analysis_metadata(target=record['file'], solidity_version=record['solidity_version'])
+        report_data = SlitherReportGenerator.build_slither_report(results, record['contracts'], metadata)
+        with tempfile.TemporaryDirectory() as tmp:
+            def quiet(fn):
+                # 报告生成器会打印生成信息，基准测试中丢弃
+                def call():
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        fn()
+                return call
+            bench('report:json', quiet(lambda: ReportGenerator.generate_json(results, os.path.join(tmp, 'r.json'))))
+            bench('report:junit', quiet(lambda: ReportGenerator.generate_junit(results, os.path.join(tmp, 'r.xml'))))
+            bench('report:sarif', quiet(lambda: ReportGenerator.generate_sarif(results, os.path.join(tmp, 'r.sarif'))))
+            bench('report:slither', lambda: SlitherReportGenerator.build_slither_report(results, record['contracts'], metadata))
+            bench('report:html', quiet(lambda: HTMLReportGenerator.generate_html_report(report_data, os.path.join(tmp, 'r.html'))))
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.25,
+            memory_tolerance: float = 0.25) -> Tuple[List[str], List[str]]:
+    """
+    与基线对比，返回 (回归列表, 提示列表)
+    耗时超过基线 (1 + tolerance) 倍且差值大于 MIN_DELTA_SECONDS 视为回归；峰值内存同理
+    """
+    regressions: List[str] = []
+    notes: List[str] = []
+    for size, entry in current.get('results', {}).items():
+        base_entry = baseline.get('results', {}).get(size)
+        if base_entry is None:
+            notes.append(f"{size}: 基线中没有该规模")
+            continue
+        if base_entry.get('params') != entry.get('params'):
+            notes.append(f"{size}: 生成参数与基线不同，结果不可比")
+            continue
+        base_stages = base_entry.get('stages', {})
+        for stage, result in entry.get('stages', {}).items():
+            base = base_stages.get(stage)
+            if base is None:
+                notes.append(f"{size}/{stage}: 基线中没有该阶段")
+                continue
+            seconds, base_seconds = result['seconds'], base['seconds']
+            if seconds > base_seconds * (1 + tolerance) and seconds - base_seconds > MIN_DELTA_SECONDS:
+                regressions.append(
+                    f"{size}/{stage}: 耗时 {base_seconds * 1000:.3f} ms -> {seconds * 1000:.3f} ms "
+                    f"(+{(seconds / base_seconds - 1) * 100 if base_seconds else float('inf'):.0f}%)")
+            peak, base_peak = result.get('peak_bytes'), base.get('peak_bytes')
+            if peak is not None and base_peak is not None:
+                if peak > base_peak * (1 + memory_tolerance) and peak - base_peak > MIN_DELTA_BYTES:
+                    regressions.append(f"{size}/{stage}: 峰值内存 {base_peak / 1024:.1f} KB -> {peak / 1024:.1f} KB")
+        for stage in base_stages:
+            if stage not in entry.get('stages', {}):
+                notes.append(f"{size}/{stage}: 本次未运行（如缺少 solc 或检测器被排除）")
+    return regressions, notes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mini-Slither 基准测试：合成合约语料上的分阶段耗时与峰值内存")
+    parser.add_argument("--sizes", default="small,medium,large", help=f"逗号分隔的规模（可选: {', '.join(SIZES)}）")
+    parser.add_argument("--repeat", type=int, default=5, help="每个阶段的重复次数，取中位数")
+    parser.add_argument("--seed", type=int, default=0, help="生成器随机种子")
+    parser.add_argument("--detectors", help="只测量指定的检测规则，逗号分隔")
+    parser.add_argument("--no-memory", action="store_true", help="不使用 tracemalloc 测量峰值内存")
+    parser.add_argument("--output", "-o", help="把本次结果写入 JSON 文件")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线 JSON 文件（默认 benchmarks/baseline.json）")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--no-compare", action="store_true", help="只测量不与基线对比（没有基线文件时也不报错）")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="耗时允许超出基线的比例（默认 0.25）")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25, help="峰值内存允许超出基线的比例（默认 0.25）")
+    args = parser.parse_args(argv)
+
+    sizes = [s.strip() for s in args.sizes.split(',') if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        print(f"[错误] 未知的规模: {', '.join(unknown)}")
+        return 2
+    detectors = [d.strip() for d in args.detectors.split(',') if d.strip()] if args.detectors else None
+    # 缺少基线时直接失败（在耗时的测量之前），避免回归检查被静默跳过
+    compare_baseline = not (args.save_baseline or args.no_compare)
+    if compare_baseline and not os.path.exists(args.baseline):
+        print(f"[错误] 没有基线文件 {args.baseline}：请先用 --save-baseline 在基准提交上创建，或用 --no-compare 只测量")
+        return 2
+
+    runner = BenchmarkRunner(sizes, repeat=args.repeat, seed=args.seed, memory=not args.no_memory, detectors=detectors)
+    current = runner.run()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"[*] 基准结果已写入: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"[*] 基线已保存: {args.baseline}")
+        return 0
+    if not compare_baseline:
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions, notes = compare(current, baseline, args.tolerance, args.memory_tolerance)
+    for note in notes:
+        print(f"[警告] {note}")
+    if regressions:
+        print(f"[错误] 发现 {len(regressions)} 项性能回归（基线: {args.baseline}）:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"[*] 与基线对比未发现性能回归（容差 {args.tolerance:.0%}）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
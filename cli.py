@@ -1,11 +1,21 @@
 import argparse
+import cProfile
 import os
 import sys
 import time
 import json
 from core.engine import AnalyzerEngine
 from core.reporter import ReportGenerator, SlitherReportGenerator, HTMLReportGenerator
-from core.ast_parser import ASTParser
+from core.cache import DiskCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from core.events import EventBus, ConsoleSink, QuietSink, ProgressSink, JsonLinesSink
+from core.profiler import ProfileSink, SORT_KEYS
+from core.manifest import Manifest, DEFAULT_MANIFEST_NAME
+
+def _split_names(value):
+    """解析逗号分隔的检测规则列表"""
+    if not value:
+        return None
+    return [v.strip() for v in value.split(',') if v.strip()]
 
 def main():
     parser = argparse.ArgumentParser(description="Mini-Slither: 智能合约静态分析工具教学版")
@@ -13,8 +23,46 @@ def main():
     parser.add_argument("--format", choices=["text", "json", "junit", "sarif", "slither", "html"], default="text", help="输出格式")
     parser.add_argument("--output", "-o", help="报告输出路径")
     parser.add_argument("--import-report", help="导入已存在的 JSON 报告文件")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="并行分析的进程数（0 表示使用全部 CPU 核心）")
+    parser.add_argument("--detectors", help="只运行指定的检测规则，逗号分隔的规则 ID 或类名（如 SWC-115,PragmaVersionDetector）")
+    parser.add_argument("--exclude-detectors", help="排除指定的检测规则，逗号分隔的规则 ID 或类名")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="AST 缓存目录（默认 ~/.cache/smart-contract-analyzer，可用 SCA_CACHE_DIR 覆盖）")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="缓存容量上限（MB，至少为 1），超出后按 LRU 淘汰")
+    parser.add_argument("--no-cache", action="store_true", help="禁用 AST 缓存，每次都调用 solc 编译")
+    parser.add_argument("--cache-stats", action="store_true", help="显示缓存统计信息后退出")
+    parser.add_argument("--cache-clear", action="store_true", help="清空缓存后退出")
+    parser.add_argument("--compact-ast", action="store_true", help="把 AST 转换为紧凑节点（只保留检测器读取的字段），降低大文件的内存占用")
+    parser.add_argument("--quiet", "-q", action="store_true", help="安静模式：引擎只输出错误信息")
+    parser.add_argument("--verbose", "-v", action="store_true", help="输出调试日志（如每个文件的 AST 生成）")
+    parser.add_argument("--progress", action="store_true", help="在终端显示分析进度条（输出到 stderr，非终端时不显示）")
+    parser.add_argument("--trace", help="把引擎事件（文件、阶段、检测器耗时等）以 JSON-lines 写入指定文件")
+    parser.add_argument("--incremental", nargs="?", const="", metavar="MANIFEST",
+                        help=f"增量分析：只重新分析新增或修改的文件，其余沿用清单中的结果（清单默认为目标目录下的 {DEFAULT_MANIFEST_NAME}）")
+    parser.add_argument("--profile", action="store_true", help="统计每个检测器与阶段的耗时、CPU 时间、遍历节点数与问题数，输出排序表格")
+    parser.add_argument("--profile-sort", choices=SORT_KEYS, default="wall", help="性能剖析表格的排序字段（默认 wall）")
+    parser.add_argument("--profile-dump", help="同时用 cProfile 剖析，并把统计数据写入指定文件（可用 pstats / snakeviz 查看）")
+    parser.add_argument("--profile-flamegraph", help="把各文件的阶段 / 检测器耗时以折叠栈文本写入指定文件（flamegraph.pl 输入格式）")
     
     args = parser.parse_args()
+    if args.cache_size <= 0:
+        parser.error("--cache-size 必须为正整数（MB）；不使用缓存请用 --no-cache")
+
+    disk_cache = DiskCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+    cache = None if args.no_cache else disk_cache
+
+    # 缓存管理命令
+    if args.cache_stats or args.cache_clear:
+        if args.cache_clear:
+            removed = disk_cache.purge()
+            print(f"[*] 已清空缓存: 删除 {removed} 个条目 ({disk_cache.directory})")
+        if args.cache_stats:
+            stats = disk_cache.stats()
+            print(f"缓存目录: {stats['directory']}")
+            print(f"  条目数: {stats['entries']}")
+            print(f"  占用: {stats['size_bytes'] / (1024 * 1024):.2f} MB / {stats['max_bytes'] / (1024 * 1024):.0f} MB")
+            for ns, info in sorted(stats['namespaces'].items()):
+                print(f"  [{ns}] 条目 {info['entries']}，占用 {info['size_bytes'] / (1024 * 1024):.2f} MB")
+        return
     
     # 导入报告功能
     if args.import_report:
@@ -60,14 +108,46 @@ def main():
         print(f"[错误] 路径不存在: {target_path}")
         sys.exit(1)
 
-    files_to_analyze = []
-    if os.path.isfile(target_path):
-        files_to_analyze.append(target_path)
-    else:
-        for root, dirs, files in os.walk(target_path):
-            for file in files:
-                if file.endswith(".sol"):
-                    files_to_analyze.append(os.path.join(root, file))
+    # 引擎事件：控制台日志 + 可选的进度条与 JSON-lines 跟踪文件
+    events = EventBus([QuietSink() if args.quiet else ConsoleSink('debug' if args.verbose else 'info')])
+    if args.progress:
+        events.subscribe(ProgressSink())
+    trace_sink = events.subscribe(JsonLinesSink(args.trace)) if args.trace else None
+    profiling = args.profile or bool(args.profile_dump or args.profile_flamegraph)
+    profile_sink = events.subscribe(ProfileSink()) if profiling else None
+
+    # Slither / HTML 报告需要合约信息：即使只选了文本规则也要编译
+    engine = AnalyzerEngine(cache=cache, events=events, compact_ast=args.compact_ast,
+                            need_contracts=args.format in ("slither", "html"))
+    engine.load_plugins(
+        include=_split_names(args.detectors),
+        exclude=_split_names(args.exclude_detectors),
+    )
+    if not engine.detectors:
+        print("[错误] 没有可用的检测规则，请检查 --detectors / --exclude-detectors 参数")
+        sys.exit(1)
+
+    files_to_analyze = engine.collect_files([target_path])
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    # 增量分析：按清单中的 (大小, mtime, 内容哈希) 判断哪些文件需要重新分析
+    manifest = None
+    to_analyze = files_to_analyze
+    if args.incremental is not None:
+        manifest_path = args.incremental or os.path.join(
+            target_path if os.path.isdir(target_path) else os.path.dirname(os.path.abspath(target_path)),
+            DEFAULT_MANIFEST_NAME,
+        )
+        manifest = Manifest.load(manifest_path, events=events)
+        plan = manifest.plan(files_to_analyze, engine.fingerprint, need_contracts=engine.need_contracts)
+        to_analyze = plan['added'] + plan['changed']
+        print(f"[*] 增量分析: 新增 {len(plan['added'])}，修改 {len(plan['changed'])}，"
+              f"未变化 {len(plan['unchanged'])}，已删除 {len(plan['removed'])} ({manifest.path})")
+        manifest.remove(plan['removed'])
+    if profiling and jobs > 1:
+        # 子进程中的事件与 cProfile 数据无法汇总到主进程
+        print("[警告] 性能剖析模式下使用单进程分析，忽略 --jobs")
+        jobs = 1
     
     print(f"[*] 找到 {len(files_to_analyze)} 个合约文件，开始分析...")
     print("-" * 60)
@@ -78,26 +158,38 @@ def main():
     start_time = time.time()
     solidity_version = None
 
-    for file_path in files_to_analyze:
+    # 按 solc 版本分组批量编译，每个版本只启动一次 solc；jobs > 1 时多进程并行
+    profiler = cProfile.Profile() if args.profile_dump else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        records = engine.analyze_paths(to_analyze, jobs=jobs) if to_analyze else []
+    finally:
+        if profiler is not None:
+            profiler.disable()
+
+    if manifest is not None:
+        manifest.update(records, need_contracts=engine.need_contracts)
+        try:
+            manifest.save(engine.fingerprint)
+        except OSError as e:
+            print(f"[警告] 无法写入增量分析清单 {manifest.path}: {e}")
+        # 合并报告：未变化的文件沿用清单中的记录，顺序与完整分析一致
+        fresh = {record['file']: record for record in records}
+        merged = (fresh.get(f) or manifest.record(f) for f in files_to_analyze)
+        records = [record for record in merged if record is not None]
+
+    for record in records:
+        file_path = record['file']
+        results = record['results']
         print(f"正在分析: {os.path.basename(file_path)}")
-        results = engine.analyze_file(file_path)
         
         # 提取合约信息（用于 Slither 报告）
-        if args.format == "slither":
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                ast_parser = ASTParser()
-                ast = ast_parser.parse(content)
-                if ast:
-                    contracts = SlitherReportGenerator.extract_contracts_info(ast, file_path, content)
-                    all_contracts.extend(contracts)
-                    
-                    # 提取 Solidity 版本
-                    if not solidity_version:
-                        solidity_version = engine._extract_solidity_version(content)
-            except Exception as e:
-                print(f"  [警告] 无法提取合约信息: {e}")
+        if args.format in ("slither", "html"):
+            all_contracts.extend(record['contracts'])
+            # 提取 Solidity 版本（来自 pragma，不依赖合约信息）
+            if not solidity_version:
+                solidity_version = record['solidity_version']
         
         if results:
             for issue in results:
@@ -121,6 +213,28 @@ def main():
 
     analysis_duration = time.time() - start_time
     print(f"[*] 分析完成。共发现 {total_issues} 个问题。耗时: {analysis_duration:.2f}秒")
+    skipped_runs = sum(len(r.get('skipped_detectors') or []) for r in records)
+    if skipped_runs:
+        print(f"[*] 触发词预筛选: 跳过 {skipped_runs}/{len(records) * len(engine.detectors)} 次检测器运行")
+    cached_runs = sum(len(r.get('cached_detectors') or []) for r in records)
+    if cached_runs:
+        print(f"[*] 检测结果缓存: 复用 {cached_runs}/{len(records) * len(engine.detectors)} 次检测器运行")
+    cached_functions = sum(r.get('cached_functions') or 0 for r in records)
+    if cached_functions:
+        print(f"[*] 函数级结果缓存: 复用 {cached_functions} 个（检测器, 函数）结果，只在变化的函数上重新运行")
+
+    profile_summary = None
+    if profile_sink is not None:
+        print("-" * 60)
+        print(profile_sink.format_table(sort=args.profile_sort))
+        profile_summary = profile_sink.summary()
+        if args.profile_flamegraph:
+            with open(args.profile_flamegraph, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(profile_sink.collapsed_stacks()) + '\n')
+            print(f"[*] 折叠栈已写入: {args.profile_flamegraph}")
+    if profiler is not None:
+        profiler.dump_stats(args.profile_dump)
+        print(f"[*] cProfile 数据已写入: {args.profile_dump}")
     
     # 生成报告
     if args.format == "json":
@@ -139,7 +253,8 @@ def main():
             target=target_path,
             solidity_version=solidity_version,
             analysis_duration=analysis_duration,
-            framework=None  # 可以通过参数传入
+            framework=None,  # 可以通过参数传入
+            profile=profile_summary
         )
         
         # 生成 Slither 风格报告
@@ -155,64 +270,23 @@ def main():
             target=target_path,
             solidity_version=solidity_version,
             analysis_duration=analysis_duration,
-            framework=None
+            framework=None,
+            profile=profile_summary
         )
         
         # 构建报告数据（不写入文件）
-        vulnerabilities = []
-        informational_findings = []
-        vuln_id_counter = 1
-        info_id_counter = 1
-        
-        for result in all_results:
-            severity = result.get('severity', 'Low')
-            item = {
-                "detector": result.get('detector', 'unknown'),
-                "severity": severity,
-                "swc_id": result.get('swc_id', result.get('detector', '')),
-                "title": result.get('title', result.get('desc', 'Security Issue')),
-                "description": result.get('desc', result.get('msg', '')),
-                "contract": result.get('contract', ''),
-                "function": result.get('function', None),
-                "location": {
-                    "file": result.get('file', ''),
-                    "start_line": result.get('line', 0),
-                    "end_line": result.get('end_line', result.get('line', 0))
-                },
-                "code_snippet": result.get('code', ''),
-                "fix_suggestion": result.get('fix_suggestion', 'Please review the code and apply security best practices.'),
-                "confidence": result.get('confidence', 'High')
-            }
-            
-            if severity in ['High', 'Medium', 'Low']:
-                item['id'] = f"VULN-{vuln_id_counter:03d}"
-                vuln_id_counter += 1
-                vulnerabilities.append(item)
-            else:
-                item['id'] = f"INFO-{info_id_counter:03d}"
-                info_id_counter += 1
-                informational_findings.append(item)
-        
-        summary = {
-            "total_vulnerabilities": len(vulnerabilities),
-            "high_severity": sum(1 for v in vulnerabilities if v['severity'] == 'High'),
-            "medium_severity": sum(1 for v in vulnerabilities if v['severity'] == 'Medium'),
-            "low_severity": sum(1 for v in vulnerabilities if v['severity'] == 'Low'),
-            "informational": len(informational_findings),
-            "total_contracts_analyzed": len(all_contracts)
-        }
-        
-        report_data = {
-            "sca_version": "1.0.0",
-            "analysis_metadata": analysis_metadata,
-            "contracts_analyzed": all_contracts,
-            "vulnerabilities": vulnerabilities,
-            "informational_findings": informational_findings,
-            "summary": summary
-        }
+        report_data = SlitherReportGenerator.build_slither_report(
+            results=all_results,
+            contracts_info=all_contracts,
+            analysis_metadata=analysis_metadata
+        )
         
         output_path = args.output or "sca_report.html"
         HTMLReportGenerator.generate_html_report(report_data, output_path)
 
+    if trace_sink is not None:
+        trace_sink.close()
+        print(f"[*] 事件跟踪已写入: {args.trace}")
+
 if __name__ == "__main__":
     main()
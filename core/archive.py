@@ -0,0 +1,104 @@
+import io
+import os
+import posixpath
+import tarfile
+import zipfile
+from typing import List
+
+# 默认限制：最多 2000 个 .sol 文件，解压后总计不超过 100 MB
+DEFAULT_MAX_FILES = 2000
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+# 逐块读取，解压大小按实际读出的字节数统计，不信任压缩包头部声明的大小
+_CHUNK = 64 * 1024
+
+
+class ArchiveError(ValueError):
+    """压缩包格式不支持或内容不安全"""
+    pass
+
+
+class ArchiveLimitError(ArchiveError):
+    """压缩包超出文件数或解压大小限制"""
+    pass
+
+
+def archive_kind(filename: str) -> str:
+    """根据文件名判断压缩包类型：'zip' / 'tar'，不支持时返回空字符串"""
+    name = filename.lower()
+    if name.endswith('.zip'):
+        return 'zip'
+    if name.endswith(('.tar.gz', '.tgz', '.tar')):
+        return 'tar'
+    return ''
+
+
+def _safe_relpath(name: str) -> str:
+    """规范化压缩包内的路径，拒绝绝对路径与 .. 穿越"""
+    name = name.replace('\\', '/')
+    norm = posixpath.normpath(name)
+    if norm.startswith('/') or norm == '..' or norm.startswith('../') or ':' in norm.split('/')[0]:
+        raise ArchiveError(f"压缩包中包含不安全的路径: {name}")
+    return norm
+
+
+def extract_sol_files(data: bytes, filename: str, dest_dir: str,
+                      max_files: int = DEFAULT_MAX_FILES, max_bytes: int = DEFAULT_MAX_BYTES) -> List[str]:
+    """
+    将压缩包中的 .sol 文件解压到 dest_dir，返回解压后的路径列表（按压缩包内路径排序）
+    - 只解压普通 .sol 文件，忽略目录、符号链接及其它文件
+    - 超过文件数或解压总大小限制时抛出 ArchiveLimitError，其它问题抛出 ArchiveError
+    """
+    kind = archive_kind(filename)
+    if not kind:
+        raise ArchiveError("仅支持 .zip、.tar.gz、.tgz、.tar 压缩包")
+
+    total = 0
+    written: List[str] = []
+    # 已解压的规范化路径：a.sol、./a.sol 等指向同一目标的重复条目会互相覆盖并被重复分析
+    seen = set()
+
+    def copy(src, relpath: str):
+        nonlocal total
+        key = os.path.normcase(relpath)
+        if key in seen:
+            raise ArchiveError(f"压缩包中包含重复的文件: {relpath}")
+        seen.add(key)
+        if len(written) >= max_files:
+            raise ArchiveLimitError(f"压缩包中的 .sol 文件超过 {max_files} 个")
+        target = os.path.join(dest_dir, *relpath.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as out:
+            while True:
+                chunk = src.read(_CHUNK)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > max_bytes:
+                    raise ArchiveLimitError(f"解压后的合约总大小超过 {max_bytes // (1024 * 1024)} MB")
+                out.write(chunk)
+        written.append(target)
+
+    try:
+        if kind == 'zip':
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                for info in sorted(zf.infolist(), key=lambda i: i.filename):
+                    if info.is_dir() or not info.filename.endswith('.sol'):
+                        continue
+                    relpath = _safe_relpath(info.filename)
+                    with zf.open(info) as src:
+                        copy(src, relpath)
+        else:
+            with tarfile.open(fileobj=io.BytesIO(data), mode='r:*') as tf:
+                for member in sorted(tf.getmembers(), key=lambda m: m.name):
+                    if not member.isfile() or not member.name.endswith('.sol'):
+                        continue
+                    relpath = _safe_relpath(member.name)
+                    src = tf.extractfile(member)
+                    if src is not None:
+                        copy(src, relpath)
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+        raise ArchiveError(f"无法读取压缩包: {e}")
+
+    if not written:
+        raise ArchiveError("压缩包中没有 .sol 文件")
+    return written
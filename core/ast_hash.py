@@ -0,0 +1,135 @@
+import hashlib
+import json
+import re
+from collections.abc import Mapping
+from typing import Any, Dict, List, Optional, Tuple
+
+from .line_index import LineIndex
+from .traversal import walk
+
+# 结构哈希忽略的字段：源码偏移、节点 ID 及引用其它节点 ID 的字段（在别处增删代码时会整体变化），以及注释文档
+IGNORED_KEYS = frozenset((
+    'src', 'nameLocation', 'id', 'referencedDeclaration', 'scope', 'overloadedDeclarations',
+    'baseFunctions', 'documentation', 'linearizedBaseContracts', 'contractDependencies',
+    'usedErrors', 'usedEvents', 'internalFunctionIDs', 'exportedSymbols', 'absolutePath',
+))
+# 文件级声明哈希中剔除的节点类型
+FUNCTION_TYPES = ('FunctionDefinition',)
+# typeIdentifier 中嵌入的节点 ID，如 t_contract$_Vault_$123 / t_struct$_S_$45_storage_ptr
+_TYPE_ID = re.compile(r'\$(\d+)')
+
+
+def _digest(value: Any) -> str:
+    data = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def structural_hash(node: Mapping, line_index: Optional[LineIndex] = None, base_line: int = 0,
+                    exclude: Tuple[str, ...] = ()) -> str:
+    """
+    AST 子树的结构哈希，与子树在文件中的位置无关；exclude 中类型的节点（及其子树）从列表中剔除
+    提供 line_index 时，节点相对 base_line 的行号也计入哈希：子树内部的换行变化会改变哈希，整体平移不会
+
+    以显式栈先序遍历（core.traversal.walk），逐个节点把标量字段与子节点的位置写入摘要，
+    不构造规范化副本，深层嵌套的表达式也不会触发递归深度限制
+    """
+    h = hashlib.sha256()
+
+    def fields(item: Mapping) -> List[Tuple[str, Any]]:
+        # 按字段名排序；子节点只记录位置（'{}' 或列表中的 None），内容在遍历到子节点时写入
+        out = []
+        for key in sorted(item):
+            if key in IGNORED_KEYS:
+                continue
+            value = item[key]
+            if isinstance(value, Mapping):
+                value = '{}'
+            elif isinstance(value, list):
+                value = [None if isinstance(v, Mapping) else v for v in value
+                         if not (isinstance(v, Mapping) and v.get('nodeType') in exclude)]
+            elif key == 'typeIdentifier' and isinstance(value, str):
+                value = _TYPE_ID.sub('$', value)
+            out.append((key, value))
+        if line_index is not None and 'src' in item:
+            out.append(('@line', line_index.line_from_src(item.get('src'), default=base_line) - base_line))
+        return out
+
+    def children(item: Mapping) -> List[Mapping]:
+        found = []
+        for key in sorted(item):
+            if key in IGNORED_KEYS:
+                continue
+            value = item[key]
+            if isinstance(value, Mapping):
+                found.append(value)
+            elif isinstance(value, list):
+                found.extend(v for v in value if isinstance(v, Mapping) and v.get('nodeType') not in exclude)
+        return found
+
+    def enter(item, ancestors):
+        h.update(json.dumps(fields(item), ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        h.update(b'(')
+
+    def leave(item, ancestors):
+        h.update(b')')
+
+    walk(node, enter, leave, children=children)
+    return h.hexdigest()
+
+
+class FileStructure:
+    """
+    文件的函数级结构哈希
+
+    - declarations：整个文件去掉所有函数后的结构哈希（状态变量、修饰器、继承等），不含行号
+    - layout：同上但包含每个节点的绝对行号，函数之外的代码平移时也会变化
+    - functions：每个 FunctionDefinition（含自由函数）的 src、所属合约、名称、起止行与结构哈希
+      （含函数内相对行号），按源码顺序；group_hash 汇总文件内所有同名函数
+
+    函数级检测结果只依赖函数本身与文件级声明时，可按 (declarations, 函数哈希) 复用，
+    函数在文件中平移时只需把结果的行号重新锚定到新的起始行。
+    """
+
+    def __init__(self, ast: Optional[Dict[str, Any]], line_index: LineIndex):
+        self.functions: List[Dict[str, Any]] = []
+        self.declarations = ''
+        self.layout = ''
+        if not ast:
+            return
+        self.declarations = structural_hash(ast, exclude=FUNCTION_TYPES)
+        self.layout = structural_hash(ast, line_index, exclude=FUNCTION_TYPES)
+        for top in ast.get('nodes') or []:
+            if not isinstance(top, Mapping):
+                continue
+            if top.get('nodeType') == 'FunctionDefinition':
+                self._add(top, '', line_index)
+            elif top.get('nodeType') == 'ContractDefinition':
+                for node in top.get('nodes') or []:
+                    if isinstance(node, Mapping) and node.get('nodeType') == 'FunctionDefinition':
+                        self._add(node, top.get('name') or '', line_index)
+        # 按名称汇总的规则（如 IR 中按函数名查找状态写入）会让同名函数互相影响，
+        # 文件内任一同名函数变化都视为整组变化
+        groups: Dict[str, List[str]] = {}
+        for unit in self.functions:
+            groups.setdefault(unit['name'], []).append(unit['hash'])
+        for unit in self.functions:
+            unit['group_hash'] = _digest(sorted(groups[unit['name']]))
+
+    def _add(self, node: Dict[str, Any], contract: str, line_index: LineIndex):
+        start, end = line_index.line_range_from_src(node.get('src'))
+        self.functions.append({
+            'src': node.get('src'),
+            'contract': contract,
+            # 与 SCA-IR 的函数名一致：构造函数为 'constructor'，fallback / receive 为空
+            'name': node.get('name') or ('constructor' if node.get('kind') == 'constructor' else ''),
+            'start': start,
+            'end': end,
+            'hash': structural_hash(node, line_index, start),
+        })
+
+    def function_at(self, line: int) -> Optional[Dict[str, Any]]:
+        """包含指定行的函数"""
+        for unit in self.functions:
+            if unit['start'] <= line <= unit['end']:
+                return unit
+        return None
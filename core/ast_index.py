@@ -0,0 +1,77 @@
+from typing import Any, Dict, List, Optional
+from .traversal import child_nodes
+
+
+class ASTIndex:
+    """
+    AST 节点索引，每个文件只构建一次
+
+    - nodeType -> 节点列表（按先序遍历顺序）
+    - memberName -> MemberAccess 节点列表，如 tx.origin / x.delegatecall
+    - memberName -> 调用点（FunctionCall 节点），callee 可带 {value: ...} 选项
+    - 成员访问与调用点所在的函数
+
+    检测器可直接定位少量关心的节点，而不必扫描整棵 AST。
+    """
+
+    def __init__(self, ast: Optional[Dict[str, Any]]):
+        self._by_type: Dict[str, List[Dict[str, Any]]] = {}
+        self._members: Dict[str, List[Dict[str, Any]]] = {}
+        self._calls: Dict[str, List[Dict[str, Any]]] = {}
+        self._function_of: Dict[int, Dict[str, Any]] = {}
+        if ast:
+            self._build(ast)
+
+    def _build(self, ast: Dict[str, Any]):
+        # 显式栈先序遍历（不递归，深层嵌套的表达式不会触发递归深度限制），栈元素为 (节点, 所在函数)
+        stack = [(ast, None)]
+        while stack:
+            node, function = stack.pop()
+            nt = node.get('nodeType')
+            if nt:
+                self._by_type.setdefault(nt, []).append(node)
+                if nt in ('FunctionDefinition', 'ModifierDefinition'):
+                    function = node
+                elif nt == 'MemberAccess':
+                    self._members.setdefault(node.get('memberName'), []).append(node)
+                    if function is not None:
+                        self._function_of[id(node)] = function
+                elif nt == 'FunctionCall':
+                    callee = node.get('expression') or {}
+                    if callee.get('nodeType') == 'FunctionCallOptions':
+                        callee = callee.get('expression') or {}
+                    if callee.get('nodeType') == 'MemberAccess':
+                        self._calls.setdefault(callee.get('memberName'), []).append(node)
+                        if function is not None:
+                            self._function_of[id(node)] = function
+            children = child_nodes(node)
+            if children:
+                stack.extend((child, function) for child in reversed(children))
+
+    def by_type(self, node_type: str) -> List[Dict[str, Any]]:
+        """指定类型的全部节点"""
+        return self._by_type.get(node_type, [])
+
+    def members(self, member_name: str) -> List[Dict[str, Any]]:
+        """指定成员名的全部 MemberAccess 节点"""
+        return self._members.get(member_name, [])
+
+    def calls(self, member_name: str) -> List[Dict[str, Any]]:
+        """callee 为指定成员名的全部 FunctionCall 节点"""
+        return self._calls.get(member_name, [])
+
+    def function_of(self, node: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """成员访问或调用点所在的函数/修饰器定义"""
+        return self._function_of.get(id(node))
+
+    @property
+    def functions(self) -> List[Dict[str, Any]]:
+        return self.by_type('FunctionDefinition')
+
+    @property
+    def contracts(self) -> List[Dict[str, Any]]:
+        return self.by_type('ContractDefinition')
+
+    @property
+    def state_variables(self) -> List[Dict[str, Any]]:
+        return [n for n in self.by_type('VariableDeclaration') if n.get('stateVariable')]
@@ -0,0 +1,234 @@
+import sys
+import threading
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .traversal import walk
+
+# 常见的 solc 节点类型，按顺序编号；未列出的类型在首次出现时追加
+NODE_TYPES: List[str] = [
+    'SourceUnit', 'PragmaDirective', 'ImportDirective', 'ContractDefinition', 'InheritanceSpecifier',
+    'UsingForDirective', 'StructDefinition', 'EnumDefinition', 'EnumValue', 'UserDefinedValueTypeDefinition',
+    'ParameterList', 'OverrideSpecifier', 'FunctionDefinition', 'VariableDeclaration', 'ModifierDefinition',
+    'ModifierInvocation', 'EventDefinition', 'ErrorDefinition', 'ElementaryTypeName', 'UserDefinedTypeName',
+    'FunctionTypeName', 'Mapping', 'ArrayTypeName', 'IdentifierPath', 'InlineAssembly', 'Block',
+    'PlaceholderStatement', 'IfStatement', 'TryCatchClause', 'TryStatement', 'WhileStatement', 'DoWhileStatement',
+    'ForStatement', 'Continue', 'Break', 'Return', 'Throw', 'EmitStatement', 'RevertStatement',
+    'VariableDeclarationStatement', 'ExpressionStatement', 'UncheckedBlock', 'Conditional', 'Assignment',
+    'TupleExpression', 'UnaryOperation', 'BinaryOperation', 'FunctionCall', 'FunctionCallOptions', 'NewExpression',
+    'MemberAccess', 'IndexAccess', 'IndexRangeAccess', 'PrimaryExpression', 'Identifier',
+    'ElementaryTypeNameExpression', 'Literal', 'StructuredDocumentation',
+]
+NODE_TYPE_CODES: Dict[str, int] = {name: code for code, name in enumerate(NODE_TYPES)}
+_registry_lock = threading.Lock()
+
+# 保留的标量字段：检测器、IR 构建、报告与结构哈希读取的属性；子节点与子节点列表总是保留
+KEPT_FIELDS = frozenset((
+    'src', 'id', 'name', 'memberName', 'kind', 'value', 'hexValue', 'operator', 'prefix', 'visibility',
+    'stateVariable', 'stateMutability', 'mutability', 'constant', 'contractKind', 'abstract', 'virtual',
+    'literals', 'names', 'absolutePath', 'isConstructor', 'attributes',
+))
+# 即使是子节点也丢弃的字段：注释文档（StructuredDocumentation）
+DROPPED_FIELDS = frozenset(('documentation',))
+
+
+def node_type_code(node_type: str) -> int:
+    """节点类型 -> 整数编码（未知类型追加到 NODE_TYPES）"""
+    code = NODE_TYPE_CODES.get(node_type)
+    if code is None:
+        with _registry_lock:
+            code = NODE_TYPE_CODES.get(node_type)
+            if code is None:
+                code = NODE_TYPE_CODES[node_type] = len(NODE_TYPES)
+                NODE_TYPES.append(sys.intern(node_type))
+    return code
+
+
+class _Shape:
+    """同一组字段名（按出现顺序）的节点共享一个 Shape：字段名元组与 字段名 -> 下标"""
+
+    __slots__ = ('keys', 'index')
+
+    def __init__(self, keys: Tuple[str, ...]):
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+
+
+_shapes: Dict[Tuple[str, ...], _Shape] = {}
+# 转换期间尚未填入字段的节点使用的空形状
+_EMPTY = _Shape(())
+
+
+def _shape(keys: Tuple[str, ...]) -> _Shape:
+    shape = _shapes.get(keys)
+    if shape is None:
+        shape = _shapes.setdefault(keys, _Shape(tuple(sys.intern(k) for k in keys)))
+    return shape
+
+
+class ASTNode(Mapping):
+    """
+    紧凑的 AST 节点
+
+    只保存 KEPT_FIELDS 中的标量字段与全部子节点，字段名元组按形状共享，字符串值驻留，
+    节点类型保存为整数编码，parent 指向父节点（根节点为 None）。
+    实现 Mapping 接口：node.get('nodeType') / node['name'] / node.values() 与原来的 dict 节点用法一致，
+    parent 不属于映射内容，遍历 values() 不会回到父节点。
+    """
+
+    __slots__ = ('code', 'parent', '_shape', '_values')
+
+    def __init__(self, code: int, shape: _Shape, values: tuple, parent: Optional['ASTNode'] = None):
+        self.code = code
+        self.parent = parent
+        self._shape = shape
+        self._values = values
+
+    @property
+    def node_type(self) -> str:
+        return NODE_TYPES[self.code]
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'nodeType':
+            return NODE_TYPES[self.code]
+        i = self._shape.index.get(key)
+        if i is None:
+            raise KeyError(key)
+        return self._values[i]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == 'nodeType':
+            return NODE_TYPES[self.code]
+        i = self._shape.index.get(key)
+        return default if i is None else self._values[i]
+
+    def __contains__(self, key: object) -> bool:
+        return key == 'nodeType' or key in self._shape.index
+
+    def __iter__(self) -> Iterator[str]:
+        yield 'nodeType'
+        yield from self._shape.keys
+
+    def __len__(self) -> int:
+        return len(self._values) + 1
+
+    def keys(self):
+        return ('nodeType',) + self._shape.keys
+
+    def values(self):
+        return (NODE_TYPES[self.code],) + self._values
+
+    def items(self):
+        return (('nodeType', NODE_TYPES[self.code]),) + tuple(zip(self._shape.keys, self._values))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换回普通 dict（递归），用于 JSON 序列化"""
+        return {key: _plain(value) for key, value in self.items()}
+
+    def __repr__(self) -> str:
+        return f"ASTNode({self.node_type}, src={self.get('src')!r})"
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, ASTNode):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    return value
+
+
+def _intern(value: Any) -> Any:
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [_intern(item) for item in value]
+    if isinstance(value, dict):
+        return {sys.intern(k): _intern(v) for k, v in value.items()}
+    return value
+
+
+# 哨兵值：字段被丢弃
+_DROP = object()
+
+
+def compact_ast(ast: Optional[Dict[str, Any]]) -> Optional[ASTNode]:
+    """
+    把 solc 的 dict AST 转换为 ASTNode 树（已是 ASTNode、为空或不是 AST 节点时原样返回）
+    丢弃 typeDescriptions、nameLocation、documentation 等检测器不读取的字段
+    以显式栈遍历（core.traversal.walk）：先序创建节点以便子节点指向父节点，后序填入字段值
+    """
+    if not ast or isinstance(ast, ASTNode) or 'nodeType' not in ast:
+        return ast
+    # 原 dict 节点的 id -> 已创建的 ASTNode；原 AST 在转换期间保持存活，id 不会重复
+    converted: Dict[int, ASTNode] = {}
+    parents: List[ASTNode] = []
+
+    def enter(node, ancestors):
+        if 'nodeType' in node:
+            result = ASTNode(node_type_code(node.get('nodeType') or ''), _EMPTY, (), parents[-1] if parents else None)
+            converted[id(node)] = result
+            parents.append(result)
+
+    def leave(node, ancestors):
+        if 'nodeType' not in node:
+            return
+        result = parents.pop()
+        keys = []
+        values = []
+        for key, value in node.items():
+            if key == 'nodeType' or key in DROPPED_FIELDS:
+                continue
+            value = _value(key, value, converted)
+            if value is not _DROP:
+                keys.append(key)
+                values.append(value)
+        result._shape = _shape(tuple(keys))
+        result._values = tuple(values)
+
+    walk(ast, enter, leave, children=_children)
+    return converted[id(ast)]
+
+
+def _children(node: Mapping) -> List[Mapping]:
+    # 同 child_nodes，但不进入丢弃的字段（注释文档）
+    children = []
+    for key, value in node.items():
+        if key in DROPPED_FIELDS:
+            continue
+        if isinstance(value, Mapping):
+            children.append(value)
+        elif isinstance(value, list):
+            children.extend(item for item in value if isinstance(item, Mapping))
+    return children
+
+
+def _value(key: Optional[str], value: Any, converted: Dict[int, ASTNode]) -> Any:
+    """转换字段值：子节点替换为已转换的 ASTNode，保留字段驻留字符串，其余返回 _DROP"""
+    if isinstance(value, dict):
+        if 'nodeType' in value:
+            return converted.pop(id(value))
+        if key in KEPT_FIELDS:
+            return _intern(value)
+        # 不带 nodeType 的容器（如旧版 AST 的 parameters）：只要其中有保留的内容就保留
+        inner = {}
+        for k, v in value.items():
+            v = _value(k, v, converted)
+            if v is not _DROP:
+                inner[sys.intern(k)] = v
+        return inner or _DROP
+    if isinstance(value, list):
+        # 空列表（如空的 statements）保留，标量列表只保留 KEPT_FIELDS 中的字段
+        if key in KEPT_FIELDS or not value:
+            return _intern(value)
+        if not any(isinstance(item, dict) for item in value):
+            return _DROP
+        items = []
+        for item in value:
+            item = _value(None, item, converted) if isinstance(item, dict) else item
+            items.append({} if item is _DROP else item)
+        return items
+    if key in KEPT_FIELDS:
+        return _intern(value)
+    return _DROP
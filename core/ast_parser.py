@@ -1,9 +1,28 @@
 import solcx
-from solcx import compile_source, install_solc
+from solcx import compile_standard, install_solc
+import hashlib
 import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from .cache import DiskCache
+from .events import log
+from .traversal import iter_nodes
 
 class ASTParser:
-    def __init__(self):
+    # 缓存命名空间，键由源码哈希、solc 版本与编译选项组成
+    CACHE_NAMESPACE = 'ast'
+    # 单文件解析时使用的源文件名（与 compile_source 保持一致）
+    STDIN_NAME = '<stdin>'
+    # 多线程共享解析器时，同一时刻只允许一个线程安装 solc
+    _install_lock = threading.Lock()
+
+    def __init__(self, cache: Optional[DiskCache] = None, compile_options: Optional[Dict[str, Any]] = None):
+        self.cache = cache
+        # 合并到 standard-JSON settings 中的编译选项（如 evmVersion、remappings），同时参与缓存键计算
+        self.compile_options = dict(compile_options or {})
+        # 事件总线（core.events.EventBus）；为 None 时日志直接打印
+        self.events = None
         # 尝试安装一个通用的 solc 版本，或者在运行时动态检查
         try:
             # 自动跳过下载，假设用户可能没网或者网络很慢，我们先不强制安装
@@ -12,65 +31,159 @@ class ASTParser:
         except Exception as e:
             print(f"[警告] Solc 初始化失败: {e}")
 
+    @staticmethod
+    def detect_version(content):
+        """从 pragma 中探测精确的 solc 版本，未指定时返回 None"""
+        version_match = re.search(r'pragma solidity \^?(\d+\.\d+\.\d+);', content)
+        return version_match.group(1) if version_match else None
+
+    def resolve_version(self, content):
+        """
+        解析实际使用的 solc 版本标识（不启动 solc 进程）
+        未指定 pragma 时以当前默认 solc 可执行文件路径作为标识
+        """
+        version = self.detect_version(content)
+        if version:
+            return version
+        try:
+            return str(solcx.get_executable())
+        except Exception:
+            return 'unknown'
+
+    def cache_key(self, content, version):
+        """缓存键：源码字节的 SHA-256 + solc 版本 + 编译选项"""
+        source_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return DiskCache.make_key(source_hash, version, self.compile_options)
+
     def parse(self, content):
         """
-        编译源代码并返回 AST
+        编译单个源代码并返回 AST（优先读取磁盘缓存）
         """
+        return self.parse_many({self.STDIN_NAME: content}).get(self.STDIN_NAME)
+
+    def parse_many(self, sources: Dict[str, str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        批量编译：按 solc 版本分组，每组只启动一次 solc (standard-JSON)
+        :param sources: {源文件名: 源代码}
+        :return: {源文件名: AST 或 None}
+        """
+        asts: Dict[str, Optional[Dict[str, Any]]] = {}
+        keys: Dict[str, str] = {}
+        groups: Dict[Optional[str], List[str]] = {}
+
+        for name, content in sources.items():
+            if self.cache is not None:
+                keys[name] = self.cache_key(content, self.resolve_version(content))
+                ast = self.cache.get(self.CACHE_NAMESPACE, keys[name])
+                if ast is not None:
+                    asts[name] = ast
+                    continue
+            groups.setdefault(self.detect_version(content), []).append(name)
+
+        for version, names in groups.items():
+            group_sources = {name: sources[name] for name in names}
+            if not self._ensure_version(version):
+                if self.events is not None and self.events.wants('error'):
+                    self.events.emit('error', stage='solc_install', version=version)
+                asts.update({name: None for name in names})
+                continue
+            try:
+                compiled = self._compile(group_sources, version)
+            except Exception as e:
+                if len(names) == 1:
+                    log(self.events, 'error', f"AST 解析失败: {e}")
+                    compiled = {}
+                else:
+                    # 组内任一文件编译失败都会导致整组失败，退回逐个编译以隔离错误文件
+                    log(self.events, 'warning', f"批量编译失败，改为逐个编译 ({len(names)} 个文件): {e}")
+                    compiled = {}
+                    for name in names:
+                        try:
+                            compiled.update(self._compile({name: sources[name]}, version))
+                        except Exception as e2:
+                            log(self.events, 'error', f"AST 解析失败 ({name}): {e2}")
+            for name in names:
+                ast = compiled.get(name)
+                asts[name] = ast
+                if ast is not None and name in keys:
+                    self.cache.put(self.CACHE_NAMESPACE, keys[name], ast)
+        return asts
+
+    def _ensure_version(self, version: Optional[str]) -> bool:
+        """确保所需 solc 版本已安装；version 为 None 时使用当前默认版本"""
+        if not version:
+            return True
         try:
-            # 简单的版本探测
-            version_match = re.search(r'pragma solidity \^?(\d+\.\d+\.\d+);', content)
-            if version_match:
-                version = version_match.group(1)
-                installed_versions = [str(v) for v in solcx.get_installed_solc_versions()]
-                
-                if version not in installed_versions:
-                    print(f"[*] 检测到合约需要 solc {version}，正在尝试安装...")
-                    try:
-                        install_solc(version)
-                    except Exception as e:
-                        print(f"[错误] 无法安装 solc {version}: {e}")
-                        print("[提示] 请检查网络连接或手动安装 solc")
-                        return None
-                        
-                solcx.set_solc_version(version)
+            installed_versions = [str(v) for v in solcx.get_installed_solc_versions()]
+        except Exception:
+            installed_versions = []
+        if version in installed_versions:
+            return True
+        with self._install_lock:
+            # 等待期间其它线程可能已经装好
+            try:
+                if version in [str(v) for v in solcx.get_installed_solc_versions()]:
+                    return True
+            except Exception:
+                pass
+            log(self.events, 'info', f"检测到合约需要 solc {version}，正在尝试安装...")
+            try:
+                install_solc(version)
+                return True
+            except Exception as e:
+                log(self.events, 'error', f"无法安装 solc {version}: {e}")
+                log(self.events, 'info', "请检查网络连接或手动安装 solc")
+                return False
 
-            compiled = compile_source(content)
-            # 获取第一个合约的 AST
-            contract_id = list(compiled.keys())[0]
-            return compiled[contract_id]['ast']
+    def _compile(self, sources: Dict[str, str], version: Optional[str]) -> Dict[str, Dict[str, Any]]:
+        """以 standard-JSON 方式调用一次 solc，仅输出 AST"""
+        settings = dict(self.compile_options)
+        settings['outputSelection'] = {'*': {'': ['ast']}}
+        input_data = {
+            'language': 'Solidity',
+            'sources': {name: {'content': content} for name, content in sources.items()},
+            'settings': settings,
+        }
+        events = self.events
+        timed = events is not None and events.wants('stage_end')
+        start = time.perf_counter() if timed else 0.0
+        cpu_start = time.process_time() if timed else 0.0
+        try:
+            output = compile_standard(input_data, solc_version=version, allow_empty=True)
         except Exception as e:
-            print(f"[错误] AST 解析失败: {e}")
-            return None
+            if events is not None and events.wants('error'):
+                events.emit('error', stage='compile', version=version, error=str(e))
+            raise
+        finally:
+            if timed:
+                # cpu 只统计本进程，solc 子进程的耗时只体现在 duration 中
+                events.emit('stage_end', stage='compile', version=version, files=len(sources),
+                            duration=time.perf_counter() - start, cpu=time.process_time() - cpu_start)
+        return {
+            name: info['ast']
+            for name, info in (output.get('sources') or {}).items()
+            if name in sources and info.get('ast')
+        }
 
     def walk(self, node, callback):
         """
-        深度优先遍历 AST
+        深度优先（先序）遍历 AST，对每个节点调用 callback
+        使用显式栈（core.traversal），深层嵌套的表达式不会触发递归深度限制
         """
-        if not node:
-            return
-        
-        # 执行回调
-        callback(node)
-
-        # 遍历子节点 (不同版本的 Solidity AST 结构可能不同，这里做简单兼容)
-        children = node.get('nodes') or node.get('children') or []
-        for child in children:
-            self.walk(child, callback)
-        
-        # 处理 body (FunctionDefinition 等)
-        if 'body' in node and node['body']:
-             self.walk(node['body'], callback)
-        
-        # 处理 statements (Block 等)
-        if 'statements' in node and node['statements']:
-            for stmt in node['statements']:
-                self.walk(stmt, callback)
+        for item in iter_nodes(node, children=_walk_children):
+            callback(item)
 
-        # 处理 expression (ExpressionStatement 等)
-        if 'expression' in node and node['expression']:
-             self.walk(node['expression'], callback)
 
-        # 处理 components (TupleExpression 等)
-        if 'components' in node and node['components']:
-            for comp in node['components']:
-                 self.walk(comp, callback)
+def _walk_children(node):
+    # 不同版本的 Solidity AST 结构可能不同，这里做简单兼容：
+    # nodes / children、body（FunctionDefinition 等）、statements（Block 等）、
+    # expression（ExpressionStatement 等）、components（TupleExpression 等）
+    children = list(node.get('nodes') or node.get('children') or [])
+    if node.get('body'):
+        children.append(node['body'])
+    children.extend(node.get('statements') or [])
+    if node.get('expression'):
+        children.append(node['expression'])
+    children.extend(node.get('components') or [])
+    # 空值（如 TupleExpression 中省略的分量）跳过
+    return [child for child in children if child]
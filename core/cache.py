@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .events import log
+
+# 默认缓存目录，可通过环境变量 SCA_CACHE_DIR 覆盖
+DEFAULT_CACHE_DIR = os.environ.get('SCA_CACHE_DIR') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'smart-contract-analyzer'
+)
+# 默认容量上限：256 MB
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class DiskCache:
+    """
+    内容寻址的磁盘 JSON 缓存
+
+    - 每个条目保存为 <directory>/<namespace>/<key[:2]>/<key>.json
+    - 命中时刷新文件 mtime，容量超限时按 mtime 从旧到新淘汰 (LRU)；max_bytes 为 0 时不限制容量（CLI 不允许）
+    - 写入采用临时文件 + os.replace，多进程并发写入也不会读到半截文件
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = os.path.abspath(directory or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # 命名空间 -> [命中, 未命中]
+        self._counts: Dict[str, list] = {}
+        # 当前缓存总大小的估算值，首次写入时才扫描目录
+        self._size_estimate: Optional[int] = None
+        # 同一进程内多线程共享缓存时，保护统计计数与容量估算
+        self._lock = threading.Lock()
+        # 事件总线（core.events.EventBus），由引擎设置；为 None 时日志直接打印
+        self.events = None
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """将任意可 JSON 序列化的组成部分组合为 SHA-256 键"""
+        h = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, bytes):
+                h.update(part)
+            else:
+                h.update(json.dumps(part, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def _path(self, namespace: str, key: str) -> str:
+        return os.path.join(self.directory, namespace, key[:2], f"{key}.json")
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """读取缓存条目，未命中返回 None"""
+        path = self._path(namespace, key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+                self._counts.setdefault(namespace, [0, 0])[1] += 1
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+            self._counts.setdefault(namespace, [0, 0])[0] += 1
+        return value
+
+    def counts(self, namespace: str) -> Tuple[int, int]:
+        """某个命名空间在本进程内的 (命中, 未命中) 次数"""
+        with self._lock:
+            hits, misses = self._counts.get(namespace, (0, 0))
+        return hits, misses
+
+    def put(self, namespace: str, key: str, value: Any) -> None:
+        """写入缓存条目，必要时触发 LRU 淘汰"""
+        path = self._path(namespace, key)
+        data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        # 覆盖已有条目时容量估算只增加差值
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log(self.events, 'warning', f"写入缓存失败: {e}")
+            return
+
+        with self._lock:
+            if self._size_estimate is None:
+                self._size_estimate = self._scan_total_size()
+            else:
+                self._size_estimate += len(data) - old_size
+            if self.max_bytes and self._size_estimate > self.max_bytes:
+                self._evict()
+
+    def _iter_entries(self, namespace: Optional[str] = None):
+        """遍历缓存条目，产出 (path, size, mtime, namespace)"""
+        if not os.path.isdir(self.directory):
+            return
+        namespaces = [namespace] if namespace else sorted(os.listdir(self.directory))
+        for ns in namespaces:
+            ns_dir = os.path.join(self.directory, ns)
+            if not os.path.isdir(ns_dir):
+                continue
+            for shard in os.scandir(ns_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.json'):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        yield entry.path, st.st_size, st.st_mtime, ns
+
+    def _scan_total_size(self) -> int:
+        return sum(size for _, size, _, _ in self._iter_entries())
+
+    def _evict(self):
+        """按最近访问时间淘汰，直到总大小降到上限的 90% 以下"""
+        entries = sorted(self._iter_entries(), key=lambda e: e[2])
+        total = sum(e[1] for e in entries)
+        low_water = int(self.max_bytes * 0.9)
+        for path, size, _, _ in entries:
+            if total <= low_water:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size_estimate = total
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存统计信息"""
+        namespaces: Dict[str, Dict[str, int]] = {}
+        for _, size, _, ns in self._iter_entries():
+            info = namespaces.setdefault(ns, {'entries': 0, 'size_bytes': 0})
+            info['entries'] += 1
+            info['size_bytes'] += size
+        return {
+            'directory': self.directory,
+            'max_bytes': self.max_bytes,
+            'entries': sum(i['entries'] for i in namespaces.values()),
+            'size_bytes': sum(i['size_bytes'] for i in namespaces.values()),
+            'namespaces': namespaces,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def purge(self, namespace: Optional[str] = None) -> int:
+        """清空缓存（可仅清空某个命名空间），返回删除的条目数"""
+        removed = 0
+        for path, _, _, _ in list(self._iter_entries(namespace)):
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        self._size_estimate = None
+        return removed
+
+
+class MemoryCache:
+    """
+    进程内的 LRU + TTL 缓存（线程安全）
+
+    - 超过 max_entries 时淘汰最久未使用的条目
+    - 条目写入超过 ttl 秒后视为过期，读取时删除
+    - max_entries <= 0 时不缓存任何内容
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
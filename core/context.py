@@ -1,11 +1,165 @@
-from dataclasses import dataclass
-from typing import Optional, Dict, Any, List
+import copy
+from typing import Optional, Dict, Any, List, Tuple, Callable, Iterable
+from .line_index import LineIndex
+from .ast_index import ASTIndex
+from .ast_hash import FileStructure
+from .data_flow import DataFlowAnalyzer
+from .lexer import MaskedSource, PatternSet
+
+# 哨兵值：表示"尚未构建"，以区别于"已构建但结果为 None"（如编译失败）
+NOT_LOADED = object()
+
 
-@dataclass
 class AnalysisContext:
-    content: str
-    filename: str
-    lines: List[str]
-    ast: Optional[Dict[str, Any]] = None
-    ir: Optional[Dict[str, Any]] = None
+    """
+    单个文件的分析上下文
+
+    ast / ir / lines 及派生的索引均为惰性属性，首次访问时才构建并缓存。
+    只使用源码文本的检测规则不会触发 solc 编译。
+    """
+
+    def __init__(
+        self,
+        content: str,
+        filename: str,
+        lines: Optional[List[str]] = None,
+        ast: Any = NOT_LOADED,
+        ir: Any = NOT_LOADED,
+        dataflow: Any = NOT_LOADED,
+        ast_loader: Optional[Callable[[], Optional[Dict[str, Any]]]] = None,
+        ir_loader: Optional[Callable[['AnalysisContext'], Optional[Dict[str, Any]]]] = None,
+        pattern_set: Optional[PatternSet] = None,
+    ):
+        self.content = content
+        self.filename = filename
+        self._lines = lines
+        self._ast = ast
+        self._ir = ir
+        self._dataflow = dataflow
+        self._ast_loader = ast_loader
+        self._ir_loader = ir_loader
+        self._line_index: Optional[LineIndex] = None
+        self._index: Optional[ASTIndex] = None
+        self._structure: Optional[FileStructure] = None
+        # restrict() 生成的视图只分析这些函数（solc src），None 表示整个文件
+        self.function_filter: Optional[frozenset] = None
+        self._masked: Optional[MaskedSource] = None
+        # 引擎合并了全部文本规则模式的集合，以及一次扫描的命中结果
+        self._pattern_set = pattern_set
+        self._pattern_hits: Optional[Dict[str, Dict[str, List[int]]]] = None
+
+    @property
+    def lines(self) -> List[str]:
+        if self._lines is None:
+            self._lines = self.content.split('\n')
+        return self._lines
+
+    @property
+    def masked(self) -> MaskedSource:
+        """屏蔽注释与字符串后的源码，首次访问时才做词法扫描"""
+        if self._masked is None:
+            self._masked = MaskedSource(self.content)
+        return self._masked
+
+    def pattern_hits(self, owner: str, patterns: Optional[Dict[str, str]] = None) -> Dict[str, List[int]]:
+        """
+        owner 登记的文本模式在屏蔽后源码中的命中行号 {名称: [行号, ...]}
+        引擎合并的模式集合对每个文件只扫描一次；未登记的 owner（如单独调用 check）按 patterns 单独扫描
+        """
+        if self._pattern_hits is None:
+            self._pattern_hits = self._pattern_set.scan(self.masked) if self._pattern_set else {}
+        if owner not in self._pattern_hits:
+            extra = PatternSet()
+            extra.update(owner, patterns or {})
+            self._pattern_hits.update(extra.scan(self.masked))
+        return self._pattern_hits.get(owner, {})
+
+    @property
+    def ast(self) -> Optional[Dict[str, Any]]:
+        """solc AST，首次访问时才编译"""
+        if self._ast is NOT_LOADED:
+            self._ast = self._ast_loader() if self._ast_loader else None
+        return self._ast
+
+    @ast.setter
+    def ast(self, value: Optional[Dict[str, Any]]):
+        self._ast = value
+        self._index = None
+        self._structure = None
+
+    @property
+    def ast_loaded(self) -> bool:
+        """AST 是否已构建（查询本身不会触发编译）"""
+        return self._ast is not NOT_LOADED
+
+    @property
+    def ir(self) -> Optional[Dict[str, Any]]:
+        """SCA-IR，首次访问时才构建"""
+        if self._ir is NOT_LOADED:
+            self._ir = self._ir_loader(self) if self._ir_loader else None
+        return self._ir
+
+    @ir.setter
+    def ir(self, value: Optional[Dict[str, Any]]):
+        self._ir = value
+
+    @property
+    def ir_loaded(self) -> bool:
+        """IR 是否已构建（查询本身不会触发构建）"""
+        return self._ir is not NOT_LOADED
+
+    @property
+    def dataflow(self) -> Optional[DataFlowAnalyzer]:
+        """基于 AST 的数据流分析结果，首次访问时才分析"""
+        if self._dataflow is NOT_LOADED:
+            self._dataflow = None
+            if self.ast:
+                self._dataflow = DataFlowAnalyzer(self.ast)
+                self._dataflow.analyze()
+        return self._dataflow
+
+    @property
+    def dataflow_loaded(self) -> bool:
+        """数据流分析是否已完成（查询本身不会触发分析）"""
+        return self._dataflow is not NOT_LOADED
+
+    @property
+    def line_index(self) -> LineIndex:
+        """按需构建的换行符字节偏移索引，同一文件的所有检测器共享"""
+        if self._line_index is None:
+            self._line_index = LineIndex(self.content)
+        return self._line_index
+
+    @property
+    def index(self) -> ASTIndex:
+        """按需构建的 AST 节点类型 / 成员访问 / 调用点索引"""
+        if self._index is None:
+            self._index = ASTIndex(self.ast)
+        return self._index
+
+    @property
+    def structure(self) -> FileStructure:
+        """按需构建的函数级结构哈希（函数级结果缓存使用）"""
+        if self._structure is None:
+            self._structure = FileStructure(self.ast, self.line_index)
+        return self._structure
+
+    def restrict(self, function_srcs: Iterable[str]) -> 'AnalysisContext':
+        """
+        只包含指定函数（按 solc src）的视图：IR 中其余函数被剔除，AST 遍历检测器跳过其余函数；
+        源码、AST 与各索引与原上下文共享
+        """
+        view = copy.copy(self)
+        view.function_filter = frozenset(function_srcs)
+        ir = self.ir
+        if ir:
+            view._ir = dict(ir, functions=[fn for fn in ir.get('functions') or [] if fn.get('src') in view.function_filter])
+        return view
+
+    def line_from_src(self, src: Optional[str], default: int = 1) -> int:
+        """solc src 字段 -> 行号"""
+        return self.line_index.line_from_src(src, default)
 
+    def line_col_from_src(self, src: Optional[str]) -> Optional[Tuple[int, int]]:
+        """solc src 字段 -> (行号, 列号)"""
+        return self.line_index.line_col_from_src(src)
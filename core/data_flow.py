@@ -1,4 +1,3 @@
-
 class DataFlowAnalyzer:
     """
     简易数据流分析器
@@ -20,58 +19,37 @@ class DataFlowAnalyzer:
         self._collect_usages(self.ast)
 
     def _collect_definitions(self, node):
-        # 递归遍历辅助函数
-        children = node.get('nodes') or node.get('children') or []
-        
-        node_type = node.get('nodeType') or node.get('name')
-        
-        # 捕获变量声明
-        if node_type == 'VariableDeclaration':
-            name = node.get('name')
-            src = node.get('src')
-            if name:
-                self.variables[name] = {'defined_at': src, 'type': node.get('typeName')}
+        # 先序遍历（显式栈），顺序：节点本身 -> nodes / children -> body -> statements
+        for item in _iter_nodes(node):
+            node_type = item.get('nodeType') or item.get('name')
 
-        for child in children:
-            self._collect_definitions(child)
-            
-        # 处理 body/statements
-        if 'body' in node and node['body']:
-             self._collect_definitions(node['body'])
-        if 'statements' in node and node['statements']:
-            for stmt in node['statements']:
-                self._collect_definitions(stmt)
+            # 捕获变量声明
+            if node_type == 'VariableDeclaration':
+                name = item.get('name')
+                src = item.get('src')
+                if name:
+                    self.variables[name] = {'defined_at': src, 'type': item.get('typeName')}
 
     def _collect_usages(self, node):
-        children = node.get('nodes') or node.get('children') or []
-        node_type = node.get('nodeType') or node.get('name')
+        # 先序遍历（显式栈），顺序：节点本身 -> nodes / children -> body -> statements -> expression
+        for item in _iter_nodes(node, expressions=True):
+            node_type = item.get('nodeType') or item.get('name')
 
-        # 捕获赋值操作
-        if node_type == 'Assignment':
-            left = node.get('leftHandSide')
-            right = node.get('rightHandSide')
-            
-            # 简化处理：假设左边是变量名
-            if left and (left.get('nodeType') == 'Identifier' or left.get('name') == 'Identifier'):
-                var_name = left.get('value') or left.get('name') # 不同版本 AST 字段可能不同
-                if not var_name and 'attributes' in left:
-                     var_name = left['attributes'].get('value')
-                
-                if var_name:
-                    if var_name not in self.assignments:
-                        self.assignments[var_name] = []
-                    self.assignments[var_name].append(right)
-        
-        for child in children:
-            self._collect_usages(child)
+            # 捕获赋值操作
+            if node_type == 'Assignment':
+                left = item.get('leftHandSide')
+                right = item.get('rightHandSide')
 
-        if 'body' in node and node['body']:
-             self._collect_usages(node['body'])
-        if 'statements' in node and node['statements']:
-            for stmt in node['statements']:
-                self._collect_usages(stmt)
-        if 'expression' in node and node['expression']:
-             self._collect_usages(node['expression'])
+                # 简化处理：假设左边是变量名
+                if left and (left.get('nodeType') == 'Identifier' or left.get('name') == 'Identifier'):
+                    var_name = left.get('value') or left.get('name') # 不同版本 AST 字段可能不同
+                    if not var_name and 'attributes' in left:
+                         var_name = left['attributes'].get('value')
+
+                    if var_name:
+                        if var_name not in self.assignments:
+                            self.assignments[var_name] = []
+                        self.assignments[var_name].append(right)
 
     def is_tainted(self, var_name, tainted_sources):
         """
@@ -119,3 +97,27 @@ class DataFlowAnalyzer:
         # 检查子节点
         # ... (省略复杂的递归逻辑，保持教学简单性)
         return False
+
+
+def _iter_nodes(root, expressions=False):
+    """
+    显式栈的先序遍历（不递归），只沿 nodes / children、body、statements（以及 expression）进入子节点
+    子节点直接压栈而不构造子节点列表，逆序压入以保持先序
+    """
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        if expressions:
+            expression = node.get('expression')
+            if expression:
+                stack.append(expression)
+        statements = node.get('statements')
+        if statements:
+            stack.extend(reversed(statements))
+        body = node.get('body')
+        if body:
+            stack.append(body)
+        children = node.get('nodes') or node.get('children')
+        if children:
+            stack.extend(reversed(children))
@@ -1,28 +1,103 @@
 import os
+import hashlib
 import importlib
 import inspect
 import re
 import time
-from typing import Dict, List, Any, Tuple
-from .interface import BaseDetector
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Optional, Tuple, Union
+from .interface import BaseDetector, ASTVisitorDetector, CAPABILITIES, SCOPES
+from .visitor import ASTDispatcher
 from .ast_parser import ASTParser
+from .cache import DiskCache
 from .sca_ir import SCAIRBuilder
-from .context import AnalysisContext
+from .context import AnalysisContext, NOT_LOADED
+from .line_index import LineIndex
+from .ast_index import ASTIndex
+from .ast_nodes import compact_ast
+from .reporter import SlitherReportGenerator
+from .prefilter import TriggerScanner
+from .lexer import PatternSet
+from .metrics import EngineMetrics
+from .events import EventBus, ConsoleSink, MetricsSink
+
+# IR 与数据流分析都建立在 AST 之上，需要 AST 阶段
+STAGE_DEPENDENCIES = {'ir': ('ast',), 'dataflow': ('ast',)}
+# 检测结果缓存的命名空间（与 AST 缓存共用同一个 DiskCache）
+FINDINGS_NAMESPACE = 'findings'
+
 
 class AnalyzerEngine:
-    def __init__(self):
+    def __init__(self, cache: Optional[DiskCache] = None, metrics: Optional[EngineMetrics] = None, events: Optional[EventBus] = None,
+                 cache_findings: bool = True, compact_ast: bool = False, need_contracts: bool = False):
         self.detectors = []
-        self.ast_parser = ASTParser()
+        # 生命周期事件总线；默认只挂控制台输出（info 及以上），与解析器共用
+        self.events = events if events is not None else EventBus([ConsoleSink()])
+        # cache 为 None 时不使用磁盘缓存，每次都调用 solc 编译
+        self.cache = cache
+        # 有缓存时同时缓存每个检测器在每个文件上的结果，键包含源码哈希与检测器代码摘要
+        self.cache_findings = cache_findings
+        # 为 True 时把编译出的 AST 转换为紧凑的 ASTNode 树（__slots__、只保留检测器读取的字段），降低大文件的内存占用
+        self.compact_ast = compact_ast
+        # 为 True 时即使所选检测器都不需要 AST 也编译，以提取合约信息与问题所在的合约 / 函数（Slither / HTML 报告、API）
+        self.need_contracts = need_contracts
+        self.ast_parser = ASTParser(cache=cache)
+        self.ast_parser.events = self.events
+        if cache is not None:
+            cache.events = self.events
         self.ir_builder = SCAIRBuilder()
+        # 订阅了 AST 节点的检测器共享一次遍历
+        self.dispatcher = ASTDispatcher([])
+        # 已选检测器需要的阶段（text / ast / ir / dataflow）
+        self.stages = set()
+        # 触发词预筛选：检测器 -> 触发词（未声明为 None）
+        self.triggers: Dict[Any, Optional[Tuple[str, ...]]] = {}
+        self.scanner = TriggerScanner([])
+        # 所有文本规则的模式合并为一个集合，每个文件只扫描一次
+        self.patterns = PatternSet()
+        self.plugin_dir = "plugins"
+        # 检测器筛选条件 (include, exclude)，多进程时传给工作进程
+        self.selection: Tuple[Optional[List[str]], Optional[List[str]]] = (None, None)
+        # 检测器 -> [ID, 类名, 版本, 代码摘要]；检测结果缓存键与引擎指纹都由它组成
+        self.signatures: Dict[Any, List[str]] = {}
+        # 已加载检测器集合、版本与插件源码的摘要，用作结果缓存键的一部分
+        self.fingerprint = self._compute_fingerprint()
+        # 指标：通过事件总线上的 MetricsSink 累加；为 None 时不订阅
+        self._metrics: Optional[EngineMetrics] = None
+        self._metrics_sink: Optional[MetricsSink] = None
+        self.metrics = metrics
+
+    @property
+    def metrics(self) -> Optional[EngineMetrics]:
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, value: Optional[EngineMetrics]):
+        if self._metrics_sink is not None:
+            self.events.unsubscribe(self._metrics_sink)
+            self._metrics_sink = None
+        self._metrics = value
+        if value is not None:
+            self._metrics_sink = self.events.subscribe(MetricsSink(value))
 
-    def load_plugins(self, plugin_dir="plugins"):
-        """动态加载插件目录下所有的检测规则"""
+    def load_plugins(self, plugin_dir="plugins", verbose=True, include: Optional[List[str]] = None, exclude: Optional[List[str]] = None):
+        """
+        动态加载插件目录下所有的检测规则
+        include / exclude 为检测器 ID 或类名列表（不区分大小写），用于只运行或排除部分检测器
+        """
+        self.plugin_dir = plugin_dir
+        self.selection = (include, exclude)
+        include_names = {n.lower() for n in include} if include else None
+        exclude_names = {n.lower() for n in exclude} if exclude else set()
+        matched = set()
         # 获取绝对路径
         base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         plugin_path = os.path.join(base_path, plugin_dir)
         
-        # 遍历插件目录
-        for filename in os.listdir(plugin_path):
+        # 遍历插件目录（排序保证各进程中检测器顺序一致）
+        for filename in sorted(os.listdir(plugin_path)):
             if filename.endswith(".py") and not filename.startswith("__"):
                 module_name = f"{plugin_dir}.{filename[:-3]}"
                 try:
@@ -31,85 +106,758 @@ class AnalyzerEngine:
                     for name, obj in inspect.getmembers(module):
                         if (inspect.isclass(obj) and 
                             issubclass(obj, BaseDetector) and 
-                            obj is not BaseDetector):
-                            self.detectors.append(obj())
-                            print(f"[系统] 已加载检测规则: {name}")
+                            not inspect.isabstract(obj)):
+                            detector = obj()
+                            names = {name.lower(), str(detector.id).lower()}
+                            if include_names is not None:
+                                if not names & include_names:
+                                    continue
+                                matched |= names & include_names
+                            if names & exclude_names:
+                                continue
+                            error = self._validate_detector(detector)
+                            if error:
+                                self.events.log('error', f"检测规则 {name} 声明无效，已跳过: {error}")
+                                self.events.emit('plugin_error', module=module_name, name=name, error=error)
+                                continue
+                            self.detectors.append(detector)
+                            if verbose:
+                                self.events.emit('plugin_loaded', module=module_name, name=name, detector=detector.id)
                 except Exception as e:
-                    print(f"[错误] 加载插件 {module_name} 失败: {e}")
+                    self.events.log('error', f"加载插件 {module_name} 失败: {e}")
+                    self.events.emit('plugin_error', module=module_name, error=str(e))
+
+        if include_names and verbose:
+            for missing in sorted(include_names - matched):
+                self.events.log('warning', f"未找到检测规则: {missing}")
+        self._configure_pipeline()
+
+    @staticmethod
+    def _validate_detector(detector: BaseDetector) -> Optional[str]:
+        """校验检测器的 requires 声明，返回错误信息（合法时返回 None）"""
+        requires = detector.requires
+        if isinstance(requires, str) or not requires:
+            return "requires 必须是非空的能力列表"
+        unknown = [r for r in requires if r not in CAPABILITIES]
+        if unknown:
+            return f"未知的能力 {unknown}，可选值: {list(CAPABILITIES)}"
+        # 使用默认 run() 的检测器由引擎按声明向 check() 传参，签名必须能接收
+        if type(detector).run is BaseDetector.run:
+            params = inspect.signature(detector.check).parameters
+            accepts_kwargs = any(p.kind is inspect.Parameter.VAR_KEYWORD for p in params.values())
+            for cap in ('ast', 'ir'):
+                if cap in requires and cap not in params and not accepts_kwargs:
+                    return f"声明了 '{cap}'，但 check() 不接受 {cap} 参数"
+        if detector.scope not in SCOPES:
+            return f"未知的作用范围 {detector.scope!r}，可选值: {list(SCOPES)}"
+        triggers = detector.triggers
+        if triggers is not None:
+            if isinstance(triggers, str) or not all(isinstance(t, str) and t for t in triggers):
+                return "triggers 必须是非空字符串的列表"
+        patterns = detector.patterns
+        if patterns is not None:
+            if not isinstance(patterns, dict):
+                return "patterns 必须是 {名称: 正则} 字典"
+            for name, pattern in patterns.items():
+                try:
+                    re.compile(pattern)
+                except (re.error, TypeError) as e:
+                    return f"patterns['{name}'] 不是合法的正则: {e}"
+        return None
+
+    def _configure_pipeline(self):
+        """根据已选检测器的声明，确定需要执行的阶段、合并触发词并重建 AST 分发器"""
+        stages = set()
+        for detector in self.detectors:
+            for cap in detector.requires:
+                stages.add(cap)
+                stages.update(STAGE_DEPENDENCIES.get(cap, ()))
+        if self.need_contracts:
+            stages.add('ast')
+        self.stages = stages
+        self.triggers = {d: (tuple(d.triggers) if d.triggers else None) for d in self.detectors}
+        self.scanner = TriggerScanner(t for tokens in self.triggers.values() if tokens for t in tokens)
+        self.patterns = PatternSet()
+        for detector in self.detectors:
+            if detector.patterns:
+                self.patterns.update(detector.id, detector.patterns)
+        if 'ir' in stages:
+            self.patterns.update(SCAIRBuilder.TEXT_PATTERN_OWNER, SCAIRBuilder.TEXT_PATTERNS)
+        self.dispatcher = ASTDispatcher([d for d in self.detectors if isinstance(d, ASTVisitorDetector)])
+        self.signatures = {}
+        self.fingerprint = self._compute_fingerprint()
+
+    def _signature(self, detector: BaseDetector) -> List[str]:
+        """检测器的 ID、类名、版本，以及类及其基类所在模块源码的摘要；插件文件改动即改变签名"""
+        signature = self.signatures.get(detector)
+        if signature is None:
+            cls = type(detector)
+            signature = self.signatures[detector] = [
+                detector.id, f"{cls.__module__}.{cls.__qualname__}", str(detector.version), detector_digest(cls),
+            ]
+        return signature
+
+    def _compute_fingerprint(self) -> str:
+        """报告格式版本 + 每个检测器的签名；插件任何改动都会改变指纹"""
+        parts = [SlitherReportGenerator.VERSION]
+        for detector in self.detectors:
+            parts.append(self._signature(detector))
+        return DiskCache.make_key(*parts)
+
+    def _findings_keys(self, content: str, detectors: List[BaseDetector]) -> Tuple[str, Dict[Any, str]]:
+        """
+        检测结果缓存键：源码哈希 + solc 版本与编译选项（影响 AST）+ 检测器签名
+        返回 (文件级条目的键, {检测器: 键})；文件级条目保存合约信息与合约 / 函数行号范围
+        """
+        source_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        version = self.ast_parser.resolve_version(content) if 'ast' in self.stages else None
+        build = (source_hash, version, self.ast_parser.compile_options)
+        file_key = DiskCache.make_key('file', *build)
+        return file_key, {d: DiskCache.make_key('detector', *build, self._signature(d)) for d in detectors}
 
     def analyze_file(self, file_path):
         """分析单个文件，返回增强的结果信息"""
-        results = []
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
-                lines = content.split('\n')
-            
-            # 1. 生成 AST
-            print(f"[DEBUG] 正在生成 AST: {file_path}")
-            ast = self.ast_parser.parse(content)
-            ir = None
+        except Exception as e:
+            self.events.log('error', f"无法分析文件 {file_path}: {e}")
+            return []
+        return self.analyze_source(content, file_path)['results']
+
+    def analyze_source(self, content: Union[str, bytes], filename: str = '<source>') -> Dict[str, Any]:
+        """
+        直接分析内存中的源码（str 或 UTF-8 编码的 bytes），不读写任何文件
+        filename 只用于结果中的文件名；返回与 analyze_files 相同结构的记录
+        """
+        if isinstance(content, (bytes, bytearray)):
+            content = bytes(content).decode('utf-8')
+        return self._analyze_content(filename, content, ast_loader=self._source_loader(content, filename))
+
+    def iter_analyze_source(self, content: Union[str, bytes], filename: str = '<source>'):
+        """
+        analyze_source 的生成器形式，逐步产出分析事件（dict，'event' 字段为类型）：
+        started / detector（单个检测器的问题）/ compile_started / compile_finished / ir_built / error，
+        最后总是 finished，其 record 与 analyze_source 的返回值相同
+        """
+        if isinstance(content, (bytes, bytearray)):
+            content = bytes(content).decode('utf-8')
+        return self._iter_analyze_content(filename, content, ast_loader=self._source_loader(content, filename), progress=True)
+
+    def iter_analyze_file(self, file_path: str):
+        """analyze_file 的生成器形式，事件同 iter_analyze_source"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        return self.iter_analyze_source(content, file_path)
+
+    def _source_loader(self, content: str, filename: str):
+        # AST 在第一个需要它的检测器访问 ctx.ast 时才编译
+        def load_ast():
+            self.events.log('debug', f"正在生成 AST: {filename}")
+            return self._load_ast(self.ast_parser.parse(content))
+        return load_ast
+
+    def analyze_files(self, file_paths: List[str]) -> List[Dict[str, Any]]:
+        """
+        批量分析多个文件：逐个运行检测器，需要 AST 时按 solc 版本分组统一编译
+        返回 [{'file': 路径, 'results': [...], 'contracts': [...], 'solidity_version': '0.8.20', 'skipped_detectors': [...]}]，顺序与输入一致
+        """
+        bus = self.events
+        run_start = time.perf_counter()
+        if bus.wants('run_start'):
+            bus.emit('run_start', files=len(file_paths))
+        sources = {}
+        for file_path in file_paths:
             try:
-                ir = self.ir_builder.build(ast, content) if ast else self.ir_builder.build_from_text(content)
-            except Exception:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    sources[file_path] = f.read()
+            except Exception as e:
+                bus.log('error', f"无法读取文件 {file_path}: {e}")
+
+        # 任一文件首次需要 AST 时，整批文件一起编译（仍按版本分组），之后直接取结果
+        asts: Optional[Dict[str, Any]] = None
+
+        def batch_loader(file_path):
+            def load_ast():
+                nonlocal asts
+                if asts is None:
+                    bus.log('debug', f"正在批量生成 AST: {len(sources)} 个文件")
+                    asts = self.ast_parser.parse_many(sources)
+                    if self.compact_ast:
+                        # 逐个转换并释放原始 dict，峰值内存不超过一份原始 AST 加上已转换的部分
+                        asts = {name: self._load_ast(asts.pop(name)) for name in list(asts)}
+                return asts.get(file_path)
+            return load_ast
+
+        records = []
+        for file_path in file_paths:
+            if file_path not in sources:
+                records.append(self._empty_record(file_path))
+                continue
+            records.append(self._analyze_content(file_path, sources[file_path], ast_loader=batch_loader(file_path)))
+        if bus.wants('run_end'):
+            bus.emit('run_end', files=len(file_paths), duration=time.perf_counter() - run_start)
+        return records
+
+    @staticmethod
+    def collect_files(paths: List[str]) -> List[str]:
+        """展开目录，收集所有 .sol 文件（目录内按路径排序，保证结果顺序稳定）"""
+        files = []
+        for path in paths:
+            if os.path.isfile(path):
+                files.append(path)
+                continue
+            found = []
+            for root, dirs, names in os.walk(path):
+                for name in names:
+                    if name.endswith(".sol"):
+                        found.append(os.path.join(root, name))
+            files.extend(sorted(found))
+        return files
+
+    def create_pool(self, jobs: int, mp_context=None) -> ProcessPoolExecutor:
+        """创建与本引擎配置（插件、检测器筛选、缓存）一致的工作进程池，可在多次 analyze_paths 调用间复用"""
+        cache_config = (self.cache.directory, self.cache.max_bytes) if self.cache is not None else None
+        return ProcessPoolExecutor(
+            max_workers=max(1, jobs),
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(self.plugin_dir, cache_config, self.selection, self.cache_findings, self.compact_ast,
+                      self.need_contracts),
+        )
+
+    def analyze_paths(self, paths: List[str], jobs: int = 1, mp_context=None,
+                      pool: Optional[ProcessPoolExecutor] = None) -> List[Dict[str, Any]]:
+        """
+        分析文件或目录，jobs > 1 时使用多进程并行
+        - mp_context 指定进程启动方式；在多线程的宿主进程（如 API 服务）中应使用 spawn
+        - pool 为 create_pool() 创建的长期进程池时直接提交任务，不再为本次调用启动进程；
+          进程池损坏（工作进程异常退出）时抛出 BrokenProcessPool，由调用方重建
+        - 每个工作进程只加载一次插件
+        - 同一 solc 版本的文件打包为任务，仍可批量编译；任务按体积从大到小调度
+        - 返回结果与输入顺序一致，与串行运行完全相同
+        """
+        files = self.collect_files(paths)
+        if jobs <= 1 or len(files) <= 1:
+            return self.analyze_files(files)
+
+        bus = self.events
+        run_start = time.perf_counter()
+        if bus.wants('run_start'):
+            bus.emit('run_start', files=len(files), jobs=jobs)
+        tasks = self._plan_tasks(files, jobs)
+        records: Dict[str, Dict[str, Any]] = {}
+        owned = pool is None
+        if owned:
+            pool = self.create_pool(min(jobs, len(tasks)), mp_context)
+        broken: Optional[BrokenProcessPool] = None
+        try:
+            futures = {pool.submit(_analyze_task, task): task for task in tasks}
+            for future in as_completed(futures):
+                task = futures[future]
                 try:
-                    ir = self.ir_builder.build_from_text(content)
-                except Exception:
-                    ir = None
+                    for record in future.result():
+                        records[record['file']] = record
+                        # 工作进程内的事件不会传回，这里按任务完成补发 file_end（没有单文件耗时）
+                        if bus.wants('file_end'):
+                            bus.emit('file_end', file=record['file'], duration=None,
+                                     findings=len(record['results']), results=record['results'])
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool):
+                        broken = e
+                    bus.log('error', f"并行分析任务失败 ({len(task)} 个文件): {e}")
+                    if bus.wants('error'):
+                        bus.emit('error', stage='worker', error=str(e))
+        finally:
+            if owned:
+                pool.shutdown()
+        if broken is not None and not owned:
+            raise broken
+        if bus.wants('run_end'):
+            bus.emit('run_end', files=len(files), duration=time.perf_counter() - run_start)
+        return [
+            records.get(f) or self._empty_record(f)
+            for f in files
+        ]
+
+    def _plan_tasks(self, files: List[str], jobs: int) -> List[List[str]]:
+        """
+        按 solc 版本分组后切分任务：
+        组内按文件大小降序贪心装箱（最长处理时间优先），任务整体再按总大小降序排列
+        """
+        sizes = {}
+        groups: Dict[Optional[str], List[str]] = {}
+        for f in files:
+            try:
+                sizes[f] = os.path.getsize(f)
+                with open(f, 'r', encoding='utf-8') as fh:
+                    version = self.ast_parser.detect_version(fh.read())
+            except Exception:
+                sizes.setdefault(f, 0)
+                version = None
+            groups.setdefault(version, []).append(f)
+
+        # 目标任务数约为进程数的 4 倍，兼顾负载均衡与批量编译
+        target_bytes = max(1, sum(sizes.values()) // (jobs * 4))
+        tasks = []
+        for group in groups.values():
+            group.sort(key=lambda f: sizes[f], reverse=True)
+            group_bytes = sum(sizes[f] for f in group)
+            count = max(1, min(len(group), round(group_bytes / target_bytes)))
+            bins = [[0, []] for _ in range(count)]
+            for f in group:
+                smallest = min(bins, key=lambda b: b[0])
+                smallest[0] += sizes[f]
+                smallest[1].append(f)
+            tasks.extend(b for b in bins if b[1])
+        tasks.sort(key=lambda b: b[0], reverse=True)
+        return [b[1] for b in tasks]
+
+    def _load_ast(self, ast: Optional[Dict[str, Any]]):
+        """编译（或缓存）得到的 AST；开启 compact_ast 时转换为 ASTNode 树"""
+        return compact_ast(ast) if self.compact_ast else ast
+
+    @staticmethod
+    def _empty_record(file_path: str) -> Dict[str, Any]:
+        """无法读取或分析失败的文件对应的空记录"""
+        return {'file': file_path, 'results': [], 'contracts': [], 'solidity_version': None, 'skipped_detectors': [], 'cached_detectors': [], 'cached_functions': 0, 'complete': False}
+
+    def _build_ir(self, ctx: AnalysisContext) -> Optional[Dict[str, Any]]:
+        """构建 SCA-IR：有 AST 时基于 AST，否则（或失败时）降级为文本扫描"""
+        ast = ctx.ast
+        bus = self.events
+        # 先取 AST 再计时，编译耗时单独计入 compile 阶段
+        timed = bus.wants('stage_end')
+        start = time.perf_counter() if timed else 0.0
+        cpu_start = time.process_time() if timed else 0.0
+        try:
+            if ast:
+                return self.ir_builder.build(ast, ctx.content, line_index=ctx.line_index, index=ctx.index)
+            return self._build_ir_from_text(ctx)
+        except Exception as e:
+            if bus.wants('error'):
+                bus.emit('error', stage='ir', file=ctx.filename, error=str(e))
+            try:
+                return self._build_ir_from_text(ctx)
+            except Exception:
+                return None
+        finally:
+            if timed:
+                bus.emit('stage_end', stage='ir', file=ctx.filename, duration=time.perf_counter() - start,
+                         cpu=time.process_time() - cpu_start)
+
+    def _build_ir_from_text(self, ctx: AnalysisContext) -> Dict[str, Any]:
+        # 复用本文件的屏蔽源码与合并扫描结果
+        hits = ctx.pattern_hits(SCAIRBuilder.TEXT_PATTERN_OWNER, SCAIRBuilder.TEXT_PATTERNS)
+        return self.ir_builder.build_from_text(ctx.content, masked=ctx.masked, hits=hits)
+
+    def _analyze_content(self, file_path: str, content: str, ast: Any = NOT_LOADED, ast_loader=None) -> Dict[str, Any]:
+        """
+        运行全部检测器，返回单个文件的分析记录
+        ast 可直接传入已编译结果，或通过 ast_loader 在首次访问时再编译
+        """
+        record = None
+        for event in self._iter_analyze_content(file_path, content, ast=ast, ast_loader=ast_loader):
+            if event['event'] == 'finished':
+                record = event['record']
+        return record
+
+    def _iter_analyze_content(self, file_path: str, content: str, ast: Any = NOT_LOADED, ast_loader=None, progress: bool = False):
+        """
+        _analyze_content 的生成器形式，逐步产出分析事件，最后一个事件为 finished（携带完整记录）
+
+        只依赖源码文本的检测器先运行，其结果不必等待 solc 编译即可产出；
+        progress=True 时在第一个需要 AST / IR 的检测器之前显式编译、构建 IR，并产出对应的阶段事件
+        """
+        results = []
+        contracts_info = []
+        solidity_version = None
+        skipped = []
+        cached: Dict[Any, List[Dict[str, Any]]] = {}
+        cached_functions = 0
+        complete = False
+        bus = self.events
+        # 没有 sink 订阅时不计时、不构造事件
+        trace_files = bus.wants('file_start') or bus.wants('file_end')
+        trace_detectors = bus.wants('detector_end')
+        trace_stages = bus.wants('stage_end')
+        start_time = time.perf_counter() if trace_files else 0.0
+        if bus.wants('file_start'):
+            bus.emit('file_start', file=file_path)
+        try:
+            # 同一文件的所有检测器共享一个上下文；AST / IR / 行列表均按需构建
+            # 没有检测器需要的阶段直接置为 None，不会编译、构建 IR 或做数据流分析
+            ctx = AnalysisContext(
+                content=content,
+                filename=file_path,
+                ast=ast if 'ast' in self.stages else None,
+                ir=NOT_LOADED if 'ir' in self.stages else None,
+                dataflow=NOT_LOADED if 'dataflow' in self.stages else None,
+                ast_loader=ast_loader,
+                ir_loader=self._build_ir,
+                pattern_set=self.patterns,
+            )
             
-            # 2. 提取 Solidity 版本
+            # 1. 提取 Solidity 版本
             solidity_version = self._extract_solidity_version(content)
-            
-            # 3. 提取合约和函数信息
-            contracts_map = self._extract_contracts_and_functions(ast, content) if ast else {}
                 
+            # 2. 触发词预筛选：一次扫描源码，跳过触发词全部缺失的检测器
+            present = self.scanner.scan(content)
+            active = []
             for detector in self.detectors:
-                # 4. 运行每个插件的检测逻辑
-                ctx = AnalysisContext(
-                    content=content,
-                    filename=file_path,
-                    lines=lines,
-                    ast=ast,
-                    ir=ir,
-                )
-                issues = detector.run(ctx)
-                for issue in issues:
-                    # 5. 补充元数据
-                    issue['detector'] = detector.id
-                    issue['severity'] = detector.severity
-                    issue['desc'] = detector.description
-                    issue['title'] = detector.title
-                    issue['swc_id'] = detector.swc_id or detector.id
-                    issue['confidence'] = detector.confidence
-                    issue['fix_suggestion'] = detector.fix_suggestion
-                    
-                    # 6. 获取出错行的具体代码
-                    line_num = issue.get('line', 0)
-                    if line_num and 0 < line_num <= len(lines):
-                        # 提取代码片段（包括上下文）
-                        start_line = max(0, line_num - 2)
-                        end_line = min(len(lines), line_num + 2)
-                        code_snippet = '\n'.join(lines[start_line:end_line])
-                        issue['code'] = code_snippet
-                        issue['end_line'] = end_line
-                    
-                    # 7. 尝试匹配到合约和函数
-                    contract_name, function_name = self._find_contract_and_function(
-                        line_num, contracts_map
-                    )
-                    if contract_name:
-                        issue['contract'] = contract_name
-                    if function_name:
-                        issue['function'] = function_name
-                    
+                if TriggerScanner.should_run(self.triggers.get(detector), present):
+                    active.append(detector)
+                else:
+                    skipped.append(detector.id)
+
+            # 3. 检测结果缓存：源码与检测器代码都未变化时直接复用已增强的问题列表
+            file_key, findings_keys = None, {}
+            if self.cache is not None and self.cache_findings and active:
+                file_key, findings_keys = self._findings_keys(content, active)
+                for detector in active:
+                    entry = self.cache.get(FINDINGS_NAMESPACE, findings_keys[detector])
+                    if isinstance(entry, list):
+                        cached[detector] = entry
+            yield {
+                'event': 'started',
+                'file': file_path,
+                'solidity_version': solidity_version,
+                'detectors': [d.id for d in active],
+                'skipped_detectors': list(skipped),
+                'cached_detectors': [d.id for d in cached],
+            }
+
+            # 4. 按输入分组：纯文本检测器 -> AST 单次遍历分发 -> 其余检测器
+            pending = [d for d in active if d not in cached]
+            visitors = [d for d in pending if d in self.dispatcher.detectors]
+            text_only = [d for d in pending if d not in visitors and not set(d.requires) & {'ast', 'ir', 'dataflow'}]
+            rest = [d for d in pending if d not in visitors and d not in text_only]
+            found: Dict[Any, List[Dict[str, Any]]] = {}
+            failed: List[Any] = []
+            contracts_map: Optional[Dict[str, Any]] = None
+            done = 0
+
+            def finish(detector, issues, enrich=True):
+                # 补充元数据与代码片段；AST 已编译时同时定位合约和函数（缓存的结果已增强过）
+                nonlocal contracts_map, done
+                if contracts_map is None and ctx.ast_loaded:
+                    contracts_map = self._extract_contracts_and_functions(ctx.ast, content, ctx.line_index, ctx.index) if ctx.ast else {}
+                if enrich:
+                    for issue in issues:
+                        self._enrich_issue(detector, issue, ctx.lines, contracts_map)
+                found[detector] = issues
+                done += 1
+                return {
+                    'event': 'detector',
+                    'detector': detector.id,
+                    'issues': issues,
+                    'progress': [done, len(active)],
+                }
+
+            lexed = []
+
+            def load_inputs(detector):
+                # 计时前先构建检测器依赖的词法扫描 / AST / IR / 数据流，
+                # 使这些共享输入的耗时计入各自的阶段，而不是记到第一个用到它们的检测器上
+                if detector.patterns and not lexed:
+                    lexed.append(True)
+                    t0, c0 = time.perf_counter(), time.process_time()
+                    detector.text_hits(ctx)
+                    if trace_stages:
+                        bus.emit('stage_end', stage='lex', file=file_path, duration=time.perf_counter() - t0,
+                                 cpu=time.process_time() - c0)
+                requires = set(detector.requires)
+                if requires & {'ast', 'ir', 'dataflow'}:
+                    ctx.ast
+                if 'ir' in requires:
+                    ctx.ir
+                if 'dataflow' in requires and not ctx.dataflow_loaded:
+                    t0, c0 = time.perf_counter(), time.process_time()
+                    ctx.dataflow
+                    if trace_stages:
+                        bus.emit('stage_end', stage='dataflow', file=file_path, duration=time.perf_counter() - t0,
+                                 cpu=time.process_time() - c0)
+
+            def run_detector(detector, target=None):
+                # target 为 ctx.restrict() 生成的视图时只分析其中的函数
+                target = ctx if target is None else target
+                if not trace_detectors:
+                    return detector.run(target)
+                load_inputs(detector)
+                t0, c0 = time.perf_counter(), time.process_time()
+                issues = []
+                try:
+                    issues = detector.run(target)
+                    return issues
+                finally:
+                    bus.emit('detector_end', file=file_path, detector=detector.id,
+                             duration=time.perf_counter() - t0, cpu=time.process_time() - c0,
+                             findings=len(issues or []))
+
+            for detector in active:
+                if detector in cached:
+                    yield finish(detector, cached[detector], enrich=False)
+
+            for detector in text_only:
+                yield finish(detector, run_detector(detector))
+
+            if progress and (visitors or rest) and 'ast' in self.stages and not ctx.ast_loaded:
+                yield {'event': 'compile_started', 'file': file_path}
+                t0 = time.time()
+                compiled = ctx.ast is not None
+                yield {'event': 'compile_finished', 'file': file_path, 'ok': compiled, 'duration': round(time.time() - t0, 4)}
+
+            def build_ir():
+                t0 = time.time()
+                ir = ctx.ir
+                return {
+                    'event': 'ir_built',
+                    'file': file_path,
+                    'functions': len((ir or {}).get('functions') or []),
+                    'duration': round(time.time() - t0, 4),
+                }
+
+            # 函数级结果缓存：文件级条目未命中（文件有修改）时，作用范围为函数的检测器
+            # 复用结构未变化的函数的结果，只在变化的函数上重新运行
+            plans: Dict[Any, Dict[str, Any]] = {}
+            scoped = [d for d in visitors + rest if d.scope == 'function']
+            if findings_keys and scoped and ctx.ast:
+                if progress and any('ir' in d.requires for d in scoped) and not ctx.ir_loaded:
+                    yield build_ir()
+                for detector in scoped:
+                    plan = self._function_plan(ctx, detector)
+                    if plan is None:
+                        continue
+                    plans[detector] = plan
+                    cached_functions += len(plan['reused'])
+                    if not plan['run'] and plan['outside'] is not None:
+                        yield finish(detector, self._merge_function_findings(ctx, plan, None))
+                visitors = [d for d in visitors if d not in found]
+                rest = [d for d in rest if d not in found]
+
+            # 5. 单次遍历 AST，把节点分发给订阅了对应类型的检测器
+            if visitors:
+                if progress and any('ir' in d.requires for d in visitors) and not ctx.ir_loaded:
+                    yield build_ir()
+                scopes = {d: plans[d]['run'] for d in visitors if d in plans}
+                # 出错的 (检测器, 错误信息)，遍历结束后统一经事件总线报告
+                errors: List[Tuple[Any, str]] = []
+                if not (trace_stages or trace_detectors):
+                    visitor_issues = self.dispatcher.run(ctx, visitors, errors=errors, scopes=scopes)
+                else:
+                    # 先取 AST / IR（编译与构建单独计时），再统计遍历与各检测器回调的耗时
+                    ctx.ast
+                    if trace_detectors:
+                        for detector in visitors:
+                            load_inputs(detector)
+                    timings: Dict[Any, float] = {}
+                    cpu: Dict[Any, float] = {}
+                    counts: Dict[Any, int] = {}
+                    t0, c0 = time.perf_counter(), time.process_time()
+                    visitor_issues = self.dispatcher.run(ctx, visitors, timings=timings, errors=errors, cpu=cpu, counts=counts,
+                                                         scopes=scopes)
+                    if trace_stages:
+                        bus.emit('stage_end', stage='ast_walk', file=file_path, duration=time.perf_counter() - t0,
+                                 cpu=time.process_time() - c0, nodes=counts.get(None, 0))
+                    if trace_detectors:
+                        for detector in visitors:
+                            bus.emit('detector_end', file=file_path, detector=detector.id,
+                                     duration=timings.get(detector, 0.0), cpu=cpu.get(detector, 0.0),
+                                     nodes=counts.get(detector, 0), findings=len(visitor_issues[detector]))
+                for detector, message in errors:
+                    bus.log('error', f"检测规则 {type(detector).__name__} 执行失败: {message}")
+                    if bus.wants('error'):
+                        bus.emit('error', stage='detector', file=file_path, detector=detector.id, error=message)
+                    failed.append(detector)
+                for detector in visitors:
+                    issues = visitor_issues[detector]
+                    if detector in plans and detector not in failed:
+                        issues = self._merge_function_findings(ctx, plans[detector], issues)
+                    yield finish(detector, issues)
+
+            # 6. 运行其余插件的检测逻辑
+            for detector in rest:
+                if progress and 'ir' in detector.requires and not ctx.ir_loaded:
+                    yield build_ir()
+                if detector in plans:
+                    plan = plans[detector]
+                    yield finish(detector, self._merge_function_findings(ctx, plan, run_detector(detector, ctx.restrict(plan['run']))))
+                else:
+                    yield finish(detector, run_detector(detector))
+
+            # 7. 提取合约信息：优先使用检测阶段已经编译出的 AST；未编译时使用缓存的合约信息，
+            #    没有缓存且 need_contracts 为 True 时才为此单独编译
+            entry = None
+            if file_key is not None and not ctx.ast_loaded:
+                entry = self.cache.get(FINDINGS_NAMESPACE, file_key)
+            if self.need_contracts and not ctx.ast_loaded and not isinstance(entry, dict):
+                if progress:
+                    yield {'event': 'compile_started', 'file': file_path}
+                    t0 = time.time()
+                    compiled = ctx.ast is not None
+                    yield {'event': 'compile_finished', 'file': file_path, 'ok': compiled, 'duration': round(time.time() - t0, 4)}
+                else:
+                    ctx.ast
+            ast = ctx.ast if ctx.ast_loaded else None
+            if ast:
+                contracts_info = SlitherReportGenerator.extract_contracts_info(ast, file_path, content, ctx.line_index)
+                if contracts_map is None:
+                    contracts_map = self._extract_contracts_and_functions(ast, content, ctx.line_index, ctx.index)
+            elif isinstance(entry, dict):
+                contracts_info = [dict(c, source_file=file_path) for c in entry.get('contracts') or []]
+                contracts_map = entry.get('contracts_map') or contracts_map
+
+            # 结果按检测器加载顺序汇总；早于编译产出的问题在此补充合约和函数
+            for detector in active:
+                for issue in found.get(detector, []):
+                    if contracts_map and 'contract' not in issue:
+                        self._locate_issue(issue, contracts_map)
                     results.append(issue)
-                    
+
+            if findings_keys and pending:
+                self._store_findings(ctx, file_key, findings_keys, found, pending, failed, contracts_info, contracts_map)
+            # 没有检测器出错且需要 AST 时编译成功，结果才算完整（增量分析只保存完整的结果）
+            complete = not failed and not (ctx.ast_loaded and not ctx.ast and 'ast' in self.stages)
+
         except Exception as e:
-            print(f"[错误] 无法分析文件 {file_path}: {e}")
-            import traceback
-            traceback.print_exc()
-            
-        return results
+            bus.log('error', f"无法分析文件 {file_path}: {e}")
+            bus.log('debug', traceback.format_exc())
+            if bus.wants('error'):
+                bus.emit('error', stage='analysis', file=file_path, error=str(e))
+            yield {'event': 'error', 'file': file_path, 'error': str(e)}
+
+        if bus.wants('file_end'):
+            bus.emit('file_end', file=file_path, duration=time.perf_counter() - start_time,
+                     findings=len(results), results=results)
+        yield {
+            'event': 'finished',
+            'record': {
+                'file': file_path,
+                'results': results,
+                'contracts': contracts_info,
+                'solidity_version': solidity_version,
+                # 因触发词缺失而未运行的检测器
+                'skipped_detectors': skipped,
+                # 直接复用缓存结果的检测器
+                'cached_detectors': [d.id for d in cached],
+                # 复用函数级缓存结果的 (检测器, 函数) 数量
+                'cached_functions': cached_functions,
+                'complete': complete,
+            },
+        }
+
+    def _store_findings(self, ctx: AnalysisContext, file_key: str, keys: Dict[Any, str], found: Dict[Any, List[Dict[str, Any]]],
+                        detectors: List[BaseDetector], failed: List[Any], contracts_info: List[Dict[str, Any]],
+                        contracts_map: Optional[Dict[str, Any]]):
+        """
+        写入本次实际运行的检测器结果；执行出错的检测器不缓存，
+        编译失败时依赖 AST / IR / 数据流的检测器结果也不缓存（可能只是 solc 暂时不可用）
+        """
+        ast_failed = ctx.ast_loaded and not ctx.ast and 'ast' in self.stages
+        for detector in detectors:
+            if detector in failed or detector not in found:
+                continue
+            if ast_failed and set(detector.requires) & {'ast', 'ir', 'dataflow'}:
+                continue
+            self.cache.put(FINDINGS_NAMESPACE, keys[detector], found[detector])
+        if ctx.ast_loaded and ctx.ast:
+            self.cache.put(FINDINGS_NAMESPACE, file_key, {
+                'contracts': [{k: v for k, v in c.items() if k != 'source_file'} for c in contracts_info],
+                'contracts_map': contracts_map or {},
+            })
+
+    def _function_plan(self, ctx: AnalysisContext, detector: BaseDetector) -> Optional[Dict[str, Any]]:
+        """
+        按函数查询检测结果缓存。函数条目的键：solc 版本与编译选项 + 检测器签名 + 文件级声明哈希
+        + 所属合约 + 函数及其同名函数的结构哈希（不含源码哈希，函数平移或文件其它部分修改时仍可命中）；
+        函数之外的问题（如修饰器内）以包含绝对行号的 layout 哈希为键。
+        返回 {'keys', 'reused': {src: 问题（行号为相对函数起始行的偏移）}, 'run': 需重新运行的函数 src 集合,
+        'outside_key', 'outside': 函数之外的问题（未命中为 None）}；无法按函数划分时返回 None
+        """
+        structure = ctx.structure
+        if not structure.functions:
+            return None
+        # IR 降级为文本扫描时没有函数 src，无法按函数划分
+        if 'ir' in detector.requires and not all(fn.get('src') for fn in (ctx.ir or {}).get('functions') or []):
+            return None
+        base = (self.ast_parser.resolve_version(ctx.content), self.ast_parser.compile_options, self._signature(detector))
+        plan = {'keys': {}, 'reused': {}, 'run': set()}
+        for unit in structure.functions:
+            key = plan['keys'][unit['src']] = DiskCache.make_key(
+                'function', *base, structure.declarations, unit['contract'], unit['hash'], unit['group_hash'])
+            entry = self.cache.get(FINDINGS_NAMESPACE, key)
+            if isinstance(entry, list):
+                plan['reused'][unit['src']] = entry
+            else:
+                plan['run'].add(unit['src'])
+        plan['outside_key'] = DiskCache.make_key('outside', *base, structure.layout)
+        entry = self.cache.get(FINDINGS_NAMESPACE, plan['outside_key'])
+        plan['outside'] = entry if isinstance(entry, list) else None
+        return plan
+
+    def _merge_function_findings(self, ctx: AnalysisContext, plan: Dict[str, Any], fresh: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        合并复用的函数结果与本次运行的结果（fresh 为 None 表示未运行）：
+        复用的问题按函数新的起始行重新锚定；本次运行的问题按所在函数拆分，以相对行号写入缓存。
+        结果按函数位置排序，与整文件运行的顺序一致
+        """
+        units = ctx.structure.functions
+        ranked = []
+        for unit in units:
+            for seq, issue in enumerate(plan['reused'].get(unit['src'], ())):
+                ranked.append((unit['start'], seq, dict(issue, line=unit['start'] + issue['line'])))
+        if fresh is None:
+            ranked.extend((issue.get('line') or 0, seq, issue) for seq, issue in enumerate(plan['outside']))
+            return [issue for _, _, issue in sorted(ranked, key=lambda item: item[:2])]
+        by_unit: Dict[str, List[Dict[str, Any]]] = {src: [] for src in plan['run']}
+        outside = []
+        for seq, issue in enumerate(fresh):
+            line = issue.get('line')
+            unit = ctx.structure.function_at(line) if isinstance(line, int) else None
+            if unit is None:
+                outside.append(issue)
+                ranked.append((line if isinstance(line, int) else 0, seq, issue))
+            elif unit['src'] in by_unit:
+                by_unit[unit['src']].append(issue)
+                ranked.append((unit['start'], seq, issue))
+            # 落在复用函数内的问题以缓存结果为准
+        for unit in units:
+            if unit['src'] in by_unit:
+                self.cache.put(FINDINGS_NAMESPACE, plan['keys'][unit['src']],
+                               [dict(issue, line=issue['line'] - unit['start']) for issue in by_unit[unit['src']]])
+        self.cache.put(FINDINGS_NAMESPACE, plan['outside_key'], outside)
+        return [issue for _, _, issue in sorted(ranked, key=lambda item: item[:2])]
+
+    def _enrich_issue(self, detector: BaseDetector, issue: Dict[str, Any], lines: List[str], contracts_map: Optional[Dict[str, Any]]):
+        """补充检测器元数据、出错代码片段，以及（如可用）所在的合约和函数"""
+        issue['detector'] = detector.id
+        issue['severity'] = detector.severity
+        issue['desc'] = detector.description
+        issue['title'] = detector.title
+        issue['swc_id'] = detector.swc_id or detector.id
+        issue['confidence'] = detector.confidence
+        issue['fix_suggestion'] = detector.fix_suggestion
+
+        # 获取出错行的具体代码（包括上下文）
+        line_num = issue.get('line', 0)
+        if line_num and 0 < line_num <= len(lines):
+            start_line = max(0, line_num - 2)
+            end_line = min(len(lines), line_num + 2)
+            issue['code'] = '\n'.join(lines[start_line:end_line])
+            issue['end_line'] = end_line
+
+        if contracts_map:
+            self._locate_issue(issue, contracts_map)
+
+    def _locate_issue(self, issue: Dict[str, Any], contracts_map: Dict[str, Any]):
+        """尝试匹配到合约和函数"""
+        contract_name, function_name = self._find_contract_and_function(
+            issue.get('line', 0), contracts_map
+        )
+        if contract_name:
+            issue['contract'] = contract_name
+        if function_name:
+            issue['function'] = function_name
     
     def _extract_solidity_version(self, content: str) -> str:
         """从源代码中提取 Solidity 版本"""
@@ -122,61 +870,35 @@ class AnalyzerEngine:
             return version_match.group(1) + ".0"
         return "unknown"
     
-    def _extract_contracts_and_functions(self, ast: Dict, content: str) -> Dict[str, Any]:
+    def _extract_contracts_and_functions(self, ast: Dict, content: str, line_index: Optional[LineIndex] = None, index: Optional[ASTIndex] = None) -> Dict[str, Any]:
         """
         从 AST 中提取合约和函数的行号范围
         返回: {contract_name: {'range': (start, end), 'functions': {func_name: (start, end)}}}
         """
         contracts = {}
+        if not ast:
+            return contracts
+        line_index = line_index or LineIndex(content)
+        index = index or ASTIndex(ast)
         
-        def get_line_number(offset: int) -> int:
-            return content[:offset].count('\n') + 1
-        
-        def visit_node(node):
-            if node.get('nodeType') == 'ContractDefinition':
-                contract_name = node.get('name', 'Unknown')
-                src = node.get('src', '0:0:0')
-                parts = src.split(':')
-                if len(parts) >= 2:
-                    offset = int(parts[0])
-                    length = int(parts[1])
-                    start_line = get_line_number(offset)
-                    end_line = get_line_number(offset + length)
-                else:
-                    start_line = end_line = 1
-                
-                contracts[contract_name] = {
-                    'range': (start_line, end_line),
-                    'functions': {}
-                }
-                
-                # 提取函数
-                for node_item in node.get('nodes', []):
-                    if node_item.get('nodeType') == 'FunctionDefinition':
-                        func_name = node_item.get('name', '')
-                        if not func_name:
-                            func_name = node_item.get('kind', 'unknown')
-                        func_src = node_item.get('src', '0:0:0')
-                        func_parts = func_src.split(':')
-                        if len(func_parts) >= 2:
-                            func_offset = int(func_parts[0])
-                            func_length = int(func_parts[1])
-                            func_start = get_line_number(func_offset)
-                            func_end = get_line_number(func_offset + func_length)
-                            contracts[contract_name]['functions'][func_name] = (func_start, func_end)
-        
-        def walk(node):
-            if not isinstance(node, dict):
-                return
-            visit_node(node)
-            for key in ['nodes', 'children']:
-                children = node.get(key, [])
-                if isinstance(children, list):
-                    for child in children:
-                        walk(child)
-        
-        if ast:
-            walk(ast)
+        for node in index.contracts:
+            contract_name = node.get('name', 'Unknown')
+            start_line, end_line = line_index.line_range_from_src(node.get('src', '0:0:0'))
+            
+            contracts[contract_name] = {
+                'range': (start_line, end_line),
+                'functions': {}
+            }
+            
+            # 提取函数
+            for node_item in node.get('nodes', []):
+                if node_item.get('nodeType') == 'FunctionDefinition':
+                    func_name = node_item.get('name', '')
+                    if not func_name:
+                        func_name = node_item.get('kind', 'unknown')
+                    func_range = line_index.line_range_from_src(node_item.get('src', '0:0:0'), default=None)
+                    if func_range:
+                        contracts[contract_name]['functions'][func_name] = func_range
         return contracts
     
     def _find_contract_and_function(self, line_num: int, contracts_map: Dict) -> Tuple[str, str]:
@@ -196,3 +918,52 @@ class AnalyzerEngine:
                 break
         
         return contract_name, function_name
+
+
+_source_digests: Dict[str, str] = {}
+
+
+def source_digest(cls) -> str:
+    """检测器类所在模块源码的 SHA-256（按文件缓存）；无法定位源码时返回空字符串"""
+    try:
+        path = inspect.getsourcefile(cls)
+    except TypeError:
+        path = None
+    if not path:
+        return ''
+    if path not in _source_digests:
+        try:
+            with open(path, 'rb') as f:
+                _source_digests[path] = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            _source_digests[path] = ''
+    return _source_digests[path]
+
+
+def detector_digest(cls) -> str:
+    """检测器类及其基类（如 core.interface）所在模块源码的组合摘要"""
+    digests = []
+    for klass in cls.__mro__:
+        if klass is object:
+            continue
+        digest = source_digest(klass)
+        if digest and digest not in digests:
+            digests.append(digest)
+    return DiskCache.make_key(*digests)
+
+
+# 多进程工作函数：每个进程持有一个已加载插件的引擎
+_worker_engine: Optional[AnalyzerEngine] = None
+
+
+def _init_worker(plugin_dir: str, cache_config: Optional[Tuple[str, int]], selection, cache_findings: bool = True,
+                 compact: bool = False, need_contracts: bool = False):
+    global _worker_engine
+    cache = DiskCache(cache_config[0], max_bytes=cache_config[1]) if cache_config else None
+    _worker_engine = AnalyzerEngine(cache=cache, cache_findings=cache_findings, compact_ast=compact,
+                                    need_contracts=need_contracts)
+    _worker_engine.load_plugins(plugin_dir, verbose=False, include=selection[0], exclude=selection[1])
+
+
+def _analyze_task(file_paths: List[str]) -> List[Dict[str, Any]]:
+    return _worker_engine.analyze_files(file_paths)
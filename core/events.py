@@ -0,0 +1,204 @@
+import json
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 日志级别（log 事件的 level 字段）与控制台前缀
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+_PREFIXES = {'debug': '[DEBUG]', 'info': '[系统]', 'warning': '[警告]', 'error': '[错误]'}
+
+
+class EventBus:
+    """
+    引擎生命周期事件总线
+
+    事件为 dict，'event' 字段是事件名，'ts' 为时间戳，其余为事件自带字段：
+      plugin_loaded / plugin_error          插件加载
+      run_start / run_end                   一批文件的分析开始、结束
+      file_start / file_end                 单个文件的分析开始、结束（file_end 带 duration、findings、results）
+      stage_end                             阶段结束：stage=lex / compile / ir / dataflow / ast_walk / report，带 duration（及 cpu、nodes）
+      detector_end                          单个检测器在单个文件上运行结束，带 duration、cpu、findings（遍历型检测器带 nodes）
+      error                                 出错：stage、error
+      log                                   文本日志：level、message
+
+    sink 为可调用对象 sink(event)，可通过 events 属性（事件名元组）只订阅部分事件，未声明时订阅全部。
+    热路径在发出事件前先调用 wants(name)，没有 sink 订阅时不构造事件、不计时。
+    """
+
+    def __init__(self, sinks=None):
+        self._routes: Dict[str, Tuple[Callable, ...]] = {}
+        self._catch_all: Tuple[Callable, ...] = ()
+        self._sinks: List[Callable] = []
+        self._lock = threading.Lock()
+        for sink in sinks or ():
+            self.subscribe(sink)
+
+    def subscribe(self, sink: Callable, events: Optional[Tuple[str, ...]] = None):
+        """注册 sink；events 未指定时使用 sink.events，仍为空则订阅全部事件"""
+        events = events if events is not None else getattr(sink, 'events', None)
+        with self._lock:
+            self._sinks.append(sink)
+            if events is None:
+                self._catch_all = self._catch_all + (sink,)
+            else:
+                for name in events:
+                    self._routes[name] = self._routes.get(name, ()) + (sink,)
+        return sink
+
+    def unsubscribe(self, sink: Callable):
+        with self._lock:
+            if sink in self._sinks:
+                self._sinks.remove(sink)
+            self._catch_all = tuple(s for s in self._catch_all if s is not sink)
+            self._routes = {
+                name: tuple(s for s in sinks if s is not sink)
+                for name, sinks in self._routes.items()
+            }
+            self._routes = {name: sinks for name, sinks in self._routes.items() if sinks}
+
+    @property
+    def sinks(self) -> List[Callable]:
+        return list(self._sinks)
+
+    def wants(self, name: str) -> bool:
+        """是否有 sink 订阅该事件"""
+        return bool(self._catch_all) or name in self._routes
+
+    def emit(self, name: str, /, **fields):
+        sinks = self._routes.get(name, ()) + self._catch_all
+        if not sinks:
+            return
+        event = {'event': name, 'ts': time.time()}
+        event.update(fields)
+        for sink in sinks:
+            try:
+                sink(event)
+            except Exception as e:
+                # sink 自身出错不影响分析
+                print(f"[警告] 事件处理器 {type(sink).__name__} 出错: {e}", file=sys.stderr)
+
+    def log(self, level: str, message: str):
+        if self.wants('log'):
+            self.emit('log', level=level, message=message)
+
+
+def log(bus: Optional[EventBus], level: str, message: str):
+    """向总线发送日志；没有总线（如单独使用解析器）时直接打印到控制台"""
+    if bus is None:
+        print(f"{_PREFIXES.get(level, '[*]')} {message}")
+    else:
+        bus.log(level, message)
+
+
+class ConsoleSink:
+    """控制台输出：打印不低于 level 的日志与插件加载信息（与原先的 print 输出一致）"""
+
+    events = ('log', 'plugin_loaded')
+
+    def __init__(self, level: str = 'info', stream=None):
+        self.level = LEVELS.get(level, 20)
+        self.stream = stream
+
+    def __call__(self, event: Dict[str, Any]):
+        if event['event'] == 'plugin_loaded':
+            if self.level <= LEVELS['info']:
+                print(f"[系统] 已加载检测规则: {event.get('name')}", file=self.stream or sys.stdout)
+            return
+        level = event.get('level', 'info')
+        if LEVELS.get(level, 20) >= self.level:
+            print(f"{_PREFIXES.get(level, '[*]')} {event.get('message')}", file=self.stream or sys.stdout)
+
+
+class QuietSink(ConsoleSink):
+    """安静模式：只输出错误"""
+
+    def __init__(self, stream=None):
+        super().__init__(level='error', stream=stream)
+
+
+class ProgressSink:
+    """
+    终端进度条：根据 run_start / file_end 显示已完成文件数与当前文件
+    输出流不是 TTY（如重定向到文件或 CI 日志）时不输出任何内容
+    """
+
+    events = ('run_start', 'file_end', 'run_end')
+
+    def __init__(self, stream=None, width: int = 30):
+        self.stream = stream or sys.stderr
+        self.width = width
+        self.enabled = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.total = 0
+        self.done = 0
+        self.findings = 0
+
+    def __call__(self, event: Dict[str, Any]):
+        if not self.enabled:
+            return
+        name = event['event']
+        if name == 'run_start':
+            self.total = event.get('files', 0)
+            self.done = 0
+            self.findings = 0
+        elif name == 'file_end':
+            self.done += 1
+            self.findings += event.get('findings', 0)
+            self._render(event.get('file', ''))
+        elif name == 'run_end':
+            self.stream.write('\n')
+            self.stream.flush()
+
+    def _render(self, current: str):
+        total = max(self.total, self.done, 1)
+        filled = int(self.width * self.done / total)
+        bar = '#' * filled + '-' * (self.width - filled)
+        label = current[-40:]
+        self.stream.write(f"\r[{bar}] {self.done}/{total} 问题 {self.findings}  {label:<40}")
+        self.stream.flush()
+
+
+class JsonLinesSink:
+    """把事件逐行写入 JSON-lines 跟踪文件；默认不写入 file_end 中完整的 results 列表"""
+
+    def __init__(self, path: str, exclude: Tuple[str, ...] = ('results',)):
+        self.path = path
+        self.exclude = exclude
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Dict[str, Any]):
+        data = {k: v for k, v in event.items() if k not in self.exclude}
+        line = json.dumps(data, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class MetricsSink:
+    """把阶段、检测器与文件事件累加到 core.metrics.EngineMetrics"""
+
+    events = ('stage_end', 'detector_end', 'file_end', 'error')
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def __call__(self, event: Dict[str, Any]):
+        name = event['event']
+        if name == 'stage_end':
+            stage = event.get('stage')
+            self.metrics.observe_stage(stage, event.get('duration', 0.0))
+            if stage == 'compile':
+                self.metrics.record_solc(event.get('version'))
+        elif name == 'detector_end':
+            self.metrics.observe_detector(event.get('detector'), event.get('duration', 0.0))
+        elif name == 'file_end':
+            if event.get('duration') is not None:
+                self.metrics.observe_stage('analyze', event['duration'])
+            self.metrics.record_file(event.get('results') or [])
+        elif name == 'error':
+            self.metrics.record_error(event.get('stage', 'unknown'))
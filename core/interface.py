@@ -1,6 +1,13 @@
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any
 from .context import AnalysisContext
+from .events import log
+from .visitor import ASTDispatcher
+
+# 检测器可声明的输入能力：源码文本、solc AST、SCA-IR、数据流分析结果
+CAPABILITIES = ('text', 'ast', 'ir', 'dataflow')
+# 检测结果的作用范围：整个文件，或可按函数独立计算
+SCOPES = ('file', 'function')
 
 class BaseDetector(ABC):
     """
@@ -45,6 +52,11 @@ class BaseDetector(ABC):
         """修复建议（可选）"""
         return "Please review the code and apply security best practices."
 
+    @property
+    def version(self):
+        """规则版本（可选）；计入引擎指纹，变化时依赖指纹的结果缓存随之失效"""
+        return "1.0"
+
     @abstractmethod
     def check(self, content: str, filename: str, ast: dict = None) -> list:
         """
@@ -56,18 +68,96 @@ class BaseDetector(ABC):
         """
         pass
 
+    @property
+    def requires(self):
+        """
+        检测器需要的输入（CAPABILITIES 的子集），引擎加载插件时校验一次，
+        并据此跳过无检测器需要的阶段（solc 编译、IR 构建、数据流分析）。
+        默认与 check(content, filename, ast) 签名一致。
+        """
+        return ('text', 'ast')
+
+    @property
+    def scope(self):
+        """
+        结果的作用范围（SCOPES 之一）。'function' 表示函数内的问题只取决于该函数、
+        同名函数与文件级声明（状态变量、修饰器等），引擎可按函数缓存结果，
+        文件修改后只在结构变化的函数上重新运行。默认 'file'。
+        """
+        return 'file'
+
+    @property
+    def triggers(self):
+        """
+        触发词（可选）：源码中的字面子串，至少出现一个时检测器才可能报告问题。
+        引擎每个文件只扫描一次全部触发词，触发词全部缺失时跳过该检测器。
+        默认 None 表示总是运行。
+        """
+        return None
+
+    @property
+    def patterns(self):
+        """
+        文本模式（可选）：{名称: 正则}，在屏蔽了注释与字符串的源码上匹配。
+        引擎把所有检测器的模式合并为一次扫描，结果通过 text_hits(ctx) 读取。
+        """
+        return None
+
     # 标准化接口：新增 run(ctx)，统一由引擎调用
-    # 旧插件无需改动：默认使用 check 适配
+    # 旧插件无需改动：默认使用 check 适配，按 requires 传入 ast / ir
     def run(self, ctx: AnalysisContext) -> List[Dict[str, Any]]:
-        try:
-            return self.check(ctx.content, ctx.filename, ast=ctx.ast)
-        except TypeError:
-            # 部分新插件可能接受 ir 参数
-            try:
-                return self.check(ctx.content, ctx.filename, ast=ctx.ast, ir=ctx.ir)  # type: ignore
-            except Exception:
-                return []
+        kwargs = {}
+        if 'ast' in self.requires:
+            kwargs['ast'] = ctx.ast
+        if 'ir' in self.requires:
+            kwargs['ir'] = ctx.ir
+        return self.check(ctx.content, ctx.filename, **kwargs)
+
+    def text_hits(self, ctx: AnalysisContext) -> Dict[str, List[int]]:
+        """patterns 中各模式命中的行号 {名称: [行号, ...]}"""
+        return ctx.pattern_hits(self.id, self.patterns)
 
     # 统一问题输出的帮助方法
     def report(self, line: int, msg: str) -> Dict[str, Any]:
         return {"line": line, "msg": msg}
+
+
+class ASTVisitorDetector(BaseDetector):
+    """
+    基于节点订阅的 AST 检测器基类
+
+    子类实现 on_<NodeType>(node, state) / leave_<NodeType>(node, state)，
+    返回问题列表（或 None）。引擎对每个文件只遍历一次 AST，并把节点分发给
+    订阅了对应类型的检测器；state 提供当前函数、循环深度等上下文。
+    """
+
+    @property
+    def requires(self):
+        return ('ast',)
+
+    def visit_begin(self, state):
+        """遍历开始前调用，可在 state.local(self) 中准备本文件的私有数据"""
+        pass
+
+    def visit_end(self, state, issues: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """遍历结束后调用，可对收集到的问题做补充或过滤"""
+        return issues
+
+    def run_without_ast(self, ctx: AnalysisContext) -> List[Dict[str, Any]]:
+        """AST 不可用时的回退逻辑，默认不报告问题"""
+        return []
+
+    def run(self, ctx: AnalysisContext) -> List[Dict[str, Any]]:
+        # 单独运行时（未经引擎统一分发）自行遍历一次
+        if not ctx.ast:
+            return self.run_without_ast(ctx)
+        scopes = {self: ctx.function_filter} if ctx.function_filter is not None else None
+        errors = []
+        issues = ASTDispatcher([self]).run(ctx, errors=errors, scopes=scopes)[self]
+        for _, message in errors:
+            log(None, 'error', f"检测规则 {type(self).__name__} 执行失败: {message}")
+        return issues
+
+    def check(self, content: str, filename: str, ast: dict = None, ir: dict = None) -> list:
+        ctx = AnalysisContext(content=content, filename=filename, ast=ast, ir=ir)
+        return self.run(ctx)
@@ -0,0 +1,179 @@
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .events import log
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFullError(Exception):
+    """排队任务数已达上限"""
+    pass
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    if ts is None:
+        return None
+    return datetime.utcfromtimestamp(ts).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class Job:
+    """单个分析任务的状态与结果"""
+
+    def __init__(self, name: str = ''):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.future: Optional[Future] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "created_at": _iso(self.created_at),
+            "started_at": _iso(self.started_at),
+            "finished_at": _iso(self.finished_at),
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    有界的后台任务队列
+
+    - 固定大小的线程池执行任务，不阻塞调用方（如 FastAPI 的事件循环）
+    - 排队中（尚未开始执行）的任务数超过 max_queued 时拒绝提交，抛出 QueueFullError
+    - 已完成的任务保留 ttl 秒供查询结果，之后在提交新任务时清理
+    """
+
+    def __init__(self, workers: int = 2, max_queued: int = 32, ttl: float = 3600.0):
+        self.workers = max(1, workers)
+        self.max_queued = max(0, max_queued)
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='sca-job')
+        self._jobs: Dict[str, Job] = {}
+        # 按提交顺序排列的排队中任务，用于计算队列位置
+        self._queued: List[str] = []
+        self._running = 0
+        # 累计完成 / 失败 / 因队列已满被拒绝的任务数
+        self.completed_total = 0
+        self.failed_total = 0
+        self.rejected_total = 0
+        self._lock = threading.Lock()
+        # 事件总线（core.events.EventBus）；为 None 时日志直接打印
+        self.events = None
+
+    def submit(self, fn: Callable[..., Any], *args, name: str = '', store: bool = True, **kwargs) -> Job:
+        """
+        提交任务；队列已满时抛出 QueueFullError
+        store=False 时任务不保存供查询（调用方直接等待 job.future），只占用队列名额
+        """
+        job = Job(name)
+        with self._lock:
+            self._purge_expired()
+            # 空闲线程会立即取走任务，不计入排队上限
+            idle = max(0, self.workers - self._running)
+            if len(self._queued) >= self.max_queued + idle:
+                self.rejected_total += 1
+                raise QueueFullError(f"排队任务数已达上限 ({self.max_queued})")
+            if store:
+                self._jobs[job.id] = job
+            self._queued.append(job.id)
+        job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def add_done(self, result: Any, name: str = '') -> Job:
+        """登记一个已完成的任务（如命中报告缓存），不占用队列名额"""
+        job = Job(name)
+        now = time.time()
+        job.status = DONE
+        job.started_at = job.finished_at = now
+        job.result = result
+        job.future = Future()
+        job.future.set_result(result)
+        with self._lock:
+            self._purge_expired()
+            self._jobs[job.id] = job
+            self.completed_total += 1
+        return job
+
+    def _run(self, job: Job, fn, args, kwargs):
+        with self._lock:
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._running += 1
+            if job.id in self._queued:
+                self._queued.remove(job.id)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            log(self.events, 'error', f"分析任务 {job.id} ({job.name}) 失败: {e}")
+            with self._lock:
+                job.status = FAILED
+                job.error = str(e) or type(e).__name__
+                job.finished_at = time.time()
+                self._running -= 1
+                self.failed_total += 1
+            raise
+        with self._lock:
+            job.result = result
+            job.status = DONE
+            job.finished_at = time.time()
+            self._running -= 1
+            self.completed_total += 1
+        return result
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def position(self, job: Job) -> Optional[int]:
+        """排队中任务的位置（从 1 开始），已开始执行时返回 None"""
+        with self._lock:
+            try:
+                return self._queued.index(job.id) + 1
+            except ValueError:
+                return None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queued": self.max_queued,
+                "queued": len(self._queued),
+                "running": self._running,
+                "stored": len(self._jobs),
+                "completed_total": self.completed_total,
+                "failed_total": self.failed_total,
+                "rejected_total": self.rejected_total,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _purge_expired(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at is not None and now - job.finished_at > self.ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
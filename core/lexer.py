@@ -0,0 +1,107 @@
+import re
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+# 注释与字符串字面量；从左到右匹配，字符串中的 // 与注释中的引号都能正确处理
+_TOKEN_RE = re.compile(
+    r'//[^\n]*'
+    r'|/\*.*?(?:\*/|\Z)'
+    r'|"(?:\\.|[^"\\\n])*"?'
+    r"|'(?:\\.|[^'\\\n])*'?",
+    re.S,
+)
+_NON_NEWLINE_RE = re.compile(r'[^\n]')
+
+
+def _blank(m: 're.Match') -> str:
+    text = m.group(0)
+    if text[0] in '"\'':
+        # 字符串保留两侧引号，只清空内容
+        closed = len(text) > 1 and text[-1] == text[0]
+        inner = text[1:-1] if closed else text[1:]
+        return text[0] + _NON_NEWLINE_RE.sub(' ', inner) + (text[0] if closed else '')
+    return _NON_NEWLINE_RE.sub(' ', text)
+
+
+def mask_source(content: str) -> str:
+    """将注释与字符串内容替换为空格，长度与换行位置保持不变（行号、偏移不受影响）"""
+    return _TOKEN_RE.sub(_blank, content)
+
+
+class MaskedSource:
+    """
+    屏蔽注释与字符串后的源码
+
+    文本规则在 masked 文本上匹配，不再需要 "'//' not in line" 之类的粗略判断；
+    由于长度和换行不变，匹配位置可直接换算为原始源码的行号。
+    """
+
+    def __init__(self, content: str):
+        self.text = mask_source(content)
+        self.lines = self.text.split('\n')
+        starts = [0]
+        for line in self.lines[:-1]:
+            starts.append(starts[-1] + len(line) + 1)
+        self._starts = starts
+
+    def line_of(self, offset: int) -> int:
+        """字符偏移 -> 行号（从 1 开始）"""
+        return bisect_right(self._starts, offset)
+
+    def line(self, line_num: int) -> str:
+        """行号（从 1 开始）对应的屏蔽后文本"""
+        return self.lines[line_num - 1]
+
+
+class PatternSet:
+    """
+    预编译的多规则模式集合
+
+    每条模式以 (所属者, 名称) 登记，所有模式合并为一个零宽先行断言的正则，
+    对屏蔽后的源码只扫描一遍得到候选位置，再在候选位置上确认是哪些模式命中。
+    结果按行去重：{所属者: {名称: [行号, ...]}}。
+    模式中请勿使用命名分组或反向引用。
+    """
+
+    def __init__(self):
+        self._patterns: Dict[Tuple[str, str], 're.Pattern'] = {}
+        self._combined: Optional['re.Pattern'] = None
+
+    def add(self, owner: str, name: str, pattern: str):
+        self._patterns[(owner, name)] = re.compile(pattern)
+        self._combined = None
+
+    def update(self, owner: str, patterns: Dict[str, str]):
+        for name, pattern in patterns.items():
+            self.add(owner, name, pattern)
+
+    def owners(self):
+        return {owner for owner, _ in self._patterns}
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def scan(self, masked: MaskedSource) -> Dict[str, Dict[str, List[int]]]:
+        hits: Dict[str, Dict[str, set]] = {}
+        for owner, name in self._patterns:
+            hits.setdefault(owner, {})[name] = set()
+        if not self._patterns:
+            return {}
+        if self._combined is None:
+            self._combined = re.compile(
+                '(?=' + '|'.join(f'(?:{p.pattern})' for p in self._patterns.values()) + ')'
+            )
+        text = masked.text
+        items = list(self._patterns.items())
+        for m in self._combined.finditer(text):
+            pos = m.start()
+            line = None
+            for (owner, name), rx in items:
+                if rx.match(text, pos):
+                    if line is None:
+                        line = masked.line_of(pos)
+                    hits[owner][name].add(line)
+        return {
+            owner: {name: sorted(lines) for name, lines in names.items()}
+            for owner, names in hits.items()
+        }
@@ -0,0 +1,72 @@
+from bisect import bisect_right
+from typing import Optional, Tuple
+
+
+class LineIndex:
+    """
+    换行符字节偏移索引
+
+    solc 的 src 字段格式为 "偏移:长度:文件序号"，偏移量按 UTF-8 字节计算。
+    每个文件只构建一次索引，之后通过二分查找在 O(log n) 内完成偏移到行/列的转换，
+    避免 content[:offset].count('\\n') 反复复制与扫描前缀。
+    """
+
+    def __init__(self, content: str):
+        self._data = content.encode('utf-8')
+        # 每一行起始位置的字节偏移
+        starts = [0]
+        pos = self._data.find(b'\n')
+        while pos != -1:
+            starts.append(pos + 1)
+            pos = self._data.find(b'\n', pos + 1)
+        self._starts = starts
+
+    @property
+    def line_count(self) -> int:
+        return len(self._starts)
+
+    def line_of(self, offset: int) -> int:
+        """字节偏移 -> 行号（从 1 开始）"""
+        return bisect_right(self._starts, offset)
+
+    def line_col(self, offset: int) -> Tuple[int, int]:
+        """字节偏移 -> (行号, 列号)，列号按字符计数，均从 1 开始"""
+        line = self.line_of(offset)
+        start = self._starts[line - 1]
+        col = len(self._data[start:offset].decode('utf-8', errors='ignore')) + 1
+        return line, col
+
+    @staticmethod
+    def parse_src(src: Optional[str]) -> Optional[Tuple[int, int]]:
+        """解析 src 字段，返回 (偏移, 长度)；格式非法时返回 None"""
+        if not src:
+            return None
+        parts = str(src).split(':')
+        try:
+            offset = int(parts[0])
+            length = int(parts[1]) if len(parts) > 1 else 0
+        except ValueError:
+            return None
+        return offset, length
+
+    def line_from_src(self, src: Optional[str], default: int = 1) -> int:
+        """src -> 起始行号"""
+        parsed = self.parse_src(src)
+        if parsed is None:
+            return default
+        return self.line_of(parsed[0])
+
+    def line_col_from_src(self, src: Optional[str]) -> Optional[Tuple[int, int]]:
+        """src -> (起始行号, 列号)"""
+        parsed = self.parse_src(src)
+        if parsed is None:
+            return None
+        return self.line_col(parsed[0])
+
+    def line_range_from_src(self, src: Optional[str], default: Tuple[int, int] = (1, 1)) -> Tuple[int, int]:
+        """src -> (起始行号, 结束行号)"""
+        parsed = self.parse_src(src)
+        if parsed is None:
+            return default
+        offset, length = parsed
+        return self.line_of(offset), self.line_of(offset + length)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from .events import log
+
+# 清单文件格式版本，不兼容的旧清单会被忽略
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST_NAME = '.sca-manifest.json'
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Manifest:
+    """
+    增量分析清单
+
+    为每个文件记录 (路径, 大小, mtime, 内容哈希) 以及上次的分析记录，并保存引擎指纹。
+    再次分析时：大小与 mtime 都未变化的文件直接视为未变化；否则计算哈希，内容相同也视为未变化。
+    引擎指纹（检测器集合、版本、插件源码）变化时所有文件都需要重新分析。
+    需要合约信息的运行（Slither / HTML 报告）不复用未提取合约信息（如只运行文本规则、未编译）时保存的记录。
+    路径以清单所在目录为基准保存为相对路径，工作目录变化时清单仍然有效。
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self.base_dir = os.path.dirname(self.path)
+        self.fingerprint: Optional[str] = None
+        # 相对路径 -> {'size', 'mtime_ns', 'sha256', 'contracts', 'record'}；contracts 表示记录是否一定包含合约信息
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        # plan() 时采集的文件状态，update() 时写入，避免分析期间文件再次变化导致清单与结果不一致
+        self._pending: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def load(cls, path: str, events=None) -> 'Manifest':
+        """读取清单；不存在、损坏或版本不兼容时返回空清单（警告发送到事件总线 events，为 None 时直接打印）"""
+        manifest = cls(path)
+        try:
+            with open(manifest.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return manifest
+        except (OSError, ValueError) as e:
+            log(events, 'warning', f"无法读取增量分析清单 {path}，将重新分析全部文件: {e}")
+            return manifest
+        if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+            log(events, 'warning', f"增量分析清单版本不兼容，将重新分析全部文件: {path}")
+            return manifest
+        manifest.fingerprint = data.get('fingerprint')
+        manifest.entries = data.get('files') or {}
+        return manifest
+
+    def _key(self, file_path: str) -> str:
+        return os.path.relpath(os.path.abspath(file_path), self.base_dir).replace(os.sep, '/')
+
+    def plan(self, files: List[str], fingerprint: str, need_contracts: bool = False) -> Dict[str, List[str]]:
+        """
+        对比清单与当前文件，返回 {'added', 'changed', 'unchanged', 'removed'}
+        added / changed / unchanged 为 files 中的路径，removed 为清单中已不存在的路径（清单内的相对路径）
+        need_contracts 为 True 时，未提取合约信息的记录视为已修改
+        """
+        plan: Dict[str, List[str]] = {'added': [], 'changed': [], 'unchanged': [], 'removed': []}
+        same_engine = fingerprint == self.fingerprint
+        seen = set()
+        self._pending = {}
+        for file_path in files:
+            key = self._key(file_path)
+            seen.add(key)
+            entry = self.entries.get(key)
+            # 引擎指纹相同，且运行需要合约信息时记录中已提取过合约信息，才可复用
+            reusable = entry is not None and same_engine and (bool(entry.get('contracts')) or not need_contracts)
+            try:
+                st = os.stat(file_path)
+                state = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+                if reusable and entry.get('size') == state['size'] and entry.get('mtime_ns') == state['mtime_ns']:
+                    plan['unchanged'].append(file_path)
+                    continue
+                # 大小或 mtime 变化（如重新检出）时按内容哈希确认
+                state['sha256'] = file_sha256(file_path)
+            except OSError:
+                # 无法读取的文件交给引擎分析并报告错误
+                plan['changed'].append(file_path)
+                continue
+            if entry is None:
+                plan['added'].append(file_path)
+            elif reusable and entry.get('sha256') == state['sha256']:
+                entry.update(state)
+                plan['unchanged'].append(file_path)
+                continue
+            else:
+                plan['changed'].append(file_path)
+            self._pending[key] = state
+        plan['removed'] = sorted(key for key in self.entries if key not in seen)
+        return plan
+
+    def record(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """上次保存的分析记录（文件路径替换为当前路径）"""
+        entry = self.entries.get(self._key(file_path))
+        if entry is None or entry.get('record') is None:
+            return None
+        record = json.loads(json.dumps(entry['record'], ensure_ascii=False))
+        record['file'] = file_path
+        for contract in record.get('contracts') or []:
+            contract['source_file'] = file_path
+        return record
+
+    def update(self, records: List[Dict[str, Any]], need_contracts: bool = False) -> int:
+        """
+        写入本次分析的记录；不完整的记录（出错或编译失败）不保存，下次仍会重新分析。返回保存的数量
+        need_contracts 表示本次运行提取了合约信息（引擎的 need_contracts）
+        """
+        stored = 0
+        for record in records:
+            key = self._key(record['file'])
+            state = self._pending.pop(key, None)
+            if state is None or not record.get('complete'):
+                self.entries.pop(key, None)
+                continue
+            # 通过 JSON 往返保存一份副本，调用方之后对记录的修改不影响清单
+            saved = json.loads(json.dumps({k: v for k, v in record.items() if k != 'file'}, ensure_ascii=False))
+            self.entries[key] = dict(state, contracts=need_contracts or bool(record.get('contracts')), record=saved)
+            stored += 1
+        return stored
+
+    def remove(self, keys: List[str]):
+        for key in keys:
+            self.entries.pop(key, None)
+
+    def save(self, fingerprint: str):
+        """原子写入清单（临时文件 + os.replace）"""
+        data = {'version': MANIFEST_VERSION, 'fingerprint': fingerprint, 'files': self.entries}
+        os.makedirs(self.base_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.fingerprint = fingerprint
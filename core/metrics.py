@@ -0,0 +1,186 @@
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 延迟直方图的默认桶上界（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    指标基类
+    callback 不为 None 时，导出时调用它取值：返回数值，或 {标签值元组: 数值}
+    """
+    type_name = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), callback: Optional[Callable[[], Any]] = None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def _samples(self) -> List[Tuple[str, Tuple[str, ...], float]]:
+        if self.callback is not None:
+            value = self.callback()
+            items = value.items() if isinstance(value, dict) else [((), value)]
+            return [(self.name, tuple(str(v) for v in key), val) for key, val in items if val is not None]
+        with self._lock:
+            return [(self.name, key, val) for key, val in sorted(self._values.items())]
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type_name}']
+        for name, key, value in self._samples():
+            lines.append(f'{name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数（非累计）..., +Inf 桶计数, 总和]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(series[-1])}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """进程内指标注册表，render() 输出 Prometheus 文本格式 (text/plain; version=0.0.4)"""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), callback=None) -> Counter:
+        return self._register(Counter(name, help_text, labelnames, callback))
+
+    def gauge(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), callback=None) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames, callback))
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                print(f"[警告] 导出指标 {metric.name} 失败: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+class EngineMetrics:
+    """
+    分析引擎的指标集合
+
+    设置 engine.metrics 后，引擎在事件总线上挂接 core.events.MetricsSink，
+    由它把 stage_end / detector_end / file_end / error 事件累加到这里；未设置时不产生任何开销。
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.stage_seconds = r.histogram(
+            'sca_stage_duration_seconds', '各分析阶段耗时（compile / ir / ast_walk / analyze / report）', ('stage',))
+        self.detector_seconds = r.histogram(
+            'sca_detector_duration_seconds', '单个检测器在单个文件上的运行耗时', ('detector',))
+        self.solc_invocations = r.counter(
+            'sca_solc_invocations_total', 'solc 调用次数（按版本）', ('version',))
+        self.files = r.counter('sca_files_analyzed_total', '已分析的文件数')
+        self.findings = r.counter('sca_findings_total', '报告的问题数（按检测器与严重程度）', ('detector', 'severity'))
+        self.errors = r.counter('sca_errors_total', '错误次数（按阶段）', ('stage',))
+
+    def observe_stage(self, stage: str, seconds: float):
+        self.stage_seconds.observe(seconds, stage=stage)
+
+    def observe_detector(self, detector_id: str, seconds: float):
+        self.detector_seconds.observe(seconds, detector=detector_id)
+
+    def record_solc(self, version: Optional[str]):
+        self.solc_invocations.inc(version=version or 'default')
+
+    def record_file(self, results: List[Dict[str, Any]]):
+        self.files.inc()
+        for issue in results:
+            self.findings.inc(detector=issue.get('detector', ''), severity=issue.get('severity', ''))
+
+    def record_error(self, stage: str):
+        self.errors.inc(stage=stage)
@@ -0,0 +1,45 @@
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+
+class TriggerScanner:
+    """
+    触发词预筛选
+
+    检测器可通过 triggers 声明触发词（源码中的字面子串），只要出现其中任意一个才可能报告问题。
+    所有检测器的触发词合并为一个正则，每个文件只做一次线性扫描，
+    触发词全部缺失的检测器直接跳过，不再运行（也不会因此触发 solc 编译）。
+    """
+
+    def __init__(self, tokens: Iterable[str]):
+        self.tokens: List[str] = sorted(set(t for t in tokens if t), key=lambda t: (-len(t), t))
+        # 零宽先行断言保证每个位置都被检查，不会因前一个匹配吞掉字符而漏掉重叠的触发词；
+        # 同一位置按最长优先匹配，被包含的较短触发词在 scan() 中补齐
+        self._pattern = re.compile('(?=(' + '|'.join(re.escape(t) for t in self.tokens) + '))') if self.tokens else None
+        # 触发词 -> 它包含的其它（较短）触发词
+        self._implied: Dict[str, List[str]] = {
+            t: [o for o in self.tokens if o != t and o in t] for t in self.tokens
+        }
+
+    def scan(self, content: str) -> Set[str]:
+        """返回源码中出现的触发词集合"""
+        found: Set[str] = set()
+        if self._pattern is None:
+            return found
+        total = len(self.tokens)
+        for m in self._pattern.finditer(content):
+            token = m.group(1)
+            if token in found:
+                continue
+            found.add(token)
+            found.update(self._implied[token])
+            if len(found) == total:
+                break
+        return found
+
+    @staticmethod
+    def should_run(triggers: Optional[Iterable[str]], found: Set[str]) -> bool:
+        """未声明触发词的检测器总是运行；否则至少出现一个触发词才运行"""
+        if not triggers:
+            return True
+        return any(t in found for t in triggers)
@@ -0,0 +1,183 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# 表格可用的排序字段
+SORT_KEYS = ('wall', 'cpu', 'nodes', 'findings', 'calls')
+
+
+def _new_entry() -> Dict[str, Any]:
+    return {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'nodes': None, 'findings': None, 'visitor': False}
+
+
+def _accumulate(entry: Dict[str, Any], event: Dict[str, Any]):
+    entry['calls'] += 1
+    entry['wall'] += event.get('duration') or 0.0
+    entry['cpu'] += event.get('cpu') or 0.0
+    for key in ('nodes', 'findings'):
+        if event.get(key) is not None:
+            entry[key] = (entry[key] or 0) + event[key]
+
+
+def _frame(name: str) -> str:
+    # 折叠栈格式以 ';' 分隔栈帧，以最后一个空格分隔采样值
+    return str(name).replace(';', ':').replace(' ', '_')
+
+
+class ProfileSink:
+    """
+    性能剖析：按文件累计每个检测器与流水线阶段（lex / compile / ir / dataflow / ast_walk）的
+    墙钟时间、CPU 时间、遍历节点数与问题数，用于定位拖慢扫描的检测规则
+
+    节点数只对单次遍历分发的检测器（及 ast_walk 阶段）有意义，其余检测器显示为 '-'。
+    没有 file 字段的阶段事件（如批量编译）记到当时正在分析的文件上。
+    """
+
+    events = ('file_start', 'stage_end', 'detector_end', 'file_end')
+
+    def __init__(self):
+        # 文件 -> {(类型, 名称): 累计项}；类型为 'stage' 或 'detector'
+        self.files: Dict[str, Dict[Tuple[str, str], Dict[str, Any]]] = {}
+        # 文件 -> 分析总耗时（秒）与问题数
+        self.durations: Dict[str, float] = {}
+        self.findings: Dict[str, int] = {}
+        self._current: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Dict[str, Any]):
+        name = event['event']
+        with self._lock:
+            if name == 'file_start':
+                self._current = event.get('file')
+            elif name == 'stage_end':
+                self._add(event.get('file') or self._current, 'stage', event.get('stage'), event)
+            elif name == 'detector_end':
+                entry = self._add(event.get('file') or self._current, 'detector', event.get('detector'), event)
+                if event.get('nodes') is not None:
+                    entry['visitor'] = True
+            elif name == 'file_end':
+                file_path = event.get('file')
+                if event.get('duration') is not None:
+                    self.durations[file_path] = self.durations.get(file_path, 0.0) + event['duration']
+                self.findings[file_path] = self.findings.get(file_path, 0) + (event.get('findings') or 0)
+                self.files.setdefault(file_path, {})
+                self._current = None
+
+    def _add(self, file_path: Optional[str], kind: str, name: Any, event: Dict[str, Any]) -> Dict[str, Any]:
+        costs = self.files.setdefault(file_path or '<batch>', {})
+        entry = costs.get((kind, name))
+        if entry is None:
+            entry = costs[(kind, name)] = _new_entry()
+        _accumulate(entry, event)
+        return entry
+
+    @property
+    def total_seconds(self) -> float:
+        """所有文件的分析总耗时；没有文件耗时（如多进程分析）时为各项之和"""
+        if self.durations:
+            return sum(self.durations.values())
+        return sum(e['wall'] for costs in self.files.values() for e in costs.values())
+
+    def rows(self, sort: str = 'wall') -> List[Dict[str, Any]]:
+        """跨文件汇总后的每个阶段 / 检测器一行，按 sort 字段降序"""
+        merged: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for costs in self.files.values():
+            for key, entry in costs.items():
+                total = merged.get(key)
+                if total is None:
+                    total = merged[key] = _new_entry()
+                total['calls'] += entry['calls']
+                total['wall'] += entry['wall']
+                total['cpu'] += entry['cpu']
+                total['visitor'] = total['visitor'] or entry['visitor']
+                for field in ('nodes', 'findings'):
+                    if entry[field] is not None:
+                        total[field] = (total[field] or 0) + entry[field]
+        total_seconds = self.total_seconds
+        rows = []
+        for (kind, name), entry in merged.items():
+            row = dict(entry, kind=kind, name=name)
+            row['share'] = entry['wall'] / total_seconds if total_seconds else 0.0
+            rows.append(row)
+        sort = sort if sort in SORT_KEYS else 'wall'
+        rows.sort(key=lambda r: (r[sort] or 0, r['wall']), reverse=True)
+        return rows
+
+    def slowest_files(self, limit: int = 5) -> List[Tuple[str, float]]:
+        return sorted(self.durations.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def format_table(self, sort: str = 'wall', limit: Optional[int] = None) -> str:
+        """按 sort 排序的文本表格，附最慢的文件"""
+        rows = self.rows(sort)
+        if limit:
+            rows = rows[:limit]
+        lines = [
+            f"性能剖析（{len(self.durations) or len(self.files)} 个文件，总耗时 {self.total_seconds:.3f}秒，按 {sort} 排序）:",
+            f"{'类型':<10}{'名称':<32}{'次数':>6}{'墙钟(s)':>11}{'CPU(s)':>10}{'节点数':>10}{'问题数':>8}{'占比':>8}",
+        ]
+        for row in rows:
+            nodes = '-' if row['nodes'] is None else str(row['nodes'])
+            findings = '-' if row['findings'] is None else str(row['findings'])
+            lines.append(
+                f"{row['kind']:<10}{str(row['name'])[:31]:<32}{row['calls']:>6}{row['wall']:>11.4f}"
+                f"{row['cpu']:>10.4f}{nodes:>10}{findings:>8}{row['share'] * 100:>7.1f}%"
+            )
+        slowest = self.slowest_files()
+        if slowest:
+            lines.append("最慢的文件:")
+            for file_path, seconds in slowest:
+                lines.append(f"  {seconds:>9.4f}s  {file_path}")
+        return '\n'.join(lines)
+
+    def summary(self) -> Dict[str, Any]:
+        """写入报告 analysis_metadata 的汇总数据"""
+        stages: Dict[str, Any] = {}
+        detectors: Dict[str, Any] = {}
+        for row in self.rows():
+            item = {
+                'calls': row['calls'],
+                'wall_seconds': round(row['wall'], 6),
+                'cpu_seconds': round(row['cpu'], 6),
+            }
+            if row['nodes'] is not None:
+                item['nodes_visited'] = row['nodes']
+            if row['kind'] == 'detector':
+                item['findings'] = row['findings'] or 0
+                detectors[str(row['name'])] = item
+            else:
+                stages[str(row['name'])] = item
+        return {
+            'files': len(self.durations) or len(self.files),
+            'total_seconds': round(self.total_seconds, 6),
+            'stages': stages,
+            'detectors': detectors,
+        }
+
+    def collapsed_stacks(self) -> List[str]:
+        """
+        折叠栈文本（flamegraph.pl / speedscope 可直接读取），采样值为微秒
+        栈为 sca;文件;阶段或检测器，遍历分发的检测器位于 ast_walk 之下，文件自身的剩余耗时记在文件帧上
+        """
+        lines = []
+        for file_path in sorted(self.files, key=str):
+            costs = self.files[file_path]
+            root = f"sca;{_frame(file_path)}"
+            walk = costs.get(('stage', 'ast_walk'))
+            visitor_total = 0.0
+            children = 0.0
+            for (kind, name), entry in sorted(costs.items(), key=lambda item: str(item[0])):
+                micros = int(entry['wall'] * 1e6)
+                if kind == 'detector' and entry['visitor'] and walk is not None:
+                    visitor_total += entry['wall']
+                    lines.append(f"{root};ast_walk;{_frame(name)} {micros}")
+                    continue
+                if kind == 'stage' and name == 'ast_walk':
+                    continue
+                children += entry['wall']
+                lines.append(f"{root};{_frame(name)} {micros}")
+            if walk is not None:
+                children += walk['wall']
+                lines.append(f"{root};ast_walk {int(max(walk['wall'] - visitor_total, 0.0) * 1e6)}")
+            remaining = self.durations.get(file_path, 0.0) - children
+            if remaining > 0:
+                lines.append(f"{root} {int(remaining * 1e6)}")
+        return [line for line in lines if not line.endswith(' 0')]
@@ -1,9 +1,12 @@
 import json
 import xml.etree.ElementTree as ET
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import os
 import time
+from collections.abc import Mapping
+from .line_index import LineIndex
+from .traversal import iter_nodes
 
 class ReportGenerator:
     @staticmethod
@@ -85,7 +88,7 @@ class SlitherReportGenerator:
         output_path: str = "sca_report.json"
     ) -> Dict[str, Any]:
         """
-        生成符合 Slither 风格的完整 JSON 报告
+        生成符合 Slither 风格的完整 JSON 报告并写入文件
         
         Args:
             results: 检测器返回的漏洞列表
@@ -93,6 +96,37 @@ class SlitherReportGenerator:
             analysis_metadata: 分析元信息（目标、版本、耗时等）
             output_path: 输出文件路径
         
+        Returns:
+            完整的报告字典
+        """
+        report = SlitherReportGenerator.build_slither_report(results, contracts_info, analysis_metadata)
+        summary = report['summary']
+        
+        # 写入文件
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        
+        print(f"[*] Slither 风格 JSON 报告已生成: {output_path}")
+        print(f"    - 总漏洞数: {summary['total_vulnerabilities']}")
+        print(f"    - 高危: {summary['high_severity']}, 中危: {summary['medium_severity']}, 低危: {summary['low_severity']}")
+        print(f"    - 信息性发现: {summary['informational']}")
+        
+        return report
+
+    @staticmethod
+    def build_slither_report(
+        results: List[Dict[str, Any]],
+        contracts_info: List[Dict[str, Any]],
+        analysis_metadata: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        构建 Slither 风格的报告字典（不写入文件，供 API 与 HTML 报告直接使用）
+        
+        Args:
+            results: 检测器返回的漏洞列表
+            contracts_info: 分析的合约信息列表
+            analysis_metadata: 分析元信息（目标、版本、耗时等）
+        
         Returns:
             完整的报告字典
         """
@@ -167,16 +201,6 @@ class SlitherReportGenerator:
             "informational_findings": informational_findings,
             "summary": summary
         }
-        
-        # 写入文件
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, ensure_ascii=False)
-        
-        print(f"[*] Slither 风格 JSON 报告已生成: {output_path}")
-        print(f"    - 总漏洞数: {summary['total_vulnerabilities']}")
-        print(f"    - 高危: {summary['high_severity']}, 中危: {summary['medium_severity']}, 低危: {summary['low_severity']}")
-        print(f"    - 信息性发现: {summary['informational']}")
-        
         return report
     
     @staticmethod
@@ -184,7 +208,8 @@ class SlitherReportGenerator:
         target: str,
         solidity_version: str = None,
         analysis_duration: float = 0.0,
-        framework: str = None
+        framework: str = None,
+        profile: Dict[str, Any] = None
     ) -> Dict[str, Any]:
         """
         创建分析元信息
@@ -194,6 +219,7 @@ class SlitherReportGenerator:
             solidity_version: Solidity 版本
             analysis_duration: 分析耗时（秒）
             framework: 使用的框架（hardhat/foundry/brownie）
+            profile: --profile 模式下各阶段与检测器的耗时汇总
         
         Returns:
             分析元信息字典
@@ -210,10 +236,13 @@ class SlitherReportGenerator:
         if framework:
             metadata["framework"] = framework
         
+        if profile:
+            metadata["profile"] = profile
+        
         return metadata
     
     @staticmethod
-    def extract_contracts_info(ast: Dict[str, Any], filename: str, content: str) -> List[Dict[str, Any]]:
+    def extract_contracts_info(ast: Dict[str, Any], filename: str, content: str, line_index: Optional[LineIndex] = None) -> List[Dict[str, Any]]:
         """
         从 AST 中提取合约信息
         
@@ -221,6 +250,7 @@ class SlitherReportGenerator:
             ast: 抽象语法树
             filename: 源文件名
             content: 源代码内容
+            line_index: 行号索引（可选，未提供时按 content 构建）
         
         Returns:
             合约信息列表
@@ -230,21 +260,14 @@ class SlitherReportGenerator:
         if not ast:
             return contracts
         
+        line_index = line_index or LineIndex(content)
+        
         def visit_node(node):
             if node.get('nodeType') == 'ContractDefinition':
                 contract_name = node.get('name', 'Unknown')
                 
                 # 获取行号范围
-                src = node.get('src', '0:0:0')
-                parts = src.split(':')
-                if len(parts) >= 2:
-                    offset = int(parts[0])
-                    length = int(parts[1])
-                    start_line = content[:offset].count('\n') + 1
-                    end_line = content[:offset + length].count('\n') + 1
-                else:
-                    start_line = 1
-                    end_line = 1
+                start_line, end_line = line_index.line_range_from_src(node.get('src', '0:0:0'))
                 
                 # 检查是否为可升级合约
                 is_upgradeable = False
@@ -264,17 +287,17 @@ class SlitherReportGenerator:
                     "is_upgradeable": is_upgradeable
                 })
         
-        def walk(node):
-            if not isinstance(node, dict):
-                return
-            visit_node(node)
+        def children(node):
+            found = []
             for key in ['nodes', 'children']:
-                children = node.get(key, [])
-                if isinstance(children, list):
-                    for child in children:
-                        walk(child)
-        
-        walk(ast)
+                items = node.get(key, [])
+                if isinstance(items, list):
+                    found.extend(child for child in items if isinstance(child, Mapping))
+            return found
+
+        if isinstance(ast, Mapping):
+            for node in iter_nodes(ast, children=children):
+                visit_node(node)
         return contracts
 
 
@@ -1,15 +1,29 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from .line_index import LineIndex
+from .ast_index import ASTIndex
+from .lexer import MaskedSource, PatternSet
+from .traversal import walk
 
 class SCAIRBuilder:
-    def __init__(self):
-        self.state_vars = set()
+    # build_from_text 使用的文本模式，可并入引擎的合并扫描
+    TEXT_PATTERN_OWNER = 'sca-ir'
+    TEXT_PATTERNS = {
+        'require': r'require\(',
+        'call': r'\.call[{(]',
+        'send': r'\.send\(',
+        'transfer': r'transfer\(',
+        'state': r'balance|owner',
+    }
 
-    def build(self, ast: Dict[str, Any], content: str) -> Dict[str, Any]:
-        self.state_vars = set()
-        self._collect_state_vars(ast)
+    # 构建器本身不保存任何状态，每次 build 的中间数据放在独立的 _BuildScope 中，
+    # 同一个实例可以被多个线程同时使用
+
+    def build(self, ast: Dict[str, Any], content: str, line_index: Optional[LineIndex] = None, index: Optional[ASTIndex] = None) -> Dict[str, Any]:
+        index = index or ASTIndex(ast)
+        scope = _BuildScope(self._collect_state_vars(index), line_index or LineIndex(content))
         functions = []
-        for node in self._iter_nodes(ast):
-            if node.get('nodeType') == 'FunctionDefinition' and node.get('kind') in (None, 'function', 'constructor'):
+        for node in index.functions:
+            if node.get('kind') in (None, 'function', 'constructor'):
                 name = node.get('name') or ('constructor' if node.get('kind') == 'constructor' else '')
                 modifiers = []
                 for m in node.get('modifiers', []) or []:
@@ -17,60 +31,68 @@ class SCAIRBuilder:
                     if mn:
                         modifiers.append(mn)
                 instr = []
-                instr.append({'op': 'FUNC', 'name': name, 'line': self._line_from_src(content, node.get('src'))})
+                instr.append({'op': 'FUNC', 'name': name, 'line': self._line_from_src(scope, node.get('src'))})
                 body = node.get('body') or {}
-                self._emit_instructions_from_block(body, content, instr)
-                functions.append({'name': name, 'modifiers': modifiers, 'instructions': instr})
+                self._emit_instructions_from_block(body, scope, instr)
+                functions.append({'name': name, 'src': node.get('src'), 'modifiers': modifiers, 'instructions': instr})
         return {'functions': functions}
 
-    def build_from_text(self, content: str) -> Dict[str, Any]:
-        # 轻量文本回退：按行扫描，生成一个伪函数的指令序列
-        lines = content.split('\n')
+    def build_from_text(self, content: str, masked: Optional[MaskedSource] = None, hits: Optional[Dict[str, List[int]]] = None) -> Dict[str, Any]:
+        # 轻量文本回退：在屏蔽了注释与字符串的源码上匹配，生成一个伪函数的指令序列
+        masked = masked or MaskedSource(content)
+        if hits is None:
+            patterns = PatternSet()
+            patterns.update(self.TEXT_PATTERN_OWNER, self.TEXT_PATTERNS)
+            hits = patterns.scan(masked).get(self.TEXT_PATTERN_OWNER, {})
+        by_line: Dict[int, set] = {}
+        for name, lines in hits.items():
+            for i in lines:
+                by_line.setdefault(i, set()).add(name)
+
         instr: List[Dict[str, Any]] = [{'op': 'FUNC', 'name': '', 'line': 1}]
-        for i, line in enumerate(lines, start=1):
-            l = line.strip()
-            if 'require(' in l:
+        for i in sorted(by_line):
+            names = by_line[i]
+            l = masked.line(i)
+            if 'require' in names:
                 instr.append({'op': 'REQUIRE', 'line': i})
             # 低级调用：.call{...}(...) 或 .call(...)
-            if '.call{' in l or '.call(' in l:
+            if 'call' in names:
                 checked = '=' in l  # 简化：同一行若有赋值认为接收了返回值
                 instr.append({'op': 'EXTERNAL_CALL', 'method': 'call', 'line': i, 'checked': checked})
             # 发送：send/transfer
-            if '.send(' in l:
+            if 'send' in names:
                 checked = '=' in l
                 instr.append({'op': 'SEND', 'method': 'send', 'line': i, 'checked': checked})
-            if '.transfer(' in l or 'transfer(' in l:
+            if 'transfer' in names:
                 instr.append({'op': 'SEND', 'method': 'transfer', 'line': i, 'checked': True})
             # 状态写入（极简启发式）
-            if '=' in l and ('balance' in l or 'owner' in l):
+            if 'state' in names and '=' in l:
                 instr.append({'op': 'STATE_WRITE', 'var': 'unknown', 'line': i})
         return {'functions': [{'name': '', 'modifiers': [], 'instructions': instr}]}
 
-    def _collect_state_vars(self, ast: Dict[str, Any]):
-        for node in self._iter_nodes(ast):
-            if node.get('nodeType') == 'VariableDeclaration' and node.get('stateVariable'):
-                n = node.get('name')
-                if n:
-                    self.state_vars.add(n)
+    def _collect_state_vars(self, index: ASTIndex) -> set:
+        state_vars = set()
+        for node in index.state_variables:
+            n = node.get('name')
+            if n:
+                state_vars.add(n)
+        return state_vars
 
-    def _emit_instructions_from_block(self, block: Dict[str, Any], content: str, instr: List[Dict[str, Any]]):
+    def _emit_instructions_from_block(self, block: Dict[str, Any], scope: '_BuildScope', instr: List[Dict[str, Any]]):
+        # 显式栈先序遍历语句：if 语句先产出 IF，再依次展开 trueBody / falseBody 中的语句
         for st in (block.get('statements') or []):
-            self._emit_from_statement(st, content, instr)
+            walk(st, lambda node, ancestors: self._emit_from_statement(node, scope, instr), children=_branch_statements)
 
-    def _emit_from_statement(self, st: Dict[str, Any], content: str, instr: List[Dict[str, Any]]):
+    def _emit_from_statement(self, st: Dict[str, Any], scope: '_BuildScope', instr: List[Dict[str, Any]]):
         nt = st.get('nodeType')
         if nt == 'ExpressionStatement':
             expr = st.get('expression') or {}
-            self._emit_from_expression(expr, content, instr)
+            self._emit_from_expression(expr, scope, instr)
         elif nt == 'IfStatement':
-            instr.append({'op': 'IF', 'line': self._line_from_src(content, st.get('src'))})
-            then = st.get('trueBody') or {}
-            self._emit_instructions_from_block(then, content, instr)
-            elseb = st.get('falseBody') or {}
-            if elseb:
-                self._emit_instructions_from_block(elseb, content, instr)
+            # 分支中的语句由 _emit_instructions_from_block 的遍历展开（_branch_statements）
+            instr.append({'op': 'IF', 'line': self._line_from_src(scope, st.get('src'))})
         elif nt == 'Return':
-            instr.append({'op': 'RETURN', 'line': self._line_from_src(content, st.get('src'))})
+            instr.append({'op': 'RETURN', 'line': self._line_from_src(scope, st.get('src'))})
         elif nt == 'VariableDeclarationStatement':
             decls = st.get('declarations') or []
             # 变量声明（可能带初始化）
@@ -83,37 +105,37 @@ class SCAIRBuilder:
                         mn = callee.get('memberName')
                         if mn in ('call', 'send'):
                             op = 'EXTERNAL_CALL' if mn == 'call' else 'SEND'
-                            instr.append({'op': op, 'method': mn, 'line': self._line_from_src(content, init.get('src')), 'checked': True})
+                            instr.append({'op': op, 'method': mn, 'line': self._line_from_src(scope, init.get('src')), 'checked': True})
             for d in decls:
                 name = d.get('name')
-                if name in self.state_vars:
-                    instr.append({'op': 'STATE_DECL', 'var': name, 'line': self._line_from_src(content, st.get('src'))})
+                if name in scope.state_vars:
+                    instr.append({'op': 'STATE_DECL', 'var': name, 'line': self._line_from_src(scope, st.get('src'))})
         elif nt == 'WhileStatement' or nt == 'ForStatement':
-            instr.append({'op': 'LOOP', 'line': self._line_from_src(content, st.get('src'))})
+            instr.append({'op': 'LOOP', 'line': self._line_from_src(scope, st.get('src'))})
 
-    def _emit_from_expression(self, expr: Dict[str, Any], content: str, instr: List[Dict[str, Any]]):
+    def _emit_from_expression(self, expr: Dict[str, Any], scope: '_BuildScope', instr: List[Dict[str, Any]]):
         nt = expr.get('nodeType')
         if nt == 'FunctionCall':
             callee = expr.get('expression') or {}
             cname = callee.get('name')
             if cname == 'require':
-                instr.append({'op': 'REQUIRE', 'line': self._line_from_src(content, expr.get('src'))})
+                instr.append({'op': 'REQUIRE', 'line': self._line_from_src(scope, expr.get('src'))})
                 return
             if cname == 'selfdestruct':
-                instr.append({'op': 'SELFDESTRUCT', 'line': self._line_from_src(content, expr.get('src'))})
+                instr.append({'op': 'SELFDESTRUCT', 'line': self._line_from_src(scope, expr.get('src'))})
                 return
             if callee.get('nodeType') == 'MemberAccess':
                 mn = callee.get('memberName')
                 if mn in ('call', 'send', 'transfer', 'delegatecall'):
                     op = 'EXTERNAL_CALL' if mn in ('call', 'delegatecall') else 'SEND'
                     # 默认未检查（在赋值或声明初始化时会标记 checked=True）
-                    instr.append({'op': op, 'method': mn, 'line': self._line_from_src(content, expr.get('src')), 'checked': False})
+                    instr.append({'op': op, 'method': mn, 'line': self._line_from_src(scope, expr.get('src')), 'checked': False})
                     return
         elif nt == 'Assignment':
             lhs = expr.get('leftHandSide') or {}
             varname = lhs.get('name')
-            if varname in self.state_vars:
-                instr.append({'op': 'STATE_WRITE', 'var': varname, 'line': self._line_from_src(content, expr.get('src'))})
+            if varname in scope.state_vars:
+                instr.append({'op': 'STATE_WRITE', 'var': varname, 'line': self._line_from_src(scope, expr.get('src'))})
             # 如果右侧是低级调用，说明返回值被接收（checked=True）
             rhs = expr.get('rightHandSide') or {}
             if rhs.get('nodeType') == 'FunctionCall':
@@ -122,25 +144,24 @@ class SCAIRBuilder:
                     mn = callee.get('memberName')
                     if mn in ('call', 'send'):
                         op = 'EXTERNAL_CALL' if mn == 'call' else 'SEND'
-                        instr.append({'op': op, 'method': mn, 'line': self._line_from_src(content, rhs.get('src')), 'checked': True})
+                        instr.append({'op': op, 'method': mn, 'line': self._line_from_src(scope, rhs.get('src')), 'checked': True})
+
+    def _line_from_src(self, scope: '_BuildScope', src: str):
+        return scope.line_index.line_from_src(src, default=0)
+
+
+class _BuildScope:
+    """单次 build 的中间数据：状态变量名集合与行号索引"""
+
+    def __init__(self, state_vars: set, line_index: LineIndex):
+        self.state_vars = state_vars
+        self.line_index = line_index
 
-    def _iter_nodes(self, node: Any):
-        if isinstance(node, dict):
-            yield node
-            for k, v in node.items():
-                if isinstance(v, dict):
-                    for x in self._iter_nodes(v):
-                        yield x
-                elif isinstance(v, list):
-                    for it in v:
-                        for x in self._iter_nodes(it):
-                            yield x
 
-    def _line_from_src(self, content: str, src: str):
-        try:
-            if not src:
-                return 0
-            offset = int(str(src).split(':')[0])
-            return content[:offset].count('\n') + 1
-        except Exception:
-            return 0
+def _branch_statements(st: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """IR 展开的子语句：只有 if 语句的两个分支块（循环体等不展开）"""
+    if st.get('nodeType') != 'IfStatement':
+        return []
+    children = list((st.get('trueBody') or {}).get('statements') or [])
+    children.extend((st.get('falseBody') or {}).get('statements') or [])
+    return children
@@ -0,0 +1,96 @@
+from collections.abc import Mapping
+from typing import Any, Callable, Iterator, List, Optional
+
+# enter 回调返回 PRUNE 时跳过该节点的子树（leave 仍会调用）
+PRUNE = object()
+# 子节点迭代结束的哨兵（子节点列表中可能含 None）
+_DONE = object()
+
+
+# 不可能是子节点的值类型：先按类型排除，避免对每个标量做 Mapping 的抽象基类检查
+_SCALARS = frozenset((str, int, float, bool, type(None)))
+
+
+def _is_node(value: Any) -> bool:
+    kind = type(value)
+    return kind is dict or (kind not in _SCALARS and isinstance(value, Mapping))
+
+
+def child_nodes(node: Mapping) -> List[Mapping]:
+    """节点的直接子节点：字段值中的 Mapping 及列表中的 Mapping，按字段顺序"""
+    children = []
+    for value in node.values():
+        kind = type(value)
+        if kind in _SCALARS:
+            continue
+        if kind is list:
+            children.extend(item for item in value if _is_node(item))
+        elif kind is dict or isinstance(value, Mapping):
+            children.append(value)
+    return children
+
+
+def walk(root: Any, enter: Optional[Callable[[Any, List[Any]], Any]] = None,
+         leave: Optional[Callable[[Any, List[Any]], Any]] = None,
+         children: Callable[[Any], List[Any]] = child_nodes, ancestors: Optional[List[Any]] = None):
+    """
+    显式栈的深度优先遍历，不使用递归，深层嵌套的表达式不会触发递归深度限制
+
+    - enter(node, ancestors) 在先序位置调用，返回 PRUNE 时不再进入其子节点
+    - leave(node, ancestors) 在后序位置调用
+    - ancestors 为从根到父节点的节点列表（不含 node 本身），遍历期间原地维护，回调中只读；
+      可传入已有列表（如 VisitState.ancestors）让调用方直接读取
+    - children(node) 决定子节点及顺序，默认为 child_nodes
+    """
+    if not root:
+        return
+    if ancestors is None:
+        ancestors = []
+    if enter is not None and enter(root, ancestors) is PRUNE:
+        kids = ()
+    else:
+        kids = children(root)
+    if not kids:
+        if leave is not None:
+            leave(root, ancestors)
+        return
+    ancestors.append(root)
+    # 栈元素为 (节点, 剩余子节点的迭代器)；没有子节点的节点不入栈，进入后立即离开
+    stack = [(root, iter(kids))]
+    while stack:
+        node, pending = stack[-1]
+        child = next(pending, _DONE)
+        if child is _DONE:
+            stack.pop()
+            ancestors.pop()
+            if leave is not None:
+                leave(node, ancestors)
+            continue
+        if enter is not None and enter(child, ancestors) is PRUNE:
+            kids = ()
+        else:
+            kids = children(child)
+        if kids:
+            ancestors.append(child)
+            stack.append((child, iter(kids)))
+        elif leave is not None:
+            leave(child, ancestors)
+
+
+def iter_nodes(root: Any, children: Callable[[Any], List[Any]] = child_nodes,
+               prune: Optional[Callable[[Any], bool]] = None) -> Iterator[Any]:
+    """
+    先序遍历的生成器（单层生成器 + 显式栈，不逐层串联生成器）
+    prune(node) 为真时产出该节点但不进入其子树
+    """
+    if not root:
+        return
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        if prune is not None and prune(node):
+            continue
+        kids = children(node)
+        if kids:
+            stack.extend(reversed(kids))
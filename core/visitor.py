@@ -0,0 +1,204 @@
+from time import perf_counter, process_time
+from typing import Any, Dict, List, Optional, Set
+from .traversal import walk
+
+# 进入这些节点后，其子树视为处于循环体内
+LOOP_NODE_TYPES = ('ForStatement', 'WhileStatement', 'DoWhileStatement')
+# 进入这些节点后，其子树视为处于函数作用域内
+FUNCTION_NODE_TYPES = ('FunctionDefinition', 'ModifierDefinition')
+
+
+class VisitState:
+    """
+    单次 AST 遍历期间的共享状态
+
+    由遍历器维护当前所在的合约、函数、循环深度与祖先栈，
+    检测器在 on_*/leave_* 回调中读取，无需自己再做递归遍历。
+    """
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.contract: Optional[Dict[str, Any]] = None
+        self.function: Optional[Dict[str, Any]] = None
+        self.loop_depth = 0
+        self.ancestors: List[Dict[str, Any]] = []
+        self._locals: Dict[int, Dict[str, Any]] = {}
+        # 本次遍历中不再分发的检测器（执行出错，或本次未运行）
+        self.failed: Set[Any] = set()
+        self._params_cache: Dict[int, Set[str]] = {}
+        # 可选的统计输出：检测器 -> 回调累计耗时（秒）/ CPU 时间（秒）/ 分发到的节点数；执行出错的 (检测器, 错误信息) 列表
+        self.timings: Optional[Dict[Any, float]] = None
+        self.cpu: Optional[Dict[Any, float]] = None
+        self.counts: Optional[Dict[Any, int]] = None
+        self.errors: Optional[List[Any]] = None
+        # 可选的函数范围：检测器 -> 允许分发的 FunctionDefinition src 集合，其余函数的子树跳过该检测器
+        self.scopes: Optional[Dict[Any, Set[str]]] = None
+
+    @property
+    def in_loop(self) -> bool:
+        return self.loop_depth > 0
+
+    @property
+    def function_params(self) -> Set[str]:
+        """当前函数的参数名集合（不在函数内或位于修饰器内时为空集，修饰器参数不计入）"""
+        fn = self.function
+        if fn is None or fn.get('nodeType') != 'FunctionDefinition':
+            return set()
+        key = id(fn)
+        if key not in self._params_cache:
+            names = set()
+            for p in (fn.get('parameters') or {}).get('parameters', []) or []:
+                n = p.get('name')
+                if n:
+                    names.add(n)
+            self._params_cache[key] = names
+        return self._params_cache[key]
+
+    def local(self, detector) -> Dict[str, Any]:
+        """检测器在本次遍历中的私有数据（检测器实例本身保持无状态）"""
+        return self._locals.setdefault(id(detector), {})
+
+
+class ASTDispatcher:
+    """
+    单次遍历分发器
+
+    检测器通过定义 on_<NodeType>(node, state) / leave_<NodeType>(node, state)
+    订阅节点类型；遍历一次 AST，每个节点只分发给订阅了该类型的检测器。
+    回调返回的问题列表（或 None）按检测器归集。
+    """
+
+    def __init__(self, detectors):
+        self.detectors = list(detectors)
+        self._enter: Dict[str, List[Any]] = {}
+        self._leave: Dict[str, List[Any]] = {}
+        for detector in self.detectors:
+            for attr in dir(type(detector)):
+                if attr.startswith('on_'):
+                    self._enter.setdefault(attr[3:], []).append((detector, getattr(detector, attr)))
+                elif attr.startswith('leave_'):
+                    self._leave.setdefault(attr[6:], []).append((detector, getattr(detector, attr)))
+        # 每种节点类型会分发到的检测器（统计节点数用，进入与离开回调只计一次）
+        self._targets: Dict[str, List[Any]] = {}
+        for nt in set(self._enter) | set(self._leave):
+            targets = [d for d, _ in self._enter.get(nt, ())]
+            targets += [d for d, _ in self._leave.get(nt, ()) if d not in targets]
+            self._targets[nt] = targets
+
+    def run(self, ctx, detectors=None, timings: Optional[Dict[Any, float]] = None, errors: Optional[List[Any]] = None,
+            cpu: Optional[Dict[Any, float]] = None, counts: Optional[Dict[Any, int]] = None,
+            scopes: Optional[Dict[Any, Set[str]]] = None) -> Dict[Any, List[Dict[str, Any]]]:
+        """
+        遍历 ctx.ast，返回 {检测器: 问题列表}
+        detectors 为本次实际要运行的子集（如预筛选后剩余的检测器），默认全部
+        传入 timings 时累计每个检测器回调的耗时，传入 errors 时记录执行出错的 (检测器, 错误信息)，由调用方报告
+        传入 cpu 时（需同时传入 timings）累计回调的 CPU 时间；
+        传入 counts 时记录分发给每个检测器的节点数，counts[None] 为本次遍历的节点总数
+        scopes 为 {检测器: 函数 src 集合} 时，该检测器只在这些函数内（及函数之外的节点上）分发
+        """
+        if detectors is None:
+            active = self.detectors
+        else:
+            wanted = set(detectors)
+            active = [d for d in self.detectors if d in wanted]
+        issues = {detector: [] for detector in active}
+        # 没有要运行的检测器时不访问 ctx.ast，避免触发编译
+        if not active or not ctx.ast:
+            return issues
+        state = VisitState(ctx)
+        state.timings = timings
+        state.cpu = cpu if timings is not None else None
+        state.counts = counts
+        state.errors = errors
+        state.scopes = scopes or None
+        # 未运行的检测器视为已停止分发
+        state.failed.update(d for d in self.detectors if d not in issues)
+        for detector in active:
+            self._call(detector, detector.visit_begin, (state,), state, issues)
+        self._walk(ctx.ast, state, issues)
+        for detector in active:
+            if detector in state.failed:
+                continue
+            start = perf_counter() if timings is not None else 0.0
+            cpu_start = process_time() if state.cpu is not None else 0.0
+            try:
+                issues[detector] = detector.visit_end(state, issues[detector]) or []
+            except Exception as e:
+                issues[detector] = []
+                if errors is not None:
+                    errors.append((detector, str(e)))
+            finally:
+                if timings is not None:
+                    timings[detector] = timings.get(detector, 0.0) + perf_counter() - start
+                if state.cpu is not None:
+                    cpu[detector] = cpu.get(detector, 0.0) + process_time() - cpu_start
+        return issues
+
+    def _call(self, detector, hook, args, state: VisitState, issues):
+        if detector in state.failed:
+            return
+        timings = state.timings
+        cpu = state.cpu
+        start = perf_counter() if timings is not None else 0.0
+        cpu_start = process_time() if cpu is not None else 0.0
+        try:
+            found = hook(*args)
+        except Exception as e:
+            # 单个检测器出错不影响其它检测器，本文件内不再分发给它
+            state.failed.add(detector)
+            issues[detector] = []
+            if state.errors is not None:
+                state.errors.append((detector, str(e)))
+            return
+        finally:
+            if timings is not None:
+                timings[detector] = timings.get(detector, 0.0) + perf_counter() - start
+            if cpu is not None:
+                cpu[detector] = cpu.get(detector, 0.0) + process_time() - cpu_start
+        if found:
+            issues[detector].extend(found)
+
+    def _walk(self, root, state: VisitState, issues):
+        # 显式栈遍历（core.traversal.walk），state.ancestors 即遍历维护的祖先栈
+        enter_hooks, leave_hooks, targets = self._enter, self._leave, self._targets
+        # 进入函数 / 合约时保存的 (外层函数, 外层合约, 暂停分发的检测器)
+        saved = []
+
+        def enter(node, ancestors):
+            nt = node.get('nodeType')
+            if nt in FUNCTION_NODE_TYPES or nt == 'ContractDefinition':
+                # 范围之外的函数：整个子树（含进入 / 离开回调）暂时停止分发给对应检测器
+                suspended = ()
+                if state.scopes is not None and nt == 'FunctionDefinition':
+                    src = node.get('src')
+                    suspended = [d for d, allowed in state.scopes.items() if d not in state.failed and src not in allowed]
+                    state.failed.update(suspended)
+                saved.append((state.function, state.contract, suspended))
+                if nt == 'ContractDefinition':
+                    state.contract = node
+                else:
+                    state.function = node
+
+            counts = state.counts
+            if counts is not None:
+                counts[None] = counts.get(None, 0) + 1
+                for detector in targets.get(nt, ()):
+                    if detector not in state.failed:
+                        counts[detector] = counts.get(detector, 0) + 1
+
+            for detector, hook in enter_hooks.get(nt, ()):
+                self._call(detector, hook, (node, state), state, issues)
+            if nt in LOOP_NODE_TYPES:
+                state.loop_depth += 1
+
+        def leave(node, ancestors):
+            nt = node.get('nodeType')
+            if nt in LOOP_NODE_TYPES:
+                state.loop_depth -= 1
+            for detector, hook in leave_hooks.get(nt, ()):
+                self._call(detector, hook, (node, state), state, issues)
+            if nt in FUNCTION_NODE_TYPES or nt == 'ContractDefinition':
+                state.function, state.contract, suspended = saved.pop()
+                state.failed.difference_update(suspended)
+
+        walk(root, enter, leave, ancestors=state.ancestors)
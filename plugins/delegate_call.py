@@ -1,5 +1,5 @@
-import re
 from core.interface import BaseDetector
+from core.context import AnalysisContext
 
 class DelegateCallDetector(BaseDetector):
     @property
@@ -14,18 +14,28 @@ class DelegateCallDetector(BaseDetector):
     def severity(self):
         return "High"
 
-    def check(self, content: str, filename: str, ast: dict = None) -> list:
+    @property
+    def triggers(self):
+        return ('.delegatecall',)
+
+    @property
+    def requires(self):
+        return ('text',)
+
+    @property
+    def patterns(self):
+        return {'delegatecall': r'\.delegatecall\b'}
+
+    def run(self, ctx):
         issues = []
-        lines = content.split('\n')
-        for i, line in enumerate(lines):
-            if '.delegatecall' in line and '//' not in line:
-                # 检查目标是否是 msg.sender (极端危险)
-                # 或者是否是未初始化的存储变量
-                issues.append({
-                    "line": i + 1,
-                    "msg": "发现使用了 delegatecall，请确保目标地址可信且存储布局兼容"
-                })
+        for i in self.text_hits(ctx).get('delegatecall', []):
+            # 检查目标是否是 msg.sender (极端危险)
+            # 或者是否是未初始化的存储变量
+            issues.append({
+                "line": i,
+                "msg": "发现使用了 delegatecall，请确保目标地址可信且存储布局兼容"
+            })
         return issues
 
-    def run(self, ctx):
-        return self.check(ctx.content, ctx.filename, ast=ctx.ast)
+    def check(self, content: str, filename: str, ast: dict = None) -> list:
+        return self.run(AnalysisContext(content=content, filename=filename, ast=ast))
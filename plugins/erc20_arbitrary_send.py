@@ -1,7 +1,6 @@
-from core.interface import BaseDetector
-from core.context import AnalysisContext
+from core.interface import ASTVisitorDetector
 
-class ERC20ArbitrarySendDetector(BaseDetector):
+class ERC20ArbitrarySendDetector(ASTVisitorDetector):
     @property
     def id(self):
         return "SLITHER-like-arbitrary-send-erc20"
@@ -14,54 +13,16 @@ class ERC20ArbitrarySendDetector(BaseDetector):
     def severity(self):
         return "High"
 
-    def run(self, ctx: AnalysisContext):
-        issues = []
-        if not ctx.ast:
-            return issues
-
-        def fn_params(node):
-            names = []
-            params = (node.get('parameters') or {}).get('parameters', []) or []
-            for p in params:
-                n = p.get('name')
-                if n:
-                    names.append(n)
-            return set(names)
-
-        def line_from_src(src):
-            if not src:
-                return 1
-            try:
-                off = int(str(src).split(':')[0])
-                return ctx.content[:off].count('\n') + 1
-            except Exception:
-                return 1
-
-        def walk(node, params=None):
-            nt = node.get('nodeType')
-            if nt == 'FunctionDefinition':
-                params = fn_params(node)
-            if nt == 'FunctionCall':
-                expr = node.get('expression') or {}
-                if expr.get('nodeType') == 'MemberAccess' and expr.get('memberName') == 'transferFrom':
-                    args = node.get('arguments') or []
-                    if args:
-                        a0 = args[0] or {}
-                        if a0.get('nodeType') == 'Identifier' and params and a0.get('name') in params:
-                            issues.append(self.report(line_from_src(node.get('src')), "transferFrom 的 from 参数来自函数参数，可能被外部控制"))
-            for k in node:
-                v = node[k]
-                if isinstance(v, dict):
-                    walk(v, params)
-                elif isinstance(v, list):
-                    for it in v:
-                        if isinstance(it, dict):
-                            walk(it, params)
-
-        walk(ctx.ast)
-        return issues
-
-    def check(self, content: str, filename: str, ast: dict = None, ir: dict = None) -> list:
-        ctx = AnalysisContext(content=content, filename=filename, lines=content.split('\n'), ast=ast, ir=ir)
-        return self.run(ctx)
-
+    @property
+    def triggers(self):
+        return ('transferFrom',)
+
+    def on_FunctionCall(self, node, state):
+        expr = node.get('expression') or {}
+        if expr.get('nodeType') == 'MemberAccess' and expr.get('memberName') == 'transferFrom':
+            args = node.get('arguments') or []
+            if args:
+                a0 = args[0] or {}
+                params = state.function_params
+                if a0.get('nodeType') == 'Identifier' and params and a0.get('name') in params:
+                    return [self.report(state.ctx.line_from_src(node.get('src')), "transferFrom 的 from 参数来自函数参数，可能被外部控制")]
@@ -29,6 +29,18 @@ class IRReentrancyDetector(BaseDetector):
     def fix_suggestion(self):
         return "1. Add OpenZeppelin ReentrancyGuard modifier to the function; 2. Follow Check-Effects-Interactions pattern (update state before external calls); 3. Use pull payment pattern instead of push."
 
+    @property
+    def triggers(self):
+        return ('call', 'send', 'transfer')
+
+    @property
+    def requires(self):
+        return ('ir',)
+
+    @property
+    def scope(self):
+        return 'function'
+
     def check(self, content: str, filename: str, ast: dict = None, ir: dict = None) -> list:
         issues = []
         if not ir:
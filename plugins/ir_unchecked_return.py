@@ -13,6 +13,18 @@ class IRUncheckedReturnDetector(BaseDetector):
     def severity(self):
         return "Medium"
 
+    @property
+    def triggers(self):
+        return ('call', 'send')
+
+    @property
+    def requires(self):
+        return ('ir',)
+
+    @property
+    def scope(self):
+        return 'function'
+
     def check(self, content: str, filename: str, ast: dict = None, ir: dict = None) -> list:
         issues = []
         if not ir:
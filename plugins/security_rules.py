@@ -1,5 +1,5 @@
-import re
 from core.interface import BaseDetector
+from core.context import AnalysisContext
 
 class TxOriginDetector(BaseDetector):
     @property
@@ -14,56 +14,49 @@ class TxOriginDetector(BaseDetector):
     def severity(self):
         return "High"
 
-    def check(self, content: str, filename: str, ast: dict = None) -> list:
+    @property
+    def triggers(self):
+        return ('tx.origin',)
+
+    @property
+    def requires(self):
+        return ('text', 'ast')
+
+    def run(self, ctx):
         issues = []
-        
-        # 策略 1: 基于 AST 的精确检测 (如果 AST 可用)
-        if ast:
-            # 遍历 AST 寻找 tx.origin 的 MemberAccess
-            def visit_node(node):
-                if node.get('nodeType') == 'MemberAccess':
-                    if node.get('memberName') == 'origin':
-                        expr = node.get('expression')
-                        if expr and (expr.get('name') == 'tx' or (expr.get('attributes') or {}).get('value') == 'tx'):
-                            # 找到 tx.origin，计算行号
-                            src = node.get('src')
-                            if src:
-                                offset = int(src.split(':')[0])
-                                line_num = content[:offset].count('\n') + 1
-                                issues.append({
-                                    "line": line_num,
-                                    "msg": "通过 AST 分析发现使用了 tx.origin"
-                                })
-            
-            # 简单的 AST 遍历辅助函数
-            def walk(node):
-                visit_node(node)
-                for key in ['nodes', 'children', 'statements', 'body', 'expression', 'components']:
-                     val = node.get(key)
-                     if isinstance(val, list):
-                         for v in val: walk(v)
-                     elif isinstance(val, dict):
-                         walk(val)
-
-            walk(ast)
-            
+
+        # 策略 1: 基于 AST 的精确检测，直接从索引定位 .origin 成员访问
+        if ctx.ast:
+            for node in ctx.index.members('origin'):
+                expr = node.get('expression')
+                if expr and (expr.get('name') == 'tx' or (expr.get('attributes') or {}).get('value') == 'tx'):
+                    # 找到 tx.origin，计算行号
+                    src = node.get('src')
+                    if src:
+                        issues.append({
+                            "line": ctx.line_from_src(src),
+                            "msg": "通过 AST 分析发现使用了 tx.origin"
+                        })
+
             # 如果 AST 分析有结果，直接返回，避免和正则重复
             if issues:
                 return issues
 
-        # 策略 2: 降级回退到正则匹配 (当 AST 解析失败时)
-        lines = content.split('\n')
-        for i, line in enumerate(lines):
-            # 简单的字符串匹配，实际应使用 AST 分析
-            if 'tx.origin' in line and '//' not in line:
-                issues.append({
-                    "line": i + 1,
-                    "msg": "发现使用了 tx.origin，建议使用 msg.sender 替代"
-                })
-        return issues
+        return self._check_text(ctx)
 
-    def run(self, ctx):
-        return self.check(ctx.content, ctx.filename, ast=ctx.ast)
+    @property
+    def patterns(self):
+        return {'tx_origin': r'\btx\.origin\b'}
+
+    # 策略 2: 降级回退到文本匹配 (当 AST 解析失败时)，注释与字符串已被屏蔽
+    def _check_text(self, ctx):
+        return [
+            {"line": i, "msg": "发现使用了 tx.origin，建议使用 msg.sender 替代"}
+            for i in self.text_hits(ctx).get('tx_origin', [])
+        ]
+
+    def check(self, content: str, filename: str, ast: dict = None) -> list:
+        return self.run(AnalysisContext(content=content, filename=filename, ast=ast))
 
 class ReentrancyDetector(BaseDetector):
     @property
@@ -78,38 +71,39 @@ class ReentrancyDetector(BaseDetector):
     def severity(self):
         return "High"
 
-    def check(self, content: str, filename: str, ast: dict = None) -> list:
-        issues = []
-        # 增强策略：使用 AST 识别 call.value
-        if ast:
-            def visit_node(node):
-                if node.get('nodeType') == 'MemberAccess':
-                    # 识别 .call
-                    if node.get('memberName') == 'call':
-                         # 检查是否有 value 选项 (AST 结构可能不同，简化处理)
-                         # 这里我们假设低级调用本身就值得警告，特别是如果它涉及 value
-                         # 更好的方式是检查 FunctionCall 的 options
-                         pass
-            # (此处略去复杂的 AST 状态检查实现，保持教学简洁)
-
-        lines = content.split('\n')
-        for i, line in enumerate(lines):
-            # 简单的正则匹配 .call.value(...)
-            if re.search(r'\.call\.value\s*\(', line) and '//' not in line:
-                issues.append({
-                    "line": i + 1,
-                    "msg": "发现使用了 .call.value()，请确保使用了 Check-Effects-Interactions 模式或重入锁"
-                })
-            # 新增：检测 .call{value: ...} (新版 Solidity 写法)
-            if re.search(r'\.call\s*\{.*value:', line) and '//' not in line:
-                issues.append({
-                     "line": i + 1,
-                     "msg": "发现使用了 .call{value:...}，存在重入风险"
-                })
-        return issues
+    @property
+    def triggers(self):
+        return ('.call',)
+
+    @property
+    def requires(self):
+        return ('text',)
+
+    @property
+    def patterns(self):
+        return {
+            # 旧写法 .call.value(...)
+            'call_value': r'\.call\.value\s*\(',
+            # 新写法 .call{value: ...}
+            'call_options': r'\.call\s*\{.*value:',
+        }
 
     def run(self, ctx):
-        return self.check(ctx.content, ctx.filename, ast=ctx.ast)
+        # 纯文本规则：只读取屏蔽后源码的匹配结果，不会触发 AST 编译
+        hits = self.text_hits(ctx)
+        issues = [
+            {"line": i, "msg": "发现使用了 .call.value()，请确保使用了 Check-Effects-Interactions 模式或重入锁"}
+            for i in hits.get('call_value', [])
+        ]
+        issues += [
+            {"line": i, "msg": "发现使用了 .call{value:...}，存在重入风险"}
+            for i in hits.get('call_options', [])
+        ]
+        issues.sort(key=lambda issue: issue['line'])
+        return issues
+
+    def check(self, content: str, filename: str, ast: dict = None) -> list:
+        return self.run(AnalysisContext(content=content, filename=filename, ast=ast))
 
 class PragmaVersionDetector(BaseDetector):
     @property
@@ -124,18 +118,24 @@ class PragmaVersionDetector(BaseDetector):
     def severity(self):
         return "Low"
 
-    def check(self, content: str, filename: str, ast: dict = None) -> list:
-        issues = []
-        lines = content.split('\n')
-        for i, line in enumerate(lines):
-            if 'pragma solidity' in line:
-                # 简单检查是否小于 0.8.0
-                if '^0.4' in line or '^0.5' in line or '^0.6' in line or '^0.7' in line:
-                     issues.append({
-                        "line": i + 1,
-                        "msg": "使用了旧版本的 Solidity，建议升级到 0.8.0 以上"
-                    })
-        return issues
+    @property
+    def triggers(self):
+        return ('pragma solidity',)
+
+    @property
+    def requires(self):
+        return ('text',)
+
+    @property
+    def patterns(self):
+        # 简单检查是否小于 0.8.0
+        return {'old_pragma': r'pragma\s+solidity[^;\n]*\^0\.[4-7]'}
 
     def run(self, ctx):
-        return self.check(ctx.content, ctx.filename, ast=ctx.ast)
+        return [
+            {"line": i, "msg": "使用了旧版本的 Solidity，建议升级到 0.8.0 以上"}
+            for i in self.text_hits(ctx).get('old_pragma', [])
+        ]
+
+    def check(self, content: str, filename: str, ast: dict = None) -> list:
+        return self.run(AnalysisContext(content=content, filename=filename, ast=ast))
@@ -0,0 +1,50 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from core.cache import MemoryCache
+
+SOURCE = b"pragma solidity ^0.8.20;\ncontract A {}\n"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # 空的报告缓存；分析替换为直接返回完整报告，不调用 solc
+    monkeypatch.setattr(api, "_report_cache", MemoryCache(max_entries=16, ttl=600))
+    calls = []
+
+    def fake_analyze(content, filename, cache_key=None):
+        calls.append(filename)
+        report = {"summary": {"total_vulnerabilities": 0}, "vulnerabilities": []}
+        api._report_cache.put(cache_key, report)
+        return report, True
+
+    monkeypatch.setattr(api, "_analyze_source_checked", fake_analyze)
+    test_client = TestClient(api.app)
+    test_client.calls = calls
+    return test_client
+
+
+def _post(client, headers=None):
+    return client.post("/api/analyze", files={"file": ("A.sol", SOURCE)}, headers=headers or {})
+
+
+def test_if_none_match_star_on_cold_cache_returns_report(client):
+    response = _post(client, {"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert response.json()["report"]["vulnerabilities"] == []
+    assert response.headers["X-Cache"] == "MISS"
+    assert client.calls == ["A.sol"]
+
+
+def test_if_none_match_star_after_complete_report_returns_304(client):
+    etag = _post(client).headers["ETag"]
+    response = _post(client, {"If-None-Match": "*"})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert client.calls == ["A.sol"]